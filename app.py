@@ -3,21 +3,41 @@
 # IMPORTANT: Render.com environment variable cache needs to be refreshed
 import os
 import json
-import requests
 import traceback
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+import base64
 import math
 import re
-import pytz
+import struct
+import time
+import uuid
+from functools import cached_property
+
+from geocache import GeocodeCache, normalize_place
+from gazetteer import Gazetteer, load_or_build
+from candidate_store import CandidateStore, class_chart
+from fragment_cache import FragmentCache, embed_fragment, join_fragments, render_fragment
+from response_cache import ResponseCache, make_etag, request_key
+from chart_store import ChartStore, make_chart_id
+from http_client import Deadline, HTTPClient, deadline, reset_deadline, set_deadline
+from jobs import FINISHED, STATUS_DONE, JobQueue, QueueFull
+from report_cache import MODE_CACHE_ONLY, MODE_DEFAULT, MODE_REFRESH, MODES, ReportCache, fingerprint
+from singleflight import Group
+from rulesets import HALF, KOOTA_MAX, KOOTAS, load_rulesets
+import tztables
 
 # Import Swiss Ephemeris and geocoding libraries
 try:
     import swisseph as swe
     from geopy.geocoders import Nominatim
-    from timezonefinder import TimezoneFinder
+    from geopy.adapters import RequestsAdapter
+    from tzresolve import TimezoneResolver
+    from moontable import MoonTable
+    from ingress import IngressIndex
+    from ephemeris_pool import EphemerisPool
     SWISS_EPHEMERIS_AVAILABLE = True
 except ImportError:
     print("Warning: Swiss Ephemeris libraries not available. Install with: pip install pyswisseph geopy timezonefinder")
@@ -26,7 +46,8 @@ except ImportError:
 app = Flask(__name__)
 CORS(app, origins=['*'], 
      methods=['GET', 'POST', 'OPTIONS'], 
-     allow_headers=['Content-Type', 'Authorization'])
+     allow_headers=['Content-Type', 'Authorization', 'If-None-Match'],
+     expose_headers=['ETag', 'X-Cache', 'Location', 'Retry-After'])
 
 # Initialize Swiss Ephemeris with proper settings
 if SWISS_EPHEMERIS_AVAILABLE:
@@ -34,6 +55,115 @@ if SWISS_EPHEMERIS_AVAILABLE:
     swe.set_ephe_path('.')
     swe.set_sid_mode(swe.SIDM_LAHIRI)
 
+# Optional "table" ephemeris mode: Moon longitudes from a memory-mapped precomputed table
+moon_table = None
+if SWISS_EPHEMERIS_AVAILABLE and os.environ.get('EPHEMERIS_MODE', 'swiss').lower() == 'table':
+    try:
+        moon_table = MoonTable(os.environ.get('MOON_TABLE_PATH', 'moon_table.bin'))
+        print(f"Moon table loaded: {moon_table.info()}")
+    except Exception as e:
+        print(f"Warning: Moon table not available, using Swiss Ephemeris: {e}")
+
+# Optional nakshatra/pada ingress index for classification by binary search
+ingress_index = None
+if SWISS_EPHEMERIS_AVAILABLE and os.environ.get('INGRESS_INDEX_PATH'):
+    try:
+        ingress_index = IngressIndex(os.environ['INGRESS_INDEX_PATH'])
+        print(f"Ingress index loaded: {ingress_index.info()}")
+    except Exception as e:
+        print(f"Warning: ingress index not available: {e}")
+
+# Worker processes for large batches of Swiss Ephemeris positions (started on first use)
+# Spawned workers run __main__ again; when that is this file (python app.py) they would load the
+# whole app, so the pool is only used when the server is started through server.py
+ephemeris_pool = None
+EPHEMERIS_POOL_WORKERS = int(os.environ.get('EPHEMERIS_POOL_WORKERS', 0))
+EPHEMERIS_POOL_MIN_BATCH = int(os.environ.get('EPHEMERIS_POOL_MIN_BATCH', 20000))
+if SWISS_EPHEMERIS_AVAILABLE and EPHEMERIS_POOL_WORKERS > 0:
+    if __name__ == '__main__':
+        print("Warning: ephemeris pool disabled when run as app.py; start the server with: python -m server")
+    else:
+        ephemeris_pool = EphemerisPool(
+            workers=EPHEMERIS_POOL_WORKERS,
+            chunk_size=int(os.environ.get('EPHEMERIS_POOL_CHUNK_SIZE', 4096))
+        )
+
+# Process-wide timezone resolver, loaded once and fronted by a lat/lon grid cache
+if SWISS_EPHEMERIS_AVAILABLE:
+    tz_resolver = TimezoneResolver(
+        in_memory=os.environ.get('TIMEZONE_FINDER_IN_MEMORY', 'false').lower() == 'true',
+        cell_size=float(os.environ.get('TIMEZONE_GRID_CELL_SIZE', 0.1))
+    )
+else:
+    tz_resolver = None
+
+# Offline gazetteer: a prebuilt GeoNames index if configured, otherwise the bundled seed
+try:
+    if os.environ.get('GAZETTEER_PATH'):
+        gazetteer = Gazetteer(os.environ['GAZETTEER_PATH'])
+    else:
+        gazetteer = load_or_build(
+            os.environ.get('GAZETTEER_INDEX_PATH',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.idx')),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer_seed.tsv'),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer_aliases.tsv'),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer_admin1.tsv'),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer_countries.tsv')
+        )
+except Exception as e:
+    print(f"Warning: offline gazetteer not available: {e}")
+    gazetteer = None
+
+# Confidence a fuzzy gazetteer match must exceed to be used instead of the network geocoder
+GAZETTEER_MIN_CONFIDENCE = float(os.environ.get('GAZETTEER_MIN_CONFIDENCE', 0.75))
+
+# Persistent geocode cache so repeat places never hit the network geocoder
+geocode_cache = GeocodeCache(
+    os.environ.get('GEOCODE_CACHE_PATH', 'geocode_cache.db'),
+    ttl=int(os.environ.get('GEOCODE_CACHE_TTL', 30 * 24 * 3600)),
+    miss_ttl=int(os.environ.get('GEOCODE_CACHE_MISS_TTL', 24 * 3600)),
+    failure_ttl=int(os.environ.get('GEOCODE_CACHE_FAILURE_TTL', 5 * 60))
+)
+
+# Concurrent identical geocodes, charts and reports share one execution
+geocode_flight = Group("geocode")
+chart_flight = Group("chart")
+report_flight = Group("report")
+
+def place_key(place):
+    """Coalescing key of a place: its geocode cache key"""
+    return normalize_place(place) if isinstance(place, str) else repr(place)
+
+# Shared outbound HTTP client: keep-alive pools per host, bounded concurrency, jittered retries
+http_client = HTTPClient(
+    max_concurrent=int(os.environ.get('HTTP_MAX_CONCURRENT', 8)),
+    retries=int(os.environ.get('HTTP_RETRIES', 2))
+)
+# Time budgets: one API request (geocoding included) and one LLM report, retries included
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', 30))
+LLM_DEADLINE = float(os.environ.get('LLM_DEADLINE', 90))
+GEOCODE_TIMEOUT = float(os.environ.get('GEOCODE_TIMEOUT', 5))
+
+@app.before_request
+def start_request_deadline():
+    g.deadline_token = set_deadline(REQUEST_DEADLINE)
+
+@app.teardown_request
+def end_request_deadline(exc):
+    if 'deadline_token' in g:
+        reset_deadline(g.pop('deadline_token'))
+
+# One Nominatim client for the process, with its requests going through the shared pool
+geolocator = None
+if SWISS_EPHEMERIS_AVAILABLE:
+    def geocoder_adapter(proxies, ssl_context):
+        adapter = RequestsAdapter(proxies=proxies, ssl_context=ssl_context)
+        adapter.session.close()
+        adapter.session = http_client.as_session()
+        return adapter
+    
+    geolocator = Nominatim(user_agent="soulsync", timeout=GEOCODE_TIMEOUT, adapter_factory=geocoder_adapter)
+
 # Vedic astrology constants
 NAKSHATRAS = [
     "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashira", "Ardra",
@@ -61,178 +191,241 @@ RASHI_LORDS = [
     "Venus", "Mars", "Jupiter", "Saturn", "Saturn", "Jupiter"
 ]
 
-# Local geocoding database for common Indian cities
-INDIAN_CITIES = {
-    "mumbai": {"lat": 19.0760, "lon": 72.8777, "tz": "Asia/Kolkata"},
-    "delhi": {"lat": 28.7041, "lon": 77.1025, "tz": "Asia/Kolkata"},
-    "bangalore": {"lat": 12.9716, "lon": 77.5946, "tz": "Asia/Kolkata"},
-    "hyderabad": {"lat": 17.3850, "lon": 78.4867, "tz": "Asia/Kolkata"},
-    "chennai": {"lat": 13.0827, "lon": 80.2707, "tz": "Asia/Kolkata"},
-    "kolkata": {"lat": 22.5726, "lon": 88.3639, "tz": "Asia/Kolkata"},
-    "pune": {"lat": 18.5204, "lon": 73.8567, "tz": "Asia/Kolkata"},
-    "ahmedabad": {"lat": 23.0225, "lon": 72.5714, "tz": "Asia/Kolkata"},
-    "surat": {"lat": 21.1702, "lon": 72.8311, "tz": "Asia/Kolkata"},
-    "jaipur": {"lat": 26.9124, "lon": 75.7873, "tz": "Asia/Kolkata"},
-    "lucknow": {"lat": 26.8467, "lon": 80.9462, "tz": "Asia/Kolkata"},
-    "kanpur": {"lat": 26.4499, "lon": 80.3319, "tz": "Asia/Kolkata"},
-    "nagpur": {"lat": 21.1458, "lon": 79.0882, "tz": "Asia/Kolkata"},
-    "indore": {"lat": 22.7196, "lon": 75.8577, "tz": "Asia/Kolkata"},
-    "thane": {"lat": 19.2183, "lon": 72.9781, "tz": "Asia/Kolkata"},
-    "bhopal": {"lat": 23.2599, "lon": 77.4126, "tz": "Asia/Kolkata"},
-    "visakhapatnam": {"lat": 17.6868, "lon": 83.2185, "tz": "Asia/Kolkata"},
-    "patna": {"lat": 25.5941, "lon": 85.1376, "tz": "Asia/Kolkata"},
-    "vadodara": {"lat": 22.3072, "lon": 73.1812, "tz": "Asia/Kolkata"},
-    "ghaziabad": {"lat": 28.6692, "lon": 77.4538, "tz": "Asia/Kolkata"},
-    "ludhiana": {"lat": 30.9010, "lon": 75.8573, "tz": "Asia/Kolkata"},
-    "agra": {"lat": 27.1767, "lon": 78.0081, "tz": "Asia/Kolkata"},
-    "nashik": {"lat": 19.9975, "lon": 73.7898, "tz": "Asia/Kolkata"},
-    "faridabad": {"lat": 28.4089, "lon": 77.3178, "tz": "Asia/Kolkata"},
-    "meerut": {"lat": 28.9845, "lon": 77.7064, "tz": "Asia/Kolkata"},
-    "rajkot": {"lat": 22.3039, "lon": 70.8022, "tz": "Asia/Kolkata"},
-    "kalyan": {"lat": 19.2433, "lon": 73.1355, "tz": "Asia/Kolkata"},
-    "vasai": {"lat": 19.4259, "lon": 72.8225, "tz": "Asia/Kolkata"},
-    "srinagar": {"lat": 34.0837, "lon": 74.7973, "tz": "Asia/Kolkata"},
-    "aurangabad": {"lat": 19.8762, "lon": 75.3433, "tz": "Asia/Kolkata"},
-    "dhanbad": {"lat": 23.7957, "lon": 86.4304, "tz": "Asia/Kolkata"},
-    "amritsar": {"lat": 31.6340, "lon": 74.8723, "tz": "Asia/Kolkata"},
-    "allahabad": {"lat": 25.4358, "lon": 81.8463, "tz": "Asia/Kolkata"},
-    "ranchi": {"lat": 23.3441, "lon": 85.3096, "tz": "Asia/Kolkata"},
-    "howrah": {"lat": 22.5958, "lon": 88.2636, "tz": "Asia/Kolkata"},
-    "coimbatore": {"lat": 11.0168, "lon": 76.9558, "tz": "Asia/Kolkata"},
-    "jabalpur": {"lat": 23.1815, "lon": 79.9864, "tz": "Asia/Kolkata"},
-    "gwalior": {"lat": 26.2183, "lon": 78.1828, "tz": "Asia/Kolkata"},
-    "vijayawada": {"lat": 16.5062, "lon": 80.6480, "tz": "Asia/Kolkata"},
-    "jodhpur": {"lat": 26.2389, "lon": 73.0243, "tz": "Asia/Kolkata"},
-    "madurai": {"lat": 9.9252, "lon": 78.1198, "tz": "Asia/Kolkata"},
-    "raipur": {"lat": 21.2514, "lon": 81.6296, "tz": "Asia/Kolkata"},
-    "kota": {"lat": 25.2138, "lon": 75.8648, "tz": "Asia/Kolkata"},
-    "guwahati": {"lat": 26.1445, "lon": 91.7362, "tz": "Asia/Kolkata"},
-    "chandigarh": {"lat": 30.7333, "lon": 76.7794, "tz": "Asia/Kolkata"},
-    "solapur": {"lat": 17.6599, "lon": 75.9064, "tz": "Asia/Kolkata"},
-    "hubli": {"lat": 15.3647, "lon": 75.1240, "tz": "Asia/Kolkata"},
-    "mysore": {"lat": 12.2958, "lon": 76.6394, "tz": "Asia/Kolkata"},
-    "tiruchirappalli": {"lat": 10.7905, "lon": 78.7047, "tz": "Asia/Kolkata"},
-    "bareilly": {"lat": 28.3670, "lon": 79.4304, "tz": "Asia/Kolkata"},
-    "aligarh": {"lat": 27.8974, "lon": 78.0880, "tz": "Asia/Kolkata"},
-    "moradabad": {"lat": 28.8389, "lon": 78.7738, "tz": "Asia/Kolkata"},
-    "gurgaon": {"lat": 28.4595, "lon": 77.0266, "tz": "Asia/Kolkata"},
-    "noida": {"lat": 28.5355, "lon": 77.3910, "tz": "Asia/Kolkata"},
-    "greater noida": {"lat": 28.4744, "lon": 77.5040, "tz": "Asia/Kolkata"},
-    "bhubaneswar": {"lat": 20.2961, "lon": 85.8245, "tz": "Asia/Kolkata"},
-    "salem": {"lat": 11.6643, "lon": 78.1460, "tz": "Asia/Kolkata"},
-    "warangal": {"lat": 17.9689, "lon": 79.5941, "tz": "Asia/Kolkata"},
-    "guntur": {"lat": 16.2991, "lon": 80.4575, "tz": "Asia/Kolkata"},
-    "bhiwandi": {"lat": 19.2969, "lon": 73.0625, "tz": "Asia/Kolkata"},
-    "saharanpur": {"lat": 29.9675, "lon": 77.5451, "tz": "Asia/Kolkata"},
-    "gorakhpur": {"lat": 26.7606, "lon": 83.3732, "tz": "Asia/Kolkata"},
-    "bikaner": {"lat": 28.0229, "lon": 73.3119, "tz": "Asia/Kolkata"},
-    "amravati": {"lat": 20.9374, "lon": 77.7796, "tz": "Asia/Kolkata"},
-    "jamshedpur": {"lat": 22.8046, "lon": 86.2029, "tz": "Asia/Kolkata"},
-    "bhilai": {"lat": 21.2094, "lon": 81.4285, "tz": "Asia/Kolkata"},
-    "cuttack": {"lat": 20.4625, "lon": 85.8830, "tz": "Asia/Kolkata"},
-    "firozabad": {"lat": 27.1591, "lon": 78.3958, "tz": "Asia/Kolkata"},
-    "kochi": {"lat": 9.9312, "lon": 76.2673, "tz": "Asia/Kolkata"},
-    "nellore": {"lat": 14.4426, "lon": 79.9865, "tz": "Asia/Kolkata"},
-    "bhavnagar": {"lat": 21.7645, "lon": 72.1519, "tz": "Asia/Kolkata"},
-    "dehradun": {"lat": 30.3165, "lon": 78.0322, "tz": "Asia/Kolkata"},
-    "durgapur": {"lat": 23.5204, "lon": 87.3119, "tz": "Asia/Kolkata"},
-    "asansol": {"lat": 23.6889, "lon": 86.9661, "tz": "Asia/Kolkata"},
-    "rourkela": {"lat": 22.2492, "lon": 84.8828, "tz": "Asia/Kolkata"},
-    "bhagalpur": {"lat": 25.2445, "lon": 87.0104, "tz": "Asia/Kolkata"},
-    "bellary": {"lat": 15.1394, "lon": 76.9214, "tz": "Asia/Kolkata"},
-    "mangalore": {"lat": 12.9716, "lon": 74.8631, "tz": "Asia/Kolkata"},
-    "tirunelveli": {"lat": 8.7139, "lon": 77.7567, "tz": "Asia/Kolkata"},
-    "malegaon": {"lat": 20.5609, "lon": 74.5250, "tz": "Asia/Kolkata"},
-    "gaya": {"lat": 24.7914, "lon": 85.0002, "tz": "Asia/Kolkata"},
-    "jalandhar": {"lat": 31.3260, "lon": 75.5762, "tz": "Asia/Kolkata"},
-    "ujjain": {"lat": 23.1765, "lon": 75.7885, "tz": "Asia/Kolkata"},
-    "sangli": {"lat": 16.8524, "lon": 74.5815, "tz": "Asia/Kolkata"},
-    "loni": {"lat": 28.7515, "lon": 77.2889, "tz": "Asia/Kolkata"},
-    "jammu": {"lat": 32.7266, "lon": 74.8570, "tz": "Asia/Kolkata"},
-    "belgaum": {"lat": 15.8497, "lon": 74.4977, "tz": "Asia/Kolkata"},
-    "ambattur": {"lat": 13.1143, "lon": 80.1547, "tz": "Asia/Kolkata"},
-    "tiruppur": {"lat": 11.1085, "lon": 77.3411, "tz": "Asia/Kolkata"},
-    "gulbarga": {"lat": 17.3297, "lon": 76.8343, "tz": "Asia/Kolkata"},
-    "akola": {"lat": 20.7096, "lon": 77.0021, "tz": "Asia/Kolkata"},
-    "jamnagar": {"lat": 22.4707, "lon": 70.0577, "tz": "Asia/Kolkata"},
-    "bhayandar": {"lat": 19.2969, "lon": 72.8500, "tz": "Asia/Kolkata"},
-    "morvi": {"lat": 22.8173, "lon": 70.8372, "tz": "Asia/Kolkata"},
-    "vizag": {"lat": 17.6868, "lon": 83.2185, "tz": "Asia/Kolkata"}
-}
+# Fallback location when a place cannot be resolved (Mumbai)
+DEFAULT_LOCATION = {"lat": 19.0760, "lon": 72.8777, "tz": "Asia/Kolkata"}
+
+class Chart:
+    """Compact birth chart: small integer codes and plain numbers in slots.
+    
+    Names, lords, coordinates and the UTC time string are derived on access, and chart["key"]
+    works like the dict calculate_birth_chart used to return, so callers need not care.
+    """
+    
+    __slots__ = ("rashi", "nakshatra", "pada", "longitude", "boundary_distance_days",
+                 "lat", "lon", "timezone", "utc_seconds", "julian_day")
+    
+    # Dict keys, in the order of the former calculate_birth_chart dict
+    KEYS = ("rashi", "nakshatra", "longitude", "rashi_name", "nakshatra_name", "rashi_lord", "nakshatra_lord",
+            "pada", "boundary_distance_days", "coordinates", "timezone", "utc_time", "julian_day")
+    
+    def __init__(self, rashi, nakshatra, pada, longitude, boundary_distance_days, lat, lon, timezone,
+                 utc_seconds, julian_day):
+        self.rashi = rashi
+        self.nakshatra = nakshatra
+        self.pada = pada
+        self.longitude = longitude
+        self.boundary_distance_days = boundary_distance_days
+        self.lat = lat
+        self.lon = lon
+        self.timezone = timezone
+        self.utc_seconds = utc_seconds
+        self.julian_day = julian_day
+    
+    @property
+    def rashi_name(self):
+        return RASHIS[self.rashi - 1]
+    
+    @property
+    def nakshatra_name(self):
+        return NAKSHATRAS[self.nakshatra - 1]
+    
+    @property
+    def rashi_lord(self):
+        return RASHI_LORDS[self.rashi - 1]
+    
+    @property
+    def nakshatra_lord(self):
+        return NAKSHATRA_LORDS[self.nakshatra - 1]
+    
+    @property
+    def coordinates(self):
+        return {"lat": self.lat, "lon": self.lon}
+    
+    @property
+    def utc_time(self):
+        return (tztables.EPOCH_UTC + timedelta(seconds=self.utc_seconds)).isoformat()
+    
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __contains__(self, key):
+        return key in self.KEYS
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+    
+    def to_dict(self):
+        """The chart as a JSON-ready dict"""
+        return {key: getattr(self, key) for key in self.KEYS}
 
+# Column layout of ChartColumns; the timezone is a code into ChartColumns.timezones
+CHART_DTYPE = np.dtype([
+    ("rashi", np.uint8), ("nakshatra", np.uint8), ("pada", np.uint8), ("timezone", np.uint16),
+    ("longitude", np.float64), ("boundary_distance_days", np.float64), ("lat", np.float64),
+    ("lon", np.float64), ("julian_day", np.float64), ("utc_seconds", np.int64)
+])
+
+class ChartColumns:
+    """Many charts in one NumPy structured array (53 bytes per chart).
+    
+    charts["rashi"] returns a column and charts[i] a Chart; the name, lord and timezone columns
+    are resolved from the code columns when asked for.
+    """
+    
+    NAME_COLUMNS = {
+        "rashi_name": ("rashi", RASHIS),
+        "nakshatra_name": ("nakshatra", NAKSHATRAS),
+        "rashi_lord": ("rashi", RASHI_LORDS),
+        "nakshatra_lord": ("nakshatra", NAKSHATRA_LORDS)
+    }
+    
+    def __init__(self, records, timezones):
+        self.records = records
+        self.timezones = timezones
+    
+    @classmethod
+    def from_arrays(cls, timezones, **columns):
+        """Build from equal-length arrays (one per CHART_DTYPE field) and an array of timezone names"""
+        names, codes = np.unique(np.asarray(timezones, dtype=object).astype(str), return_inverse=True)
+        records = np.empty(len(codes), dtype=CHART_DTYPE)
+        records["timezone"] = codes.reshape(-1)
+        for name, values in columns.items():
+            records[name] = values
+        return cls(records, names.tolist())
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key in self.NAME_COLUMNS:
+                code_column, names = self.NAME_COLUMNS[key]
+                return np.array(names)[self.records[code_column].astype(np.intp) - 1]
+            if key == "timezone":
+                return np.array(self.timezones, dtype=object)[self.records["timezone"]]
+            return self.records[key]
+        record = self.records[key]
+        boundary = float(record["boundary_distance_days"])
+        return Chart(int(record["rashi"]), int(record["nakshatra"]), int(record["pada"]),
+                     float(record["longitude"]), None if math.isnan(boundary) else boundary,
+                     float(record["lat"]), float(record["lon"]), self.timezones[record["timezone"]],
+                     int(record["utc_seconds"]), float(record["julian_day"]))
+    
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+    
+    def to_columns(self, keys):
+        """JSON-ready dict of lists for the given columns, missing values as None"""
+        columns = {}
+        for key in keys:
+            values = self[key]
+            if values.dtype.kind == "f" and np.isnan(values).any():
+                values = np.where(np.isnan(values), None, values)
+            columns[key] = values.tolist()
+        return columns
+
+@geocode_flight.coalesce(place_key)
 def get_coordinates(place):
     """Get coordinates and timezone for a place using geopy or local database"""
-    place_lower = place.lower().strip()
+    # First try the offline gazetteer (exact, alias or confident fuzzy match)
+    if gazetteer is not None:
+        match = gazetteer.match(place, min_confidence=GAZETTEER_MIN_CONFIDENCE)
+        if match and match["tz"]:
+            return match["lat"], match["lon"], match["tz"]
     
-    # First try local database for common Indian cities
-    if place_lower in INDIAN_CITIES:
-        city_data = INDIAN_CITIES[place_lower]
-        return city_data["lat"], city_data["lon"], city_data["tz"]
+    # Then the persistent geocode cache (including remembered misses/failures)
+    cached = geocode_cache.get(place)
+    if cached and cached["status"] == "found":
+        return cached["lat"], cached["lon"], cached["tz"]
     
-    # If Swiss Ephemeris is available, try geopy
-    if SWISS_EPHEMERIS_AVAILABLE:
+    # If Swiss Ephemeris is available and the place is not a remembered miss, try geopy
+    if not cached and SWISS_EPHEMERIS_AVAILABLE:
         try:
-            geo = Nominatim(user_agent="soulsync")
-            location = geo.geocode(place)
+            location = geolocator.geocode(place)
             if location:
                 lat, lon = location.latitude, location.longitude
                 # Get timezone
-                tf = TimezoneFinder()
-                tz_name = tf.timezone_at(lng=lon, lat=lat)
+                tz_name = tz_resolver.timezone_at(lat, lon)
                 if not tz_name:
                     tz_name = "Asia/Kolkata"  # Default for India
+                geocode_cache.put(place, lat, lon, tz_name)
                 return lat, lon, tz_name
+            geocode_cache.put_miss(place)
         except Exception as e:
             print(f"Geopy error for {place}: {e}")
+            geocode_cache.put_failure(place)
     
     # Fallback to Mumbai if not found
-    default_data = INDIAN_CITIES["mumbai"]
-    return default_data["lat"], default_data["lon"], default_data["tz"]
+    return DEFAULT_LOCATION["lat"], DEFAULT_LOCATION["lon"], DEFAULT_LOCATION["tz"]
 
 def convert_to_utc(dob_str, tob_str, place):
     """Convert local date/time to UTC Julian Day"""
     try:
-        # Parse date and time
-        dt_local = datetime.strptime(f"{dob_str} {tob_str}", "%Y-%m-%d %H:%M")
-        
         # Get coordinates and timezone
         lat, lon, tz_name = get_coordinates(place)
         
-        # Convert local time to UTC
-        local_tz = pytz.timezone(tz_name)
-        local_dt = local_tz.localize(dt_local)
-        utc_dt = local_dt.astimezone(pytz.UTC)
-        
-        # Calculate Julian Day
-        jd = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, 
-                       utc_dt.hour + utc_dt.minute / 60.0)
+        jd, utc_dt = local_to_utc(dob_str, tob_str, tz_name)
         
         return jd, lat, lon, utc_dt
     except Exception as e:
         print(f"Error converting to UTC: {e}")
         raise
 
+def local_to_utc(dob_str, tob_str, tz_name):
+    """Convert local date/time in a named timezone to UTC Julian Day"""
+    # Parse date and time
+    year, month, day = dob_str.split("-")
+    hour, minute = tob_str.split(":")
+    dt_local = datetime(int(year), int(month), int(day), int(hour), int(minute))
+    
+    # Convert local time to UTC via the precompiled transition tables
+    # (same result as pytz localize + astimezone, see test_timezone_transitions.py)
+    utc_dt = tztables.local_to_utc(dt_local, tz_name)
+    
+    # Calculate Julian Day
+    jd = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, 
+                   utc_dt.hour + utc_dt.minute / 60.0)
+    
+    return jd, utc_dt
+
 def get_moon_data(jd):
     """Get Moon's position using Swiss Ephemeris"""
     try:
-        # Calculate Moon's position
-        moon_long, _ = swe.calc_ut(jd, swe.MOON)
-        
-        # Get sidereal longitude (already corrected for ayanamsa)
-        sidereal_long = moon_long[0]  # Longitude in degrees
-        
-        # Calculate rashi (zodiac sign) - 0-11
-        rashi_index = int(sidereal_long / 30)
-        rashi_index = max(0, min(11, rashi_index))
+        # Calculate Moon's position (precomputed table when enabled and in range)
+        if moon_table is not None and moon_table.covers(jd):
+            sidereal_long = moon_table.longitude(jd)
+        else:
+            moon_long, _ = swe.calc_ut(jd, swe.MOON)
+            
+            # Get sidereal longitude (already corrected for ayanamsa)
+            sidereal_long = moon_long[0]  # Longitude in degrees
         
-        # Calculate nakshatra (lunar mansion) - 0-26
-        nakshatra_index = int(sidereal_long / (360 / 27))
-        nakshatra_index = max(0, min(26, nakshatra_index))
+        if ingress_index is not None and ingress_index.covers(jd):
+            # Classify by binary search over precomputed pada ingress times
+            rashi, nakshatra, pada, boundary_distance = ingress_index.classify(jd)
+            rashi_index, nakshatra_index = rashi - 1, nakshatra - 1
+        else:
+            # Calculate rashi (zodiac sign) - 0-11
+            rashi_index = int(sidereal_long / 30)
+            rashi_index = max(0, min(11, rashi_index))
+            
+            # Calculate nakshatra (lunar mansion) - 0-26
+            nakshatra_index = int(sidereal_long / (360 / 27))
+            nakshatra_index = max(0, min(26, nakshatra_index))
+            
+            # Calculate pada (quarter of the nakshatra) - 1-4
+            pada = min(107, int(sidereal_long / (360 / 108))) % 4 + 1
+            boundary_distance = None
         
         return {
             "longitude": sidereal_long,
             "rashi": rashi_index + 1,  # Convert to 1-based indexing
             "nakshatra": nakshatra_index + 1,  # Convert to 1-based indexing
+            "pada": pada,
+            "boundary_distance_days": boundary_distance,
             "rashi_name": RASHIS[rashi_index],
             "nakshatra_name": NAKSHATRAS[nakshatra_index],
             "rashi_lord": RASHI_LORDS[rashi_index],
@@ -242,40 +435,119 @@ def get_moon_data(jd):
         print(f"Error calculating Moon data: {e}")
         raise
 
+@chart_flight.coalesce(lambda date_str, time_str, place: (date_str, time_str, place_key(place)))
 def calculate_birth_chart(date_str, time_str, place):
     """Calculate birth chart using Swiss Ephemeris for accurate Vedic astrology"""
     try:
         if not SWISS_EPHEMERIS_AVAILABLE:
             raise Exception("Swiss Ephemeris not available. Install with: pip install pyswisseph geopy timezonefinder")
         
-        # Convert to UTC and get Julian Day
-        jd, lat, lon, utc_dt = convert_to_utc(date_str, time_str, place)
+        # Resolve the place once, then convert to UTC and get Julian Day
+        lat, lon, tz_name = get_coordinates(place)
+        jd, utc_dt = local_to_utc(date_str, time_str, tz_name)
         
         # Get Moon's position using Swiss Ephemeris
         moon_data = get_moon_data(jd)
         
-        # Get timezone name
-        _, _, tz_name = get_coordinates(place)
-        
-        return {
-            "rashi": moon_data["rashi"],
-            "nakshatra": moon_data["nakshatra"],
-            "longitude": moon_data["longitude"],
-            "rashi_name": moon_data["rashi_name"],
-            "nakshatra_name": moon_data["nakshatra_name"],
-            "rashi_lord": moon_data["rashi_lord"],
-            "nakshatra_lord": moon_data["nakshatra_lord"],
-            "coordinates": {"lat": lat, "lon": lon},
-            "timezone": tz_name,
-            "utc_time": utc_dt.isoformat(),
-            "julian_day": jd
-        }
+        return Chart(
+            moon_data["rashi"], moon_data["nakshatra"], moon_data["pada"], moon_data["longitude"],
+            moon_data["boundary_distance_days"], lat, lon, tz_name,
+            int((utc_dt - tztables.EPOCH_UTC).total_seconds()), jd
+        )
         
     except Exception as e:
         print(f"Error in calculate_birth_chart: {str(e)}")
         print(f"Traceback: {traceback.format_exc()}")
         return None
 
+def get_moon_longitudes(jds):
+    """Vectorized Moon longitudes for an array of Julian days"""
+    jds = np.asarray(jds, dtype=np.float64)
+    if moon_table is not None:
+        longitudes = moon_table.longitudes(jds)
+    else:
+        longitudes = np.full(len(jds), np.nan)
+    
+    # Anything the table does not cover goes to Swiss Ephemeris, once per distinct Julian day
+    missing = np.isnan(longitudes)
+    if missing.any():
+        unique_jds, inverse = np.unique(jds[missing], return_inverse=True)
+        if ephemeris_pool is not None and len(unique_jds) >= EPHEMERIS_POOL_MIN_BATCH:
+            computed = ephemeris_pool.moon_longitudes(unique_jds)
+        else:
+            computed = np.array([swe.calc_ut(jd, swe.MOON)[0][0] for jd in unique_jds])
+        longitudes[missing] = computed[inverse]
+    return longitudes
+
+def calculate_birth_charts_batch(dates, times, places=None, lats=None, lons=None, timezones=None):
+    """Calculate many birth charts at once from columnar inputs; returns ChartColumns"""
+    if not SWISS_EPHEMERIS_AVAILABLE:
+        raise Exception("Swiss Ephemeris not available. Install with: pip install pyswisseph geopy timezonefinder")
+    
+    if np.ndim(dates) != 1:
+        raise ValueError("dates must be a list")
+    n = len(dates)
+    for name, column in (("times", times), ("places", places), ("lats", lats), ("lons", lons),
+                         ("timezones", timezones)):
+        if column is not None and (np.ndim(column) != 1 or len(column) != n):
+            raise ValueError(f"{name} must be a list as long as dates")
+    
+    if places is not None:
+        # Resolve each distinct place once (distinct raw strings first, then normalized)
+        raw_places, raw_index = np.unique(np.asarray(places, dtype=str), return_inverse=True)
+        unique_places, place_index = np.unique([normalize_place(p) for p in raw_places], return_inverse=True)
+        place_index = place_index.reshape(-1)[raw_index.reshape(-1)]
+        resolved = [get_coordinates(p) for p in unique_places]
+        lats = np.array([r[0] for r in resolved], dtype=np.float64)[place_index]
+        lons = np.array([r[1] for r in resolved], dtype=np.float64)[place_index]
+        timezones = np.array([r[2] for r in resolved], dtype=object)[place_index]
+    elif lats is not None and lons is not None:
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if timezones is None:
+            unique_points, point_index = np.unique(np.stack([lats, lons], axis=1), axis=0, return_inverse=True)
+            resolved = [tz_resolver.timezone_at(lat, lon) or DEFAULT_LOCATION["tz"] for lat, lon in unique_points]
+            timezones = np.array(resolved, dtype=object)[point_index.reshape(-1)]
+        else:
+            timezones = np.asarray(timezones, dtype=object)
+    else:
+        raise ValueError("Either places or lats/lons are required")
+    
+    # Local -> UTC per timezone group through the transition tables, then Julian days
+    local_seconds = tztables.parse_local_seconds(dates, times)
+    utc_seconds = np.empty(n, dtype=np.int64)
+    for tz_name in set(timezones.tolist()):
+        mask = timezones == tz_name
+        utc_seconds[mask] = tztables.get_table(tz_name).to_utc_array(local_seconds[mask])
+    jds = tztables.julday_array(utc_seconds)
+    
+    # Moon longitude and classification, same rules as get_moon_data
+    longitudes = get_moon_longitudes(jds)
+    rashi_index = np.clip((longitudes // 30).astype(np.int64), 0, 11)
+    nakshatra_index = np.clip((longitudes // (360 / 27)).astype(np.int64), 0, 26)
+    pada = np.clip((longitudes // (360 / 108)).astype(np.int64), 0, 107) % 4 + 1
+    boundary_distance = np.full(n, np.nan)
+    if ingress_index is not None:
+        rashi, nakshatra, ingress_pada, distance = ingress_index.classify_array(jds)
+        covered = rashi > 0
+        rashi_index = np.where(covered, rashi - 1, rashi_index)
+        nakshatra_index = np.where(covered, nakshatra - 1, nakshatra_index)
+        pada = np.where(covered, ingress_pada, pada)
+        boundary_distance = distance
+    
+    return ChartColumns.from_arrays(
+        timezones,
+        julian_day=jds,
+        utc_seconds=utc_seconds,
+        longitude=longitudes,
+        rashi=rashi_index + 1,
+        nakshatra=nakshatra_index + 1,
+        pada=pada,
+        boundary_distance_days=boundary_distance,
+        lat=lats,
+        lon=lons
+    )
+
 def calculate_compatibility(chart1, chart2):
     """Calculate Vedic compatibility between two charts"""
     try:
@@ -429,6 +701,10 @@ NAKSHATRA_LORDS = [
     "Jupiter", "Saturn", "Mercury"
 ]
 
+def openai_api_base():
+    """Base URL of the chat completions API (OPENAI_API_BASE, e.g. a local stub in tests)"""
+    return os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/')
+
 @app.route('/force-refresh', methods=['GET'])
 def force_refresh():
     """Force refresh endpoint to trigger deployment"""
@@ -464,8 +740,8 @@ def test_openai():
             'max_tokens': 50
         }
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            f"{openai_api_base()}/chat/completions",
             headers=headers,
             json=payload,
             timeout=30
@@ -486,6 +762,7 @@ def debug_env():
     """Debug endpoint to check environment variables"""
     return jsonify({
         "OPENAI_API_KEY": "SET" if os.environ.get('OPENAI_API_KEY') else "NOT SET",
+        "OPENAI_API_BASE": openai_api_base(),
         "AZURE_OPENAI_API_KEY": "SET" if os.environ.get('AZURE_OPENAI_API_KEY') else "NOT SET",
         "AZURE_OPENAI_API_BASE": "SET" if os.environ.get('AZURE_OPENAI_API_BASE') else "NOT SET",
         "AZURE_OPENAI_ENDPOINT": "SET" if os.environ.get('AZURE_OPENAI_ENDPOINT') else "NOT SET",
@@ -493,6 +770,26 @@ def debug_env():
         "AZURE_OPENAI_API_VERSION": os.environ.get('AZURE_OPENAI_API_VERSION', 'NOT SET')
     })
 
+@app.route('/debug/cache-stats', methods=['GET'])
+def debug_cache_stats():
+    """Debug endpoint exposing cache hit/miss counters"""
+    return jsonify({
+        "geocode_cache": geocode_cache.stats(),
+        "gazetteer": gazetteer.stats() if gazetteer is not None else None,
+        "timezone_resolver": tz_resolver.stats() if tz_resolver is not None else None,
+        "moon_table": moon_table.info() if moon_table is not None else None,
+        "ingress_index": ingress_index.info() if ingress_index is not None else None,
+        "ephemeris_pool": ephemeris_pool.stats() if ephemeris_pool is not None else None,
+        "candidate_store": candidate_store.stats(),
+        "fragment_cache": fragment_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "chart_store": chart_store.stats(),
+        "enhanced_jobs": enhanced_jobs.stats(),
+        "report_cache": report_cache.stats(),
+        "http_client": http_client.stats(),
+        "singleflight": {group.name: group.stats() for group in (geocode_flight, chart_flight, report_flight)}
+    })
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "message": "Vedic Compatibility API v2.0 is running"})
@@ -512,64 +809,458 @@ def compatibility():
         partner1_data = data['partner1']
         partner2_data = data['partner2']
         
-        # Calculate birth charts
-        chart1 = calculate_birth_chart(partner1_data['date'], partner1_data['time'], partner1_data['place'])
-        chart2 = calculate_birth_chart(partner2_data['date'], partner2_data['time'], partner2_data['place'])
+        try:
+            ruleset = get_ruleset(data.get('ruleset'))
+            fields = parse_fields(request.args.get('fields'), CompatibilityResult.REPORT_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Repeat requests are answered from the response cache
+        cache_key = compatibility_cache_key('compatibility', data, ruleset, fields)
+        cached = response_cache.get(cache_key) if cache_key else None
+        if cached:
+            return conditional_response(*cached, "HIT")
+        
+        # Calculate birth charts (or load stored ones given by chart_id)
+        try:
+            chart1, _ = resolve_partner(partner1_data)
+            chart2, _ = resolve_partner(partner2_data)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
         
         if not chart1 or not chart2:
             return jsonify({"error": "Failed to calculate birth charts"}), 500
         
-        # Calculate compatibility
-        compatibility_data = calculate_compatibility(chart1, chart2)
+        # Only the requested sections of the report are computed, most of them come pre-rendered
+        result = CompatibilityResult(chart1, chart2, ruleset)
+        body = result.to_json(fields) + b"\n"
+        etag = response_cache.put(cache_key, body) if cache_key else make_etag(body)
+        return conditional_response(body, etag, "MISS")
+        
+    except Exception as e:
+        print(f"Error in compatibility endpoint: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+BATCH_COLUMNS = ("julian_day", "longitude", "rashi", "nakshatra", "pada", "rashi_lord", "nakshatra_lord",
+                 "boundary_distance_days", "lat", "lon", "timezone")
+
+@app.route('/api/charts/batch', methods=['POST'])
+def charts_batch():
+    """Calculate many birth charts from columnar arrays"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'dates' not in data or 'times' not in data:
+            return jsonify({"error": "Missing dates/times"}), 400
+        if 'places' not in data and ('lats' not in data or 'lons' not in data):
+            return jsonify({"error": "Missing places or lats/lons"}), 400
         
-        # Calculate Guna Milan (8 aspects of compatibility)
-        gun_milan_score = calculate_guna_milan(chart1, chart2)
-        max_possible_score = 36  # Maximum possible score in Guna Milan
+        try:
+            charts = calculate_birth_charts_batch(
+                data['dates'], data['times'],
+                places=data.get('places'),
+                lats=data.get('lats'),
+                lons=data.get('lons'),
+                timezones=data.get('timezones')
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid batch input: {e}"}), 400
         
-        # Generate detailed breakdown
-        breakdown = generate_gun_milan_breakdown(chart1, chart2)
+        return jsonify({
+            "count": len(charts),
+            "charts": charts.to_columns(BATCH_COLUMNS)
+        })
         
-        # Generate remarks and issues
-        remarks = generate_compatibility_remarks(gun_milan_score, max_possible_score)
-        issues_detected = detect_compatibility_issues(chart1, chart2, gun_milan_score)
+    except Exception as e:
+        print(f"Error in batch charts endpoint: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+# Candidate sets: persistent pools bucketed by chart class, referenced by id from /api/match
+candidate_store = CandidateStore(os.environ.get('CANDIDATE_STORE_PATH', 'candidates.db'))
+MATCH_MAX_CANDIDATES = int(os.environ.get('MATCH_MAX_CANDIDATES', 200000))
+MATCH_MAX_TOP_K = 1000
+
+fragment_cache = FragmentCache(int(os.environ.get('FRAGMENT_CACHE_PAIRS', 50000)))
+
+# Content-addressed chart store: charts computed once, then referenced by chart_id
+chart_store = ChartStore(os.environ.get('CHART_STORE_PATH', 'charts.bin'))
+EPOCH = datetime(1970, 1, 1)
+
+def chart_record(chart, local_date, local_time):
+    """Chart store record fields of a Chart"""
+    local = datetime.strptime(f"{local_date} {local_time}", "%Y-%m-%d %H:%M")
+    record = {field: getattr(chart, field) for field in Chart.__slots__}
+    record["local_seconds"] = int((local - EPOCH).total_seconds())
+    return record
+
+def chart_from_record(record):
+    """Chart rebuilt from a chart store record"""
+    return Chart(record["rashi"], record["nakshatra"], record["pada"], record["longitude"],
+                 record["boundary_distance_days"], record["lat"], record["lon"], record["timezone"],
+                 record["utc_seconds"], record["julian_day"])
+
+def store_chart(details):
+    """Chart of birth details from the chart store, computed and stored on first sight.
+    
+    Returns (chart_id, chart, created); chart is None when it cannot be calculated.
+    """
+    birth = normalized_birth(details)
+    if birth is None:
+        raise ValueError("date must be an existing YYYY-MM-DD date and time HH:MM between 00:00 and 23:59")
+    chart_id = make_chart_id(*birth)
+    record = chart_store.get(chart_id)
+    if record is not None:
+        return chart_id, chart_from_record(record), False
+    chart = calculate_birth_chart(birth[0], birth[1], details['place'])
+    if chart is None:
+        return chart_id, None, False
+    return chart_id, chart, chart_store.put(chart_id, chart_record(chart, birth[0], birth[1]))
+
+def resolve_partner(details):
+    """(chart, details) of a partner given by chart_id or by date/time/place.
+    
+    For a chart_id the details get the stored local date/time and coordinates, since the
+    enhanced report quotes them; an unknown chart_id raises LookupError.
+    """
+    if "chart_id" not in details:
+        return calculate_birth_chart(details['date'], details['time'], details['place']), details
+    record = chart_store.get(str(details["chart_id"]))
+    if record is None:
+        raise LookupError(f"Unknown chart_id: {details['chart_id']}")
+    local = EPOCH + timedelta(seconds=record["local_seconds"])
+    return chart_from_record(record), {
+        **details,
+        "date": local.strftime("%Y-%m-%d"),
+        "time": local.strftime("%H:%M"),
+        "place": f"{record['lat']:.4f}, {record['lon']:.4f} ({record['timezone']})"
+    }
+
+@app.route('/api/chart', methods=['POST'])
+def create_chart():
+    """Compute and store a birth chart under its content-addressed chart_id"""
+    try:
+        data = request.get_json()
+        if not data or not all(key in data for key in ('date', 'time', 'place')):
+            return jsonify({"error": "Missing date, time or place"}), 400
         
-        # Calculate spiritual alignment
-        spiritual_alignment_score = calculate_spiritual_alignment(chart1, chart2)
+        try:
+            chart_id, chart, created = store_chart(data)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid birth data: {e}"}), 400
         
-        # Format charts with proper names (already calculated by Swiss Ephemeris)
-        partner1_chart = {
-            "longitude": chart1["longitude"],
-            "nakshatra": chart1["nakshatra_name"],
-            "nakshatra_lord": chart1["nakshatra_lord"],
-            "rashi": chart1["rashi_name"],
-            "rashi_lord": chart1["rashi_lord"]
-        }
+        if chart is None:
+            return jsonify({"error": "Failed to calculate birth chart"}), 500
+        return jsonify({"chart_id": chart_id, "chart": chart.to_dict()}), 201 if created else 200
         
-        partner2_chart = {
-            "longitude": chart2["longitude"],
-            "nakshatra": chart2["nakshatra_name"],
-            "nakshatra_lord": chart2["nakshatra_lord"],
-            "rashi": chart2["rashi_name"],
-            "rashi_lord": chart2["rashi_lord"]
-        }
+    except Exception as e:
+        print(f"Error creating chart: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/chart/<chart_id>', methods=['GET'])
+def get_chart(chart_id):
+    """Show a stored chart"""
+    record = chart_store.get(chart_id)
+    if record is None:
+        return jsonify({"error": "Unknown chart_id"}), 404
+    return jsonify({"chart_id": chart_id, "chart": chart_from_record(record).to_dict()})
+
+def parse_candidates(data):
+    """Validate and resolve the "candidates" list of a candidate-set request into store rows"""
+    if not data or not isinstance(data.get('candidates'), list):
+        raise ValueError("Missing candidates")
+    if len(data['candidates']) > MATCH_MAX_CANDIDATES:
+        raise ValueError(f"At most {MATCH_MAX_CANDIDATES} candidates per request")
+    ids, rashis, nakshatras, padas = resolve_profiles(data['candidates'])
+    return zip(ids, rashis.tolist(), nakshatras.tolist(), padas.tolist())
+
+@app.route('/api/candidate-sets', methods=['POST'])
+def create_candidate_set():
+    """Register a candidate set for repeated matching"""
+    try:
+        try:
+            rows = parse_candidates(request.get_json())
+        except ValueError as e:
+            return jsonify({"error": f"Invalid candidates: {e}"}), 400
         
-        # Return the complete compatibility report
-        report = {
-            "gun_milan_score": gun_milan_score,
-            "max_possible_score": max_possible_score,
-            "compatibility_level": compatibility_data["compatibility_level"],
-            "breakdown": breakdown,
-            "remarks": remarks,
-            "issues_detected": issues_detected,
-            "spiritual_alignment_score": spiritual_alignment_score,
-            "partner1_chart": partner1_chart,
-            "partner2_chart": partner2_chart
-        }
+        set_id = uuid.uuid4().hex
+        candidate_store.create_pool(set_id)
+        candidate_store.upsert(set_id, rows)
         
-        return jsonify(report)
+        return jsonify({"candidate_set": set_id, "count": candidate_store.count(set_id)}), 201
         
     except Exception as e:
-        print(f"Error in compatibility endpoint: {str(e)}")
+        print(f"Error creating candidate set: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def class_label(class_id):
+    """"Rashi/Nakshatra" of an index class, with "/pada N" when the pada is known"""
+    rashi, nakshatra, pada = class_chart(int(class_id))
+    label = f"{RASHIS[rashi - 1]}/{NAKSHATRAS[nakshatra - 1]}"
+    return f"{label}/pada {pada}" if pada else label
+
+@app.route('/api/candidate-sets/<set_id>', methods=['GET', 'DELETE'])
+def candidate_set(set_id):
+    """Show or drop a candidate set"""
+    if not candidate_store.has_pool(set_id):
+        return jsonify({"error": "Unknown candidate_set"}), 404
+    if request.method == 'DELETE':
+        candidate_store.delete_pool(set_id)
+        return jsonify({"candidate_set": set_id, "deleted": True})
+    
+    counts = candidate_store.class_counts(set_id)
+    classes = {class_label(class_id): int(counts[class_id]) for class_id in np.flatnonzero(counts)}
+    return jsonify({"candidate_set": set_id, "count": int(counts.sum()), "classes": classes})
+
+@app.route('/api/candidate-sets/<set_id>/candidates', methods=['PUT'])
+def upsert_candidates(set_id):
+    """Insert or update candidates in a set"""
+    try:
+        if not candidate_store.has_pool(set_id):
+            return jsonify({"error": "Unknown candidate_set"}), 404
+        try:
+            rows = parse_candidates(request.get_json())
+        except ValueError as e:
+            return jsonify({"error": f"Invalid candidates: {e}"}), 400
+        
+        upserted = candidate_store.upsert(set_id, rows)
+        return jsonify({"candidate_set": set_id, "upserted": upserted, "count": candidate_store.count(set_id)})
+        
+    except Exception as e:
+        print(f"Error updating candidate set: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/candidate-sets/<set_id>/candidates/<candidate_id>', methods=['GET', 'DELETE'])
+def candidate(set_id, candidate_id):
+    """Show or remove one candidate of a set"""
+    if not candidate_store.has_pool(set_id):
+        return jsonify({"error": "Unknown candidate_set"}), 404
+    stored = candidate_store.get(set_id, candidate_id)
+    if stored is None:
+        return jsonify({"error": "Unknown candidate"}), 404
+    if request.method == 'DELETE':
+        candidate_store.delete(set_id, candidate_id)
+        return jsonify({"candidate_set": set_id, "id": stored["id"], "deleted": True})
+    return jsonify(stored)
+
+@app.route('/api/rulesets', methods=['GET'])
+def list_rulesets():
+    """Koota rule sets available to the scoring endpoints"""
+    return jsonify({"default": DEFAULT_RULESET.name, "rulesets": [ruleset.info() for ruleset in RULESETS.values()]})
+
+@app.route('/api/match', methods=['POST'])
+def match():
+    """Rank a candidate set against one seeker by Guna Milan score"""
+    try:
+        start = time.perf_counter()
+        data = request.get_json()
+        
+        if not data or 'seeker' not in data:
+            return jsonify({"error": "Missing seeker"}), 400
+        if 'candidates' not in data and 'candidate_set' not in data:
+            return jsonify({"error": "Missing candidates or candidate_set"}), 400
+        
+        try:
+            top_k = int(data.get('top_k', 10))
+            if not 1 <= top_k <= MATCH_MAX_TOP_K:
+                raise ValueError(f"top_k must be between 1 and {MATCH_MAX_TOP_K}")
+            min_score = float(data.get('min_score', 0))
+            filters = parse_koota_filters(data.get('filters'))
+            ruleset = get_ruleset(data.get('ruleset'))
+            seeker_rashi, seeker_nakshatra, seeker_class = resolve_seeker(data['seeker'], ruleset)
+            
+            if 'candidate_set' in data:
+                if not candidate_store.has_pool(data['candidate_set']):
+                    return jsonify({"error": "Unknown candidate_set"}), 404
+                members, scores, eligible = top_k_from_pool(
+                    seeker_class, data['candidate_set'], top_k, min_score, filters, ruleset
+                )
+                charts = [(candidate_id,) + class_chart(class_id)[:2] for candidate_id, class_id in members]
+                total = candidate_store.count(data['candidate_set'])
+            else:
+                if not isinstance(data['candidates'], list) or len(data['candidates']) > MATCH_MAX_CANDIDATES:
+                    raise ValueError(f"candidates must be a list of at most {MATCH_MAX_CANDIDATES}")
+                ids, rashis, nakshatras, padas = resolve_profiles(data['candidates'])
+                classes = ruleset.classes_of(rashis, nakshatras, padas)
+                indices, scores, eligible = top_k_matches(seeker_class, classes, top_k, min_score, filters, ruleset)
+                charts = [(ids[index], int(rashis[index]), int(nakshatras[index])) for index in indices.tolist()]
+                total = len(ids)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid match input: {e}"}), 400
+        
+        matches = [ranked_candidate(candidate_id, rashi, nakshatra, row)
+                   for (candidate_id, rashi, nakshatra), row in zip(charts, scores.tolist())]
+        
+        return jsonify({
+            "seeker": {"rashi": RASHIS[seeker_rashi - 1], "nakshatra": NAKSHATRAS[seeker_nakshatra - 1]},
+            "ruleset": ruleset.name,
+            "candidates": total,
+            "eligible": eligible,
+            "max_possible_score": 36,
+            "matches": matches,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        
+    except Exception as e:
+        print(f"Error in match endpoint: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+QUERY_MAX_LIMIT = 1000
+
+def resolve_seeker(profile, ruleset):
+    """(rashi, nakshatra, class in the rule set) of the seeker profile"""
+    _, rashis, nakshatras, padas = resolve_profiles([profile])
+    return int(rashis[0]), int(nakshatras[0]), ruleset.class_of(rashis[0], nakshatras[0], padas[0])
+
+def ranked_candidate(candidate_id, rashi, nakshatra, row):
+    """Result entry for one candidate; row holds the koota scores and total in table units"""
+    return {
+        "id": candidate_id,
+        "gun_milan_score": to_points(row[GUNA_TOTAL]),
+        "rashi": RASHIS[rashi - 1],
+        "nakshatra": NAKSHATRAS[nakshatra - 1],
+        "breakdown": {koota: to_points(score) for koota, score in zip(KOOTAS, row[:GUNA_TOTAL])}
+    }
+
+@app.route('/api/query', methods=['POST'])
+def query():
+    """Paginated candidates of a set matching score, koota and issue predicates"""
+    try:
+        start = time.perf_counter()
+        data = request.get_json()
+        
+        if not data or 'seeker' not in data or 'candidate_set' not in data:
+            return jsonify({"error": "Missing seeker or candidate_set"}), 400
+        if not candidate_store.has_pool(data['candidate_set']):
+            return jsonify({"error": "Unknown candidate_set"}), 404
+        
+        try:
+            limit = int(data.get('limit', 50))
+            if not 1 <= limit <= QUERY_MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {QUERY_MAX_LIMIT}")
+            filters = parse_koota_filters(data.get('filters'))
+            filters += parse_exclude_doshas(data.get('exclude_doshas'))
+            predicates = {
+                "min_score": float(data.get('min_score', 0)),
+                "max_score": float(data.get('max_score', 36)),
+                "filters": filters,
+                "exclude_issues": parse_issue_names(data.get('exclude_issues'))
+            }
+            ruleset = get_ruleset(data.get('ruleset'))
+            _, _, seeker_class = resolve_seeker(data['seeker'], ruleset)
+            members, next_cursor, qualifying_classes, in_scope = query_pool(
+                seeker_class, data['candidate_set'], limit, data.get('cursor'), ruleset, **predicates
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query: {e}"}), 400
+        
+        scores, issue_masks, _ = pool_scores(seeker_class, ruleset)
+        results = []
+        for candidate_id, class_id in members:
+            rashi, nakshatra, _ = class_chart(class_id)
+            result = ranked_candidate(candidate_id, rashi, nakshatra, scores[class_id].tolist())
+            result["issues"] = [name for i, name in enumerate(ISSUE_NAMES) if issue_masks[class_id] & (1 << i)]
+            results.append(result)
+        
+        return jsonify({
+            "ruleset": ruleset.name,
+            "results": results,
+            "next_cursor": next_cursor,
+            "plan": {"qualifying_classes": qualifying_classes, "candidates_in_scope": in_scope},
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        
+    except Exception as e:
+        print(f"Error in query endpoint: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        return jsonify({"error": "Internal server error"}), 500
+
+MATRIX_TILE_ROWS = int(os.environ.get('MATRIX_TILE_ROWS', 256))
+MATRIX_TILE_COLUMNS = int(os.environ.get('MATRIX_TILE_COLUMNS', 4096))
+MATRIX_MAX_MATERIALIZED = int(os.environ.get('MATRIX_MAX_MATERIALIZED', 1000000))
+
+# Binary matrix tiles: row offset, column offset, rows, columns (uint32 little-endian), then the uint8 scores
+MATRIX_TILE_HEADER = struct.Struct("<IIII")
+
+def matrix_side_classes(data, side, ruleset):
+    """Rule-set classes for one side of a matrix request, inline profiles or a registered candidate set"""
+    if f"{side}_set" in data:
+        if not candidate_store.has_pool(data[f"{side}_set"]):
+            raise ValueError(f"unknown {side}_set")
+        classes = ruleset.fine_to_class[candidate_store.members(data[f"{side}_set"])[1]]
+        if (classes < 0).any():
+            raise ValueError(f"ruleset {ruleset.name} needs a pada for every member of {side}_set")
+        return classes
+    if not isinstance(data.get(side), list) or len(data[side]) > MATCH_MAX_CANDIDATES:
+        raise ValueError(f"{side} must be a list of at most {MATCH_MAX_CANDIDATES} profiles")
+    _, rashis, nakshatras, padas = resolve_profiles(data[side])
+    return ruleset.classes_of(rashis, nakshatras, padas)
+
+@app.route('/api/matrix', methods=['POST'])
+def matrix():
+    """Stream the Guna Milan score matrix of two cohorts in tiles"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({"error": "Missing rows/columns"}), 400
+        
+        try:
+            ruleset = get_ruleset(data.get('ruleset'))
+            row_classes = matrix_side_classes(data, "rows", ruleset)
+            column_classes = matrix_side_classes(data, "columns", ruleset)
+            koota = data.get('koota', 'total')
+            if koota != 'total' and koota not in KOOTAS:
+                raise ValueError(f"unknown koota: {koota}")
+            koota_index = GUNA_TOTAL if koota == 'total' else KOOTAS.index(koota)
+            tile_rows = max(1, min(int(data.get('tile_rows', MATRIX_TILE_ROWS)), MATRIX_TILE_ROWS))
+            tile_columns = max(1, min(int(data.get('tile_columns', MATRIX_TILE_COLUMNS)), MATRIX_TILE_COLUMNS))
+            output = data.get('format', 'ndjson')
+            if output not in ('ndjson', 'binary', 'json'):
+                raise ValueError("format must be ndjson, binary or json")
+        except ValueError as e:
+            return jsonify({"error": f"Invalid matrix input: {e}"}), 400
+        
+        shape_headers = {"X-Matrix-Rows": str(len(row_classes)), "X-Matrix-Columns": str(len(column_classes)),
+                         "X-Ruleset": ruleset.name}
+        tiles = iter_guna_tiles(row_classes, column_classes, tile_rows, tile_columns, koota_index, ruleset)
+        
+        def points(block):
+            """Table units to JSON points: integers unless the rule set has half points"""
+            return (block // HALF).tolist() if ruleset.integral else (block / HALF).tolist()
+        
+        if output == 'json':
+            # Fully materialized matrix, only on request and only up to a size limit
+            if len(row_classes) * len(column_classes) > MATRIX_MAX_MATERIALIZED:
+                return jsonify({"error": f"Matrix larger than {MATRIX_MAX_MATERIALIZED} cells; use ndjson or binary"}), 400
+            scores = np.empty((len(row_classes), len(column_classes)), dtype=np.uint8)
+            for row_offset, column_offset, block in tiles:
+                scores[row_offset:row_offset + block.shape[0], column_offset:column_offset + block.shape[1]] = block
+            return jsonify({"rows": len(row_classes), "columns": len(column_classes), "koota": koota,
+                            "ruleset": ruleset.name, "matrix": points(scores)})
+        
+        if output == 'binary':
+            # uint8 points for whole-point rule sets, uint8 half points otherwise
+            divisor = HALF if ruleset.integral else 1
+            def generate():
+                for row_offset, column_offset, block in tiles:
+                    yield MATRIX_TILE_HEADER.pack(row_offset, column_offset, *block.shape) + (block // divisor).tobytes()
+            return Response(generate(), mimetype='application/octet-stream',
+                            headers={**shape_headers, "X-Score-Unit": str(divisor / HALF)})
+        
+        def generate():
+            for row_offset, column_offset, block in tiles:
+                yield json.dumps({"row_offset": row_offset, "column_offset": column_offset,
+                                  "scores": points(block)}, separators=(",", ":")) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson', headers=shape_headers)
+        
+    except Exception as e:
+        print(f"Error in matrix endpoint: {str(e)}")
         print(f"Traceback: {traceback.format_exc()}")
         return jsonify({"error": "Internal server error"}), 500
 
@@ -585,93 +1276,98 @@ def enhanced_compatibility():
         partner1_data = data['partner1']
         partner2_data = data['partner2']
         
-        # Calculate birth charts
-        chart1 = calculate_birth_chart(partner1_data['date'], partner1_data['time'], partner1_data['place'])
-        chart2 = calculate_birth_chart(partner2_data['date'], partner2_data['time'], partner2_data['place'])
-        
-        if not chart1 or not chart2:
-            return jsonify({"error": "Failed to calculate birth charts"}), 500
-        
-        # Calculate compatibility
-        compatibility_data = calculate_compatibility(chart1, chart2)
-        
-        # Calculate Guna Milan (8 aspects of compatibility)
-        gun_milan_score = calculate_guna_milan(chart1, chart2)
-        max_possible_score = 36  # Maximum possible score in Guna Milan
-        
-        # Generate detailed breakdown
-        breakdown = generate_gun_milan_breakdown(chart1, chart2)
-        
-        # Generate remarks and issues
-        remarks = generate_compatibility_remarks(gun_milan_score, max_possible_score)
-        issues_detected = detect_compatibility_issues(chart1, chart2, gun_milan_score)
+        try:
+            ruleset = get_ruleset(data.get('ruleset'))
+            fields = parse_fields(request.args.get('fields'), CompatibilityResult.ENHANCED_FIELDS + ("enhanced_report",))
+            cache_mode = request.args.get('cache_mode') or data.get('cache_mode') or MODE_DEFAULT
+            if cache_mode not in MODES:
+                raise ValueError(f"cache_mode must be one of: {', '.join(MODES)}")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Calculate spiritual alignment
-        spiritual_alignment_score = calculate_spiritual_alignment(chart1, chart2)
+        # The report is generated by a background job unless the client asks to wait for it or to stream it
+        sync = request.args.get('sync', '').lower() == 'true' or data.get('sync') is True
+        stream = "enhanced_report" in fields and (request.args.get('stream', '').lower() == 'true' or data.get('stream') is True)
+        background = "enhanced_report" in fields and not sync and not stream
         
-        # Generate custom affirmations and mantras based on nakshatra
-        custom_affirmations = generate_custom_affirmations(chart1, chart2)
-        personalized_mantras = generate_personalized_mantras(chart1, chart2)
-        couple_synergy = calculate_couple_synergy(chart1, chart2)
+        # The partner details are echoed in vedic_data, so they are part of the key
+        cache_key = None if background or stream else compatibility_cache_key('enhanced', data, ruleset, fields, partner1_data, partner2_data)
+        cached = response_cache.get(cache_key) if cache_key and cache_mode != MODE_REFRESH else None
+        if cached:
+            return conditional_response(*cached, "HIT")
         
-        # Format charts with proper Sanskrit names (already calculated by Swiss Ephemeris)
-        partner1_chart = {
-            "longitude": chart1["longitude"],
-            "nakshatra": chart1["nakshatra_name"],
-            "nakshatra_lord": chart1["nakshatra_lord"],
-            "rashi": chart1["rashi_name"],
-            "rashi_lord": chart1["rashi_lord"]
-        }
+        # Calculate birth charts (or load stored ones given by chart_id)
+        try:
+            chart1, partner1_details = resolve_partner(partner1_data)
+            chart2, partner2_details = resolve_partner(partner2_data)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
         
-        partner2_chart = {
-            "longitude": chart2["longitude"],
-            "nakshatra": chart2["nakshatra_name"],
-            "nakshatra_lord": chart2["nakshatra_lord"],
-            "rashi": chart2["rashi_name"],
-            "rashi_lord": chart2["rashi_lord"]
-        }
+        if not chart1 or not chart2:
+            return jsonify({"error": "Failed to calculate birth charts"}), 500
         
-        # Prepare Vedic data for GPT-4o
-        vedic_data = {
-            "gun_milan_score": gun_milan_score,
-            "max_possible_score": max_possible_score,
-            "compatibility_level": compatibility_data["compatibility_level"],
-            "breakdown": breakdown,
-            "remarks": remarks,
-            "issues_detected": issues_detected,
-            "spiritual_alignment_score": spiritual_alignment_score,
-            "partner1_chart": partner1_chart,
-            "partner2_chart": partner2_chart,
-            "partner1_details": partner1_data,
-            "partner2_details": partner2_data,
-            "custom_affirmations": custom_affirmations,
-            "personalized_mantras": personalized_mantras,
-            "couple_synergy": couple_synergy
-        }
+        result = CompatibilityResult(chart1, chart2, ruleset, partner1_details, partner2_details)
+        vedic_data = result.to_json([field for field in fields if field != "enhanced_report"])
+        response = [embed_fragment("vedic_data", vedic_data)]
         
-        # Generate enhanced report using GPT-4o
-        enhanced_report = generate_enhanced_report(vedic_data)
+        # GPT-4o sees the full Vedic data; it is only called when the report is requested
+        enhanced_report = None
+        if "enhanced_report" in fields:
+            report_input = result.to_dict(CompatibilityResult.ENHANCED_FIELDS)
+            payload = enhanced_report_request(report_input)
+            if cache_mode != MODE_REFRESH:
+                # A report already generated for this input needs no job
+                enhanced_report = report_cache.get(fingerprint(payload))
+            if stream:
+                # vedic_data goes out before the LLM is called
+                events = enhanced_report_events(vedic_data, payload, fingerprint(payload), enhanced_report, cache_mode)
+                return Response(events, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            if enhanced_report is None and cache_mode == MODE_CACHE_ONLY:
+                body = join_fragments([
+                    render_fragment("error", "No cached enhanced report for this input"),
+                    embed_fragment("vedic_data", vedic_data)
+                ])
+                return Response(body + b"\n", status=404, mimetype='application/json')
+            if enhanced_report is None:
+                try:
+                    # Requests for the same report input share one job; a refresh always gets a new one
+                    job_key = None if cache_mode == MODE_REFRESH else request_key("enhanced_report", report_input)
+                    job, _ = enhanced_jobs.submit({"vedic_data": report_input}, job_key)
+                except QueueFull:
+                    response = jsonify({"error": "Too many enhanced reports in progress, try again later"})
+                    response.headers['Retry-After'] = "5"
+                    return response, 503
+                if sync:
+                    job = enhanced_jobs.wait(job["job_id"], ENHANCED_SYNC_WAIT)
+                if job["status"] not in FINISHED:
+                    return job_response(job, vedic_data)
+                enhanced_report = job["result"] if job["status"] == STATUS_DONE else {"error": job["error"]}
+            response.insert(0, render_fragment("enhanced_report", enhanced_report))
         
-        return jsonify({
-            "vedic_data": vedic_data,
-            "enhanced_report": enhanced_report
-        })
+        body = join_fragments(response) + b"\n"
+        # Failed reports are not cached so the next request tries again
+        if cache_key and not (isinstance(enhanced_report, dict) and "error" in enhanced_report):
+            etag = response_cache.put(cache_key, body)
+        else:
+            etag = make_etag(body)
+        return conditional_response(body, etag, "MISS")
         
     except Exception as e:
         print(f"Error in enhanced compatibility endpoint: {str(e)}")
         print(f"Traceback: {traceback.format_exc()}")
         return jsonify({"error": "Internal server error"}), 500
 
-def generate_enhanced_report(vedic_data):
-    """Generate enhanced report using GPT-4o"""
-    try:
-        # Check if OpenAI API key is available
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            return {"error": "OpenAI API key not configured"}
-        
-        # Create comprehensive prompt for GPT-4o
-        prompt = f"""You are a master spiritual relationship coach and Vedic wisdom expert with 50+ years of experience. Generate a MAGICAL, TRANSFORMATIVE, and DEEPLY PERSONALIZED relationship enhancement report for this couple.
+# Generated reports by fingerprint of the model request, so a repeated report input costs no LLM call
+report_cache = ReportCache(
+    os.environ.get('REPORT_CACHE_PATH', 'report_cache.db'),
+    max_bytes=int(os.environ.get('REPORT_CACHE_BYTES', 256 * 1024 * 1024)),
+    ttl=float(os.environ.get('REPORT_CACHE_TTL', 30 * 24 * 3600))
+)
+
+def enhanced_report_request(vedic_data):
+    """Chat completions request (model parameters and messages) for the enhanced report of vedic_data"""
+    # Create comprehensive prompt for GPT-4o
+    prompt = f"""You are a master spiritual relationship coach and Vedic wisdom expert with 50+ years of experience. Generate a MAGICAL, TRANSFORMATIVE, and DEEPLY PERSONALIZED relationship enhancement report for this couple.
 
 PARTNER DETAILS:
 {vedic_data['partner1_details'].get('name', 'Partner 1')}: Born on {vedic_data['partner1_details']['date']} at {vedic_data['partner1_details']['time']} in {vedic_data['partner1_details']['place']}
@@ -755,33 +1451,59 @@ CRITICAL REQUIREMENTS:
 
 Generate a report that would make a master spiritual relationship coach proud - magical, transformative, deeply personalized, and focused on creating a beautiful, lasting love story for {vedic_data['partner1_details'].get('name', 'Partner 1')} and {vedic_data['partner2_details'].get('name', 'Partner 2')}."""
 
+    return {
+        'model': 'gpt-4o',
+        'messages': [
+            {
+                'role': 'system',
+                'content': 'You are a master Vedic astrologer with 50+ years of experience in relationship compatibility analysis. You have deep knowledge of Vedic astrology, Guna Milan, Nakshatra matching, and spiritual relationship dynamics. Generate COMPLETELY ACCURATE, COMPREHENSIVE, and HIGHLY PERSONALIZED compatibility reports based on provided birth details and Vedic calculations. Your reports should be beautiful, meaningful, and actionable. Return ONLY valid JSON, no markdown or extra text. Every section should be deeply personalized and specific to the couple.'
+            },
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ],
+        'temperature': 0.8,
+        'max_tokens': 4000,
+        'top_p': 0.9,
+        'frequency_penalty': 0.1,
+        'presence_penalty': 0.1
+    }
+
+def report_flight_key(vedic_data, cache_mode=MODE_DEFAULT):
+    """Coalescing key of a report: the model request fingerprint and cache mode"""
+    try:
+        return fingerprint(enhanced_report_request(vedic_data)), cache_mode
+    except Exception:
+        # Malformed data is not shared; the call itself reports the error
+        return id(vedic_data), cache_mode
+
+@report_flight.coalesce(report_flight_key)
+def generate_enhanced_report(vedic_data, cache_mode=MODE_DEFAULT):
+    """Generate enhanced report using GPT-4o, through the persistent report cache"""
+    try:
+        payload = enhanced_report_request(vedic_data)
+        report_key = fingerprint(payload)
+        if cache_mode != MODE_REFRESH:
+            cached_report = report_cache.get(report_key)
+            if cached_report is not None:
+                return cached_report
+        if cache_mode == MODE_CACHE_ONLY:
+            return {"error": "No cached enhanced report for this input"}
+        
+        # Check if OpenAI API key is available
+        openai_api_key = os.environ.get('OPENAI_API_KEY')
+        if not openai_api_key:
+            return {"error": "OpenAI API key not configured"}
+        
         # Call OpenAI API (standard, not Azure)
         headers = {
             'Authorization': f'Bearer {openai_api_key}',
             'Content-Type': 'application/json'
         }
         
-        payload = {
-            'model': 'gpt-4o',
-            'messages': [
-                {
-                    'role': 'system',
-                    'content': 'You are a master Vedic astrologer with 50+ years of experience in relationship compatibility analysis. You have deep knowledge of Vedic astrology, Guna Milan, Nakshatra matching, and spiritual relationship dynamics. Generate COMPLETELY ACCURATE, COMPREHENSIVE, and HIGHLY PERSONALIZED compatibility reports based on provided birth details and Vedic calculations. Your reports should be beautiful, meaningful, and actionable. Return ONLY valid JSON, no markdown or extra text. Every section should be deeply personalized and specific to the couple.'
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ],
-            'temperature': 0.8,
-            'max_tokens': 4000,
-            'top_p': 0.9,
-            'frequency_penalty': 0.1,
-            'presence_penalty': 0.1
-        }
-        
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        response = http_client.post(
+            f"{openai_api_base()}/chat/completions",
             headers=headers,
             json=payload,
             timeout=60
@@ -793,194 +1515,408 @@ Generate a report that would make a master spiritual relationship coach proud -
         result = response.json()
         content = result['choices'][0]['message']['content']
         
-        # Parse the JSON response
-        try:
-            # Remove any non-JSON content that might be present
-            import re
-            json_str = re.sub(r'^```json\s*|\s*```$', '', content.strip())
-            enhanced_report = json.loads(json_str)
-            return enhanced_report
-        except json.JSONDecodeError as e:
-            return {"error": f"Failed to parse GPT response: {str(e)}", "raw_content": content}
+        enhanced_report = parse_enhanced_report(content)
+        if "error" not in enhanced_report:
+            report_cache.put(report_key, enhanced_report)
+        return enhanced_report
             
     except Exception as e:
         print(f"Error generating enhanced report: {str(e)}")
         return {"error": f"Failed to generate enhanced report: {str(e)}"}
 
-def calculate_guna_milan(chart1, chart2):
+def parse_enhanced_report(content):
+    """The report JSON in GPT-4o's message content, or an error dict"""
+    try:
+        # Remove any non-JSON content that might be present
+        json_str = re.sub(r'^```json\s*|\s*```$', '', content.strip())
+        return json.loads(json_str)
+    except json.JSONDecodeError as e:
+        return {"error": f"Failed to parse GPT response: {str(e)}", "raw_content": content}
+
+def sse_event(event, encoded):
+    """One server-sent event whose data is JSON bytes (compact JSON never contains a newline)"""
+    return b"event: " + event.encode() + b"\ndata: " + encoded + b"\n\n"
+
+def stream_enhanced_report(payload, report_key):
+    """Yield (event, value) while GPT-4o streams the report: a delta per piece of content, then the report or an error"""
+    openai_api_key = os.environ.get('OPENAI_API_KEY')
+    if not openai_api_key:
+        yield "error", {"error": "OpenAI API key not configured"}
+        return
+    
+    headers = {
+        'Authorization': f'Bearer {openai_api_key}',
+        'Content-Type': 'application/json'
+    }
+    # Streams outlive the API request, so they get their own budget
+    response = http_client.post(
+        f"{openai_api_base()}/chat/completions",
+        headers=headers,
+        json=dict(payload, stream=True),
+        stream=True,
+        timeout=60,
+        deadline=Deadline(LLM_DEADLINE)
+    )
+    with response:
+        if response.status_code != 200:
+            yield "error", {"error": f"OpenAI API error: {response.status_code}"}
+            return
+        
+        # Chunks arrive as "data: {...}" lines, the last one being "data: [DONE]"
+        parts = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            chunk = line[5:].strip()
+            if chunk == "[DONE]":
+                break
+            choices = json.loads(chunk).get("choices") or [{}]
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                parts.append(content)
+                yield "delta", content
+    
+    enhanced_report = parse_enhanced_report("".join(parts))
+    if "error" in enhanced_report:
+        yield "error", enhanced_report
+        return
+    report_cache.put(report_key, enhanced_report)
+    yield "report", enhanced_report
+
+def enhanced_report_events(vedic_data, payload, report_key, cached_report, cache_mode):
+    """Server-sent events of a streamed enhanced report: vedic_data, deltas of the LLM output, the report, done"""
+    yield sse_event("vedic_data", vedic_data)
+    try:
+        if cached_report is not None:
+            yield sse_event("report", json.dumps(cached_report).encode())
+        elif cache_mode == MODE_CACHE_ONLY:
+            yield sse_event("error", json.dumps({"error": "No cached enhanced report for this input"}).encode())
+        else:
+            for event, value in stream_enhanced_report(payload, report_key):
+                yield sse_event(event, json.dumps({"content": value} if event == "delta" else value).encode())
+    except Exception as e:
+        print(f"Error streaming enhanced report: {str(e)}")
+        yield sse_event("error", json.dumps({"error": f"Failed to generate enhanced report: {str(e)}"}).encode())
+    yield sse_event("done", b"{}")
+
+def enhanced_report_job(payload):
+    """Job handler: the GPT-4o report for a vedic_data payload, raising on failure so the job is marked failed"""
+    # Jobs are only queued when the report cache had nothing usable, so they always call the model
+    with deadline(LLM_DEADLINE):
+        enhanced_report = generate_enhanced_report(payload["vedic_data"], MODE_REFRESH)
+    if "error" in enhanced_report:
+        raise RuntimeError(enhanced_report["error"])
+    return enhanced_report
+
+# Bounded pool of LLM calls; jobs are kept in SQLite so queued reports survive a restart (recovered in main())
+enhanced_jobs = JobQueue(
+    os.environ.get('JOB_STORE_PATH', 'jobs.db'),
+    enhanced_report_job,
+    workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_queued=int(os.environ.get('JOB_MAX_QUEUED', 1000)),
+    lease=float(os.environ.get('JOB_LEASE', 60))
+)
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', 30))
+ENHANCED_SYNC_WAIT = float(os.environ.get('ENHANCED_SYNC_WAIT', 90))
+
+def job_response(job, vedic_data=None):
+    """A job as JSON, with the rendered vedic_data when given; 202 until the job has finished"""
+    # Job keys all sort before "vedic_data", so appending it keeps jsonify's key order
+    fragments = [render_fragment(name, value) for name, value in job.items()]
+    if vedic_data is not None:
+        fragments.append(embed_fragment("vedic_data", vedic_data))
+    status = 200 if job["status"] in FINISHED else 202
+    response = Response(join_fragments(fragments) + b"\n", status=status, mimetype='application/json')
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background job; ?wait=N long-polls up to N seconds for it to finish"""
+    try:
+        wait = min(float(request.args.get('wait', 0)), JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    job = enhanced_jobs.wait(job_id, wait) if wait > 0 else enhanced_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job_id: {job_id}"}), 404
+    return jsonify(job)
+
+def calculate_guna_milan(chart1, chart2, ruleset=None):
     """Calculate Guna Milan score (1-36)"""
-    score = 0
-    
-    # Varna (1 point)
-    varna1 = (chart1["rashi"] - 1) % 4
-    varna2 = (chart2["rashi"] - 1) % 4
-    if varna1 == varna2:
-        score += 1
-    
-    # Vashya (2 points)
-    vashya_score = calculate_vashya_compatibility(chart1["rashi"], chart2["rashi"])
-    score += vashya_score
-    
-    # Tara (3 points)
-    tara_score = calculate_tara_compatibility(chart1["nakshatra"], chart2["nakshatra"])
-    score += tara_score
-    
-    # Yoni (4 points)
-    yoni_score = calculate_yoni_compatibility(chart1["nakshatra"], chart2["nakshatra"])
-    score += yoni_score
-    
-    # Graha Maitri (5 points)
-    graha_score = calculate_graha_maitri(chart1["rashi"], chart2["rashi"])
-    score += graha_score
-    
-    # Gana (6 points)
-    gana_score = calculate_gana_compatibility(chart1["nakshatra"], chart2["nakshatra"])
-    score += gana_score
-    
-    # Bhakoot (7 points)
-    bhakoot_score = calculate_bhakoot_compatibility(chart1["rashi"], chart2["rashi"])
-    score += bhakoot_score
-    
-    # Nadi (8 points)
-    nadi_score = calculate_nadi_compatibility(chart1["nakshatra"], chart2["nakshatra"])
-    score += nadi_score
-    
-    return score
-
-def calculate_vashya_compatibility(rashi1, rashi2):
-    """Calculate Vashya compatibility (0-2 points)"""
-    # Simplified calculation
-    diff = abs(rashi1 - rashi2)
-    if diff == 0:
-        return 2
-    elif diff in [1, 11]:
-        return 1
-    else:
-        return 0
-
-def calculate_tara_compatibility(nakshatra1, nakshatra2):
-    """Calculate Tara compatibility (0-3 points)"""
-    # Simplified calculation
-    diff = abs(nakshatra1 - nakshatra2)
-    if diff == 0:
-        return 3
-    elif diff in [1, 2, 3]:
-        return 2
-    elif diff in [4, 5, 6]:
-        return 1
-    else:
-        return 0
-
-def calculate_yoni_compatibility(nakshatra1, nakshatra2):
-    """Calculate Yoni compatibility (0-4 points)"""
-    # Simplified calculation
-    diff = abs(nakshatra1 - nakshatra2)
-    if diff == 0:
-        return 4
-    elif diff in [1, 2]:
-        return 3
-    elif diff in [3, 4]:
-        return 2
-    elif diff in [5, 6]:
-        return 1
-    else:
-        return 0
-
-def calculate_graha_maitri(rashi1, rashi2):
-    """Calculate Graha Maitri compatibility (0-5 points)"""
-    # Simplified calculation
-    diff = abs(rashi1 - rashi2)
-    if diff == 0:
-        return 5
-    elif diff in [1, 5, 9]:
-        return 4
-    elif diff in [2, 4, 6, 8, 10]:
-        return 3
-    else:
-        return 2
-
-def calculate_gana_compatibility(nakshatra1, nakshatra2):
-    """Calculate Gana compatibility (0-6 points)"""
-    # Simplified calculation
-    diff = abs(nakshatra1 - nakshatra2)
-    if diff == 0:
-        return 6
-    elif diff in [1, 2, 3]:
-        return 5
-    elif diff in [4, 5, 6]:
-        return 4
-    else:
-        return 3
-
-def calculate_bhakoot_compatibility(rashi1, rashi2):
-    """Calculate Bhakoot compatibility (0-7 points)"""
-    # Simplified calculation
-    diff = abs(rashi1 - rashi2)
-    if diff == 0:
-        return 7
-    elif diff in [1, 2, 3]:
-        return 6
-    elif diff in [4, 5, 6]:
-        return 5
-    else:
-        return 4
-
-def calculate_nadi_compatibility(nakshatra1, nakshatra2):
-    """Calculate Nadi compatibility (0-8 points)"""
-    # Simplified calculation
-    diff = abs(nakshatra1 - nakshatra2)
-    if diff == 0:
-        return 8
-    elif diff in [1, 2, 3]:
-        return 7
-    elif diff in [4, 5, 6]:
-        return 6
+    ruleset = ruleset or DEFAULT_RULESET
+    return to_points(int(ruleset.table[chart_class(chart1, ruleset), chart_class(chart2, ruleset), GUNA_TOTAL]))
+
+# Guna Milan lookup tables. Koota rules are declared in rulesets.py and compiled at startup
+# into one dense table per rule set: ruleset.table[class1, class2] holds the eight koota
+# scores followed by the total, in half points. Requests pick a rule set with "ruleset".
+KOOTA_DESCRIPTIONS = [
+    "Social compatibility and class harmony",
+    "Control and dominance compatibility",
+    "Star compatibility and destiny alignment",
+    "Sexual compatibility and physical harmony",
+    "Planetary friendship and mental compatibility",
+    "Temperament and nature compatibility",
+    "Love and affection compatibility",
+    "Health and progeny compatibility"
+]
+GUNA_TOTAL = len(KOOTAS)
+
+RULESETS = load_rulesets()
+DEFAULT_RULESET = RULESETS[os.environ.get('KOOTA_RULESET', 'simplified')]
+
+def get_ruleset(name=None):
+    """Rule set by name, the default for None; raises ValueError for unknown names"""
+    if name is None:
+        return DEFAULT_RULESET
+    if name not in RULESETS:
+        raise ValueError(f"unknown ruleset: {name}")
+    return RULESETS[name]
+
+def to_points(units):
+    """Half-point table units to points: an int when whole, otherwise a float"""
+    return units // HALF if units % HALF == 0 else units / HALF
+
+def chart_class(chart, ruleset):
+    """Class of a chart dict in a rule set's tables"""
+    return ruleset.class_of(chart["rashi"], chart["nakshatra"], chart.get("pada", 0))
+
+def score_guna_array(rashis1, nakshatras1, rashis2, nakshatras2, ruleset=None, padas1=None, padas2=None):
+    """Vectorized Guna Milan over arrays of pairs; returns an (n, 9) array of koota points and totals"""
+    ruleset = ruleset or DEFAULT_RULESET
+    classes1 = ruleset.classes_of(rashis1, nakshatras1, padas1)
+    classes2 = ruleset.classes_of(rashis2, nakshatras2, padas2)
+    return ruleset.table[classes1, classes2] / HALF
+
+def resolve_profiles(profiles):
+    """Chart classes for a list of profiles, each {"rashi", "nakshatra"}, {"chart_id"} or {"date", "time", "place"}.
+    
+    Returns (ids, rashis, nakshatras, padas); ids are strings, like in the candidate store, and profiles
+    without an "id" are numbered by position. pada is 0 when only rashi/nakshatra were given; a given
+    pada must be 0-4 and lie in the rashi. Birth data is computed in one vectorized batch.
+    """
+    n = len(profiles)
+    ids = [str(profile.get("id", i)) if isinstance(profile, dict) else str(i) for i, profile in enumerate(profiles)]
+    rashis = np.zeros(n, dtype=np.int8)
+    nakshatras = np.zeros(n, dtype=np.int8)
+    padas = np.zeros(n, dtype=np.int8)
+    
+    births = []
+    for i, profile in enumerate(profiles):
+        if not isinstance(profile, dict):
+            raise ValueError(f"profile {i} must be an object")
+        if "rashi" in profile and "nakshatra" in profile:
+            try:
+                rashi, nakshatra, pada = int(profile["rashi"]), int(profile["nakshatra"]), int(profile.get("pada", 0))
+            except (TypeError, ValueError):
+                raise ValueError(f"profile {i} has a non-integer rashi, nakshatra or pada")
+            if not (1 <= rashi <= 12 and 1 <= nakshatra <= 27):
+                raise ValueError(f"profile {i} has an invalid rashi/nakshatra")
+            # Pada p of nakshatra k is quarter (k - 1) * 4 + p - 1 of the 108, nine to a rashi
+            if not 0 <= pada <= 4 or (pada and ((nakshatra - 1) * 4 + pada - 1) // 9 + 1 != rashi):
+                raise ValueError(f"profile {i} has a pada that is not 0-4 or not in its rashi")
+            rashis[i], nakshatras[i], padas[i] = rashi, nakshatra, pada
+        elif "chart_id" in profile:
+            record = chart_store.get(str(profile["chart_id"]))
+            if record is None:
+                raise ValueError(f"profile {i} has an unknown chart_id")
+            rashis[i], nakshatras[i], padas[i] = record["rashi"], record["nakshatra"], record["pada"]
+        elif all(key in profile for key in ("date", "time", "place")):
+            births.append(i)
+        else:
+            raise ValueError(f"profile {i} needs rashi/nakshatra, chart_id or date/time/place")
+    
+    if births:
+        charts = calculate_birth_charts_batch(
+            [profiles[i]["date"] for i in births],
+            [profiles[i]["time"] for i in births],
+            places=[profiles[i]["place"] for i in births]
+        )
+        rashis[births] = charts["rashi"]
+        nakshatras[births] = charts["nakshatra"]
+        padas[births] = charts["pada"]
+    
+    return ids, rashis, nakshatras, padas
+
+def parse_koota_filters(filters):
+    """Validate {"koota": minimum points} filters; returns a list of (column, minimum in table units)"""
+    if filters is None:
+        return []
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object of {\"koota\": minimum points}")
+    parsed = []
+    for koota, minimum in filters.items():
+        if koota not in KOOTAS:
+            raise ValueError(f"unknown koota filter: {koota}")
+        try:
+            parsed.append((KOOTAS.index(koota), float(minimum) * HALF))
+        except (TypeError, ValueError):
+            raise ValueError(f"koota filter {koota} must be a number")
+    return parsed
+
+def parse_exclude_doshas(doshas):
+    """Validate a list of koota names that must not score zero (a dosha); returns filters like parse_koota_filters"""
+    if doshas is None:
+        return []
+    if not isinstance(doshas, list):
+        raise ValueError("exclude_doshas must be a list of koota names")
+    parsed = []
+    for koota in doshas:
+        if not isinstance(koota, str) or koota not in KOOTAS:
+            raise ValueError(f"unknown dosha: {koota}")
+        parsed.append((KOOTAS.index(koota), 1))
+    return parsed
+
+def top_k_matches(seeker_class, candidate_classes, k, min_score=0, filters=(), ruleset=None):
+    """Score candidates against one seeker and pick the best k.
+    
+    Returns (indices, scores): candidate positions best first (ties keep input order)
+    and their (k, 9) koota score rows in table units, plus the number of candidates that passed the filters.
+    """
+    ruleset = ruleset or DEFAULT_RULESET
+    scores = ruleset.table[seeker_class][candidate_classes]
+    keep = scores[:, GUNA_TOTAL] >= min_score * HALF
+    for column, minimum in filters:
+        keep &= scores[:, column] >= minimum
+    eligible = np.flatnonzero(keep)
+    
+    # One sort key: higher total first, then earlier position
+    keys = scores[eligible, GUNA_TOTAL].astype(np.int64) * (len(candidate_classes) + 1) - eligible
+    if len(eligible) > k:
+        selected = np.argpartition(-keys, k - 1)[:k]
     else:
-        return 5
+        selected = np.arange(len(eligible))
+    selected = selected[np.argsort(-keys[selected])]
+    indices = eligible[selected]
+    return indices, scores[indices], len(eligible)
+
+def parse_issue_names(names):
+    """Validate a list of issue names; returns their combined issue bitmask"""
+    mask = 0
+    for name in names or []:
+        if name not in ISSUE_NAMES:
+            raise ValueError(f"unknown issue: {name}")
+        mask |= 1 << ISSUE_NAMES.index(name)
+    return mask
+
+def pool_scores(seeker_class, ruleset):
+    """Score rows and issue masks of the seeker against every candidate-store class.
+    
+    Store classes the rule set cannot classify (no pada for a pada rule set) are flagged unresolvable.
+    """
+    mapped = ruleset.fine_to_class
+    resolvable = mapped >= 0
+    classes = np.maximum(mapped, 0)
+    return ruleset.table[seeker_class][classes], ISSUE_TABLES[ruleset.name][seeker_class][classes], resolvable
+
+def plan_classes(seeker_class, counts, ruleset=None, min_score=0, max_score=36, filters=(), exclude_issues=0):
+    """Candidate-store classes that can satisfy a query, best first (total descending, then class).
+    
+    Every predicate depends only on the class pair, so it is decided here once per class and
+    candidates in other classes are never touched.
+    """
+    scores, issues, resolvable = pool_scores(seeker_class, ruleset or DEFAULT_RULESET)
+    totals = scores[:, GUNA_TOTAL]
+    keep = resolvable & (counts > 0) & (totals >= min_score * HALF) & (totals <= max_score * HALF)
+    for column, minimum in filters:
+        keep &= scores[:, column] >= minimum
+    if exclude_issues:
+        keep &= (issues & exclude_issues) == 0
+    classes = np.flatnonzero(keep)
+    return classes[np.argsort(-totals[classes].astype(np.int16), kind="stable")]
+
+def top_k_from_pool(seeker_class, pool, k, min_score=0, filters=(), ruleset=None):
+    """top_k_matches over a stored pool: scores each chart class once, then expands ids from the best classes.
+    
+    Returns ([(id, store class)], (k, 9) score rows, eligible count); ties are ordered by class, then insertion.
+    """
+    ruleset = ruleset or DEFAULT_RULESET
+    counts = candidate_store.class_counts(pool)
+    classes = plan_classes(seeker_class, counts, ruleset, min_score, filters=filters)
+    
+    members = []
+    for member in candidate_store.iter_members(pool, classes.tolist()):
+        if len(members) == k:
+            break
+        members.append(member)
+    rows = pool_scores(seeker_class, ruleset)[0][[class_id for _, class_id in members]] if members \
+        else np.empty((0, GUNA_TOTAL + 1), np.uint8)
+    return members, rows, int(counts[classes].sum())
+
+def encode_cursor(class_id, offset):
+    return base64.urlsafe_b64encode(f"{class_id}:{offset}".encode()).decode()
+
+def decode_cursor(cursor):
+    """(class, offset) from a query cursor; the offset is never negative"""
+    try:
+        class_id, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        class_id, offset = int(class_id), int(offset)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if offset < 0:
+        raise ValueError("invalid cursor")
+    return class_id, offset
+
+def query_pool(seeker_class, pool, limit, cursor=None, ruleset=None, **predicates):
+    """One page of candidates in a stored pool matching plan_classes predicates.
+    
+    Results are ordered like top_k_from_pool. The cursor records the class and position
+    reached, so each page only reads the candidates it returns.
+    Returns ([(id, store class)], next cursor or None, qualifying classes, candidates in scope).
+    """
+    ruleset = ruleset or DEFAULT_RULESET
+    counts = candidate_store.class_counts(pool)
+    classes = plan_classes(seeker_class, counts, ruleset, **predicates)
+    all_totals = pool_scores(seeker_class, ruleset)[0][:, GUNA_TOTAL].astype(np.int64)
+    
+    start, offset = 0, 0
+    if cursor:
+        # Resume at the cursor's place in the (total descending, class) order, even if the class emptied since
+        class_id, offset = decode_cursor(cursor)
+        if not 0 <= class_id < len(counts):
+            raise ValueError("invalid cursor")
+        position = -all_totals[class_id] * len(counts) + class_id
+        start = int(np.searchsorted(-all_totals[classes] * len(counts) + classes, position))
+        if start >= len(classes) or classes[start] != class_id:
+            offset = 0
+    
+    members = []
+    next_cursor = None
+    current, position = None, offset
+    for member in candidate_store.iter_members(pool, classes[start:].tolist(), offset):
+        if member[1] != current:
+            position = offset if current is None else 0
+            current = member[1]
+        if len(members) == limit:
+            next_cursor = encode_cursor(current, position)
+            break
+        members.append(member)
+        position += 1
+    return members, next_cursor, len(classes), int(counts[classes].sum())
 
-def generate_gun_milan_breakdown(chart1, chart2):
+def iter_guna_tiles(row_classes, column_classes, tile_rows=256, tile_columns=4096, koota=GUNA_TOTAL, ruleset=None):
+    """Yield (row_offset, column_offset, uint8 block) tiles of the N x M score matrix in table units.
+    
+    Only one tile_rows x tile_columns block exists at a time, so memory does not grow with N x M.
+    """
+    plane = np.ascontiguousarray((ruleset or DEFAULT_RULESET).table[:, :, koota])
+    for row_offset in range(0, len(row_classes), tile_rows):
+        # Gather the rows once per row band, then the columns per tile
+        band = plane[row_classes[row_offset:row_offset + tile_rows]]
+        for column_offset in range(0, len(column_classes), tile_columns):
+            yield row_offset, column_offset, band[:, column_classes[column_offset:column_offset + tile_columns]]
+
+def generate_gun_milan_breakdown(chart1, chart2, ruleset=None):
     """Generate detailed breakdown of all 8 gunas"""
+    ruleset = ruleset or DEFAULT_RULESET
+    return guna_breakdown(ruleset.table[chart_class(chart1, ruleset), chart_class(chart2, ruleset)].tolist())
+
+def guna_breakdown(scores):
+    """Breakdown dict from one table row of koota scores"""
     return {
-        "varna": {
-            "score": 1 if ((chart1["rashi"] - 1) % 4) == ((chart2["rashi"] - 1) % 4) else 0,
-            "max": 1,
-            "description": "Social compatibility and class harmony"
-        },
-        "vashya": {
-            "score": calculate_vashya_compatibility(chart1["rashi"], chart2["rashi"]),
-            "max": 2,
-            "description": "Control and dominance compatibility"
-        },
-        "tara": {
-            "score": calculate_tara_compatibility(chart1["nakshatra"], chart2["nakshatra"]),
-            "max": 3,
-            "description": "Star compatibility and destiny alignment"
-        },
-        "yoni": {
-            "score": calculate_yoni_compatibility(chart1["nakshatra"], chart2["nakshatra"]),
-            "max": 4,
-            "description": "Sexual compatibility and physical harmony"
-        },
-        "graha_maitri": {
-            "score": calculate_graha_maitri(chart1["rashi"], chart2["rashi"]),
-            "max": 5,
-            "description": "Planetary friendship and mental compatibility"
-        },
-        "gana": {
-            "score": calculate_gana_compatibility(chart1["nakshatra"], chart2["nakshatra"]),
-            "max": 6,
-            "description": "Temperament and nature compatibility"
-        },
-        "bhakoot": {
-            "score": calculate_bhakoot_compatibility(chart1["rashi"], chart2["rashi"]),
-            "max": 7,
-            "description": "Love and affection compatibility"
-        },
-        "nadi": {
-            "score": calculate_nadi_compatibility(chart1["nakshatra"], chart2["nakshatra"]),
-            "max": 8,
-            "description": "Health and progeny compatibility"
-        }
+        koota: {"score": to_points(scores[i]), "max": KOOTA_MAX[i], "description": KOOTA_DESCRIPTIONS[i]}
+        for i, koota in enumerate(KOOTAS)
     }
 
 def generate_compatibility_remarks(score, max_score):
@@ -998,26 +1934,34 @@ def generate_compatibility_remarks(score, max_score):
     else:
         return f"Very low compatibility scoring {score}/{max_score} ({percentage:.1f}%). This match faces significant challenges and may not be advisable according to Vedic principles."
 
+# Compatibility issues in report order; bit i of an issue mask is ISSUES[i]
+ISSUES = [
+    ("low_score", "Low overall compatibility score indicates potential relationship challenges"),
+    ("rashi_opposition", "Opposition of zodiac signs may create tension and conflicts"),
+    ("nakshatra_opposition", "Opposition of nakshatras may affect emotional compatibility"),
+    ("consult_astrologer", "Consider consulting a Vedic astrologer for detailed guidance")
+]
+ISSUE_NAMES = [name for name, _ in ISSUES]
+
+def compatibility_issue_mask(rashi1, nakshatra1, rashi2, nakshatra2, score):
+    """Bitmask of ISSUES for a pair; works on scalars and NumPy arrays"""
+    return ((score < 18) * 1
+            | (abs(rashi1 - rashi2) == 6) * 2           # Opposition signs
+            | (abs(nakshatra1 - nakshatra2) == 13) * 4  # Opposition nakshatras
+            | (score < 25) * 8)
+
 def detect_compatibility_issues(chart1, chart2, score):
     """Detect potential compatibility issues"""
-    issues = []
-    
-    if score < 18:
-        issues.append("Low overall compatibility score indicates potential relationship challenges")
-    
-    # Check for specific problematic combinations
-    rashi_diff = abs(chart1["rashi"] - chart2["rashi"])
-    if rashi_diff == 6:  # Opposition signs
-        issues.append("Opposition of zodiac signs may create tension and conflicts")
-    
-    nakshatra_diff = abs(chart1["nakshatra"] - chart2["nakshatra"])
-    if nakshatra_diff == 13:  # Opposition nakshatras
-        issues.append("Opposition of nakshatras may affect emotional compatibility")
-    
-    if score < 25:
-        issues.append("Consider consulting a Vedic astrologer for detailed guidance")
-    
-    return issues
+    mask = compatibility_issue_mask(chart1["rashi"], chart1["nakshatra"], chart2["rashi"], chart2["nakshatra"], score)
+    return [message for i, (_, message) in enumerate(ISSUES) if mask & (1 << i)]
+
+def build_issue_table(ruleset):
+    """Issue masks for every class pair of a rule set as a uint8 table"""
+    return compatibility_issue_mask(ruleset.rashi[:, None], ruleset.nakshatra[:, None],
+                                    ruleset.rashi[None, :], ruleset.nakshatra[None, :],
+                                    ruleset.table[:, :, GUNA_TOTAL] / HALF).astype(np.uint8)
+
+ISSUE_TABLES = {name: build_issue_table(ruleset) for name, ruleset in RULESETS.items()}
 
 def calculate_spiritual_alignment(chart1, chart2):
     """Calculate spiritual alignment score (0-100)"""
@@ -1037,6 +1981,37 @@ def calculate_spiritual_alignment(chart1, chart2):
     else:
         return 25
 
+# Nakshatra-based affirmations
+NAKSHATRA_AFFIRMATIONS = {
+    "Ashwini": "I am blessed with divine energy and spiritual awakening",
+    "Bharani": "I embrace transformation and new beginnings with courage",
+    "Krittika": "I am a beacon of light and spiritual guidance",
+    "Rohini": "I attract abundance and nurture growth in all relationships",
+    "Mrigashira": "I explore the depths of love with curiosity and wonder",
+    "Ardra": "I transform challenges into opportunities for growth",
+    "Punarvasu": "I am renewed and restored through divine grace",
+    "Pushya": "I am nourished and protected by cosmic blessings",
+    "Ashlesha": "I embrace my intuitive wisdom and spiritual power",
+    "Magha": "I honor my ancestors and carry forward their legacy",
+    "Purva Phalguni": "I create beauty and harmony in all my relationships",
+    "Uttara Phalguni": "I share my gifts generously and receive love abundantly",
+    "Hasta": "I manifest my dreams with skill and divine guidance",
+    "Chitra": "I create beautiful patterns of love and understanding",
+    "Swati": "I flow with grace and adapt to life's changes",
+    "Vishakha": "I achieve my goals through determination and spiritual focus",
+    "Anuradha": "I build lasting relationships through loyalty and devotion",
+    "Jyeshtha": "I lead with wisdom and protect those I love",
+    "Mula": "I discover my true purpose and spiritual foundation",
+    "Purva Ashadha": "I overcome obstacles with strength and determination",
+    "Uttara Ashadha": "I reach spiritual heights through patience and perseverance",
+    "Shravana": "I listen to divine guidance and learn from every experience",
+    "Dhanishta": "I create harmony and abundance through my talents",
+    "Shatabhisha": "I heal and transform through spiritual wisdom",
+    "Purva Bhadrapada": "I break free from limitations and embrace my power",
+    "Uttara Bhadrapada": "I serve humanity with compassion and spiritual insight",
+    "Revati": "I complete cycles with grace and prepare for new beginnings"
+}
+
 def generate_custom_affirmations(chart1, chart2):
     """Generate custom affirmations based on nakshatra and couple synergy"""
     nakshatra1 = chart1["nakshatra_name"]
@@ -1044,37 +2019,6 @@ def generate_custom_affirmations(chart1, chart2):
     rashi1 = chart1["rashi_name"]
     rashi2 = chart2["rashi_name"]
     
-    # Nakshatra-based affirmations
-    nakshatra_affirmations = {
-        "Ashwini": "I am blessed with divine energy and spiritual awakening",
-        "Bharani": "I embrace transformation and new beginnings with courage",
-        "Krittika": "I am a beacon of light and spiritual guidance",
-        "Rohini": "I attract abundance and nurture growth in all relationships",
-        "Mrigashira": "I explore the depths of love with curiosity and wonder",
-        "Ardra": "I transform challenges into opportunities for growth",
-        "Punarvasu": "I am renewed and restored through divine grace",
-        "Pushya": "I am nourished and protected by cosmic blessings",
-        "Ashlesha": "I embrace my intuitive wisdom and spiritual power",
-        "Magha": "I honor my ancestors and carry forward their legacy",
-        "Purva Phalguni": "I create beauty and harmony in all my relationships",
-        "Uttara Phalguni": "I share my gifts generously and receive love abundantly",
-        "Hasta": "I manifest my dreams with skill and divine guidance",
-        "Chitra": "I create beautiful patterns of love and understanding",
-        "Swati": "I flow with grace and adapt to life's changes",
-        "Vishakha": "I achieve my goals through determination and spiritual focus",
-        "Anuradha": "I build lasting relationships through loyalty and devotion",
-        "Jyeshtha": "I lead with wisdom and protect those I love",
-        "Mula": "I discover my true purpose and spiritual foundation",
-        "Purva Ashadha": "I overcome obstacles with strength and determination",
-        "Uttara Ashadha": "I reach spiritual heights through patience and perseverance",
-        "Shravana": "I listen to divine guidance and learn from every experience",
-        "Dhanishta": "I create harmony and abundance through my talents",
-        "Shatabhisha": "I heal and transform through spiritual wisdom",
-        "Purva Bhadrapada": "I break free from limitations and embrace my power",
-        "Uttara Bhadrapada": "I serve humanity with compassion and spiritual insight",
-        "Revati": "I complete cycles with grace and prepare for new beginnings"
-    }
-    
     # Couple-specific affirmations
     couple_affirmations = [
         f"Together, {nakshatra1} and {nakshatra2} create a sacred bond of divine love",
@@ -1089,8 +2033,8 @@ def generate_custom_affirmations(chart1, chart2):
     
     return {
         "individual": [
-            nakshatra_affirmations.get(nakshatra1, "I am blessed with divine love and spiritual growth"),
-            nakshatra_affirmations.get(nakshatra2, "I am blessed with divine love and spiritual growth")
+            NAKSHATRA_AFFIRMATIONS.get(nakshatra1, "I am blessed with divine love and spiritual growth"),
+            NAKSHATRA_AFFIRMATIONS.get(nakshatra2, "I am blessed with divine love and spiritual growth")
         ],
         "couple": couple_affirmations,
         "daily": [
@@ -1102,6 +2046,46 @@ def generate_custom_affirmations(chart1, chart2):
         ]
     }
 
+# Nakshatra-specific mantras
+NAKSHATRA_MANTRAS = {
+    "Ashwini": "Om Ashwini Kumaraya Namah",
+    "Bharani": "Om Yamaaya Namah",
+    "Krittika": "Om Agni Devaya Namah",
+    "Rohini": "Om Brahmaaya Namah",
+    "Mrigashira": "Om Somaaya Namah",
+    "Ardra": "Om Rudraaya Namah",
+    "Punarvasu": "Om Aditi Devaya Namah",
+    "Pushya": "Om Brihaspataye Namah",
+    "Ashlesha": "Om Nagaaya Namah",
+    "Magha": "Om Pitru Devaya Namah",
+    "Purva Phalguni": "Om Bhagaaya Namah",
+    "Uttara Phalguni": "Om Aryamaaya Namah",
+    "Hasta": "Om Savitri Devaya Namah",
+    "Chitra": "Om Vishwakarmaaya Namah",
+    "Swati": "Om Vayu Devaya Namah",
+    "Vishakha": "Om Indra Agni Devaya Namah",
+    "Anuradha": "Om Mitraaya Namah",
+    "Jyeshtha": "Om Indraaya Namah",
+    "Mula": "Om Nirriti Devaya Namah",
+    "Purva Ashadha": "Om Aap Devaya Namah",
+    "Uttara Ashadha": "Om Vishwa Devaya Namah",
+    "Shravana": "Om Vishnu Devaya Namah",
+    "Dhanishta": "Om Vasu Devaya Namah",
+    "Shatabhisha": "Om Varunaaya Namah",
+    "Purva Bhadrapada": "Om Aja Ekapadaaya Namah",
+    "Uttara Bhadrapada": "Om Ahir Budhnyaaya Namah",
+    "Revati": "Om Pushan Devaya Namah"
+}
+
+# Love and relationship mantras
+LOVE_MANTRAS = [
+    "Om Kleem Krishnaya Namah",  # For love and attraction
+    "Om Hreem Shreem Kleem",     # For harmony and prosperity
+    "Om Namah Shivaya",          # For spiritual growth
+    "Om Gam Ganapataye Namah",   # For removing obstacles
+    "Om Shreem Mahalakshmiyei Namah"  # For abundance and love
+]
+
 def generate_personalized_mantras(chart1, chart2):
     """Generate personalized mantras based on nakshatra and couple synergy"""
     nakshatra1 = chart1["nakshatra_name"]
@@ -1109,55 +2093,15 @@ def generate_personalized_mantras(chart1, chart2):
     rashi1 = chart1["rashi_name"]
     rashi2 = chart2["rashi_name"]
     
-    # Nakshatra-specific mantras
-    nakshatra_mantras = {
-        "Ashwini": "Om Ashwini Kumaraya Namah",
-        "Bharani": "Om Yamaaya Namah",
-        "Krittika": "Om Agni Devaya Namah",
-        "Rohini": "Om Brahmaaya Namah",
-        "Mrigashira": "Om Somaaya Namah",
-        "Ardra": "Om Rudraaya Namah",
-        "Punarvasu": "Om Aditi Devaya Namah",
-        "Pushya": "Om Brihaspataye Namah",
-        "Ashlesha": "Om Nagaaya Namah",
-        "Magha": "Om Pitru Devaya Namah",
-        "Purva Phalguni": "Om Bhagaaya Namah",
-        "Uttara Phalguni": "Om Aryamaaya Namah",
-        "Hasta": "Om Savitri Devaya Namah",
-        "Chitra": "Om Vishwakarmaaya Namah",
-        "Swati": "Om Vayu Devaya Namah",
-        "Vishakha": "Om Indra Agni Devaya Namah",
-        "Anuradha": "Om Mitraaya Namah",
-        "Jyeshtha": "Om Indraaya Namah",
-        "Mula": "Om Nirriti Devaya Namah",
-        "Purva Ashadha": "Om Aap Devaya Namah",
-        "Uttara Ashadha": "Om Vishwa Devaya Namah",
-        "Shravana": "Om Vishnu Devaya Namah",
-        "Dhanishta": "Om Vasu Devaya Namah",
-        "Shatabhisha": "Om Varunaaya Namah",
-        "Purva Bhadrapada": "Om Aja Ekapadaaya Namah",
-        "Uttara Bhadrapada": "Om Ahir Budhnyaaya Namah",
-        "Revati": "Om Pushan Devaya Namah"
-    }
-    
-    # Love and relationship mantras
-    love_mantras = [
-        "Om Kleem Krishnaya Namah",  # For love and attraction
-        "Om Hreem Shreem Kleem",     # For harmony and prosperity
-        "Om Namah Shivaya",          # For spiritual growth
-        "Om Gam Ganapataye Namah",   # For removing obstacles
-        "Om Shreem Mahalakshmiyei Namah"  # For abundance and love
-    ]
-    
     return {
         "individual": [
             {
-                "mantra": nakshatra_mantras.get(nakshatra1, "Om Namah Shivaya"),
+                "mantra": NAKSHATRA_MANTRAS.get(nakshatra1, "Om Namah Shivaya"),
                 "meaning": f"Invokes the divine energy of {nakshatra1} nakshatra",
                 "usage": "Chant 108 times daily for spiritual alignment"
             },
             {
-                "mantra": nakshatra_mantras.get(nakshatra2, "Om Namah Shivaya"),
+                "mantra": NAKSHATRA_MANTRAS.get(nakshatra2, "Om Namah Shivaya"),
                 "meaning": f"Invokes the divine energy of {nakshatra2} nakshatra",
                 "usage": "Chant 108 times daily for spiritual alignment"
             }
@@ -1174,9 +2118,9 @@ def generate_personalized_mantras(chart1, chart2):
                 "usage": "Chant together 11 times before important decisions"
             }
         ],
-        "daily": love_mantras[0],
-        "weekly": love_mantras[1],
-        "special_occasions": love_mantras[2]
+        "daily": LOVE_MANTRAS[0],
+        "weekly": LOVE_MANTRAS[1],
+        "special_occasions": LOVE_MANTRAS[2]
     }
 
 def calculate_couple_synergy(chart1, chart2):
@@ -1229,14 +2173,180 @@ def calculate_couple_synergy(chart1, chart2):
         ]
     }
 
-if __name__ == '__main__':
+response_cache = ResponseCache(int(os.environ.get('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024)))
+
+def normalized_birth(details):
+    """Canonical (date, time, lat, lon, tz) of birth details with the place resolved, or None"""
+    try:
+        year, month, day = (int(part) for part in details['date'].split("-"))
+        hour, minute = (int(part) for part in details['time'].split(":"))
+        datetime(year, month, day, hour, minute)  # Rejects dates and times that do not exist ("1990-02-30", "25:30")
+        lat, lon, tz_name = get_coordinates(details['place'])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}", f"{hour:02d}:{minute:02d}", round(lat, 6), round(lon, 6), tz_name
+
+def partner_chart_id(details):
+    """Chart id of a partner given by chart_id or birth details, None when they cannot be normalized"""
+    if isinstance(details, dict) and "chart_id" in details:
+        return str(details["chart_id"])
+    birth = normalized_birth(details)
+    return make_chart_id(*birth) if birth else None
+
+def compatibility_cache_key(route, data, ruleset, fields, *extra):
+    """Response cache key of a compatibility request, None when the births cannot be normalized"""
+    # Chart ids are hashes of the normalized births, so raw data and chart_id share entries
+    chart_ids = [partner_chart_id(data['partner1']), partner_chart_id(data['partner2'])]
+    if None in chart_ids:
+        return None
+    return request_key(route, ruleset.name, list(fields), chart_ids, *extra)
+
+def conditional_response(body, etag, cache_status):
+    """JSON response with a strong ETag, or 304 Not Modified when If-None-Match already has it"""
+    if response_cache.not_modified(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['X-Cache'] = cache_status
+    return response
+
+def parse_fields(fields, allowed):
+    """Sections named in a comma-separated fields parameter, all of allowed when absent"""
+    if not fields:
+        return allowed
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if name not in allowed:
+            raise ValueError(f"unknown field: {name}")
+    return names
+
+def chart_summary(chart):
+    """Partner chart section of a report, with the names already calculated by Swiss Ephemeris"""
+    return {
+        "longitude": chart["longitude"],
+        "nakshatra": chart["nakshatra_name"],
+        "nakshatra_lord": chart["nakshatra_lord"],
+        "rashi": chart["rashi_name"],
+        "rashi_lord": chart["rashi_lord"]
+    }
+
+class CompatibilityResult:
+    """Compatibility report for one pair of charts.
+    
+    Every section is a cached property, computed on first access and shared by the sections
+    that depend on it, so a report limited to a few fields only pays for those.
+    """
+    
+    REPORT_FIELDS = (
+        "gun_milan_score", "max_possible_score", "ruleset", "compatibility_level", "breakdown",
+        "remarks", "issues_detected", "spiritual_alignment_score", "partner1_chart", "partner2_chart"
+    )
+    ENHANCED_FIELDS = REPORT_FIELDS + (
+        "partner1_details", "partner2_details", "custom_affirmations", "personalized_mantras", "couple_synergy"
+    )
+    # Sections that depend only on the chart-class pair, served from fragment_cache by to_json
+    PAIR_FIELDS = frozenset(ENHANCED_FIELDS) - {"partner1_chart", "partner2_chart", "partner1_details", "partner2_details"}
+    
+    max_possible_score = 36  # Maximum possible score in Guna Milan
+    
+    def __init__(self, chart1, chart2, ruleset=None, partner1_details=None, partner2_details=None):
+        self.chart1 = chart1
+        self.chart2 = chart2
+        self.rules = ruleset or DEFAULT_RULESET
+        self.partner1_details = partner1_details
+        self.partner2_details = partner2_details
+    
+    def to_dict(self, fields=None):
+        """Report dict with the given sections, in field order (REPORT_FIELDS by default)"""
+        return {field: getattr(self, field) for field in (fields or self.REPORT_FIELDS)}
+    
+    def to_json(self, fields=None):
+        """Report as JSON bytes, encoded like jsonify; class-pair sections are joined from cached fragments"""
+        fragments = []
+        for field in sorted(fields or self.REPORT_FIELDS):
+            if field in self.PAIR_FIELDS:
+                fragments.append(fragment_cache.get(self.pair_key, field, lambda: getattr(self, field)))
+            else:
+                fragments.append(render_fragment(field, getattr(self, field)))
+        return join_fragments(fragments)
+    
+    @property
+    def ruleset(self):
+        return self.rules.name
+    
+    @cached_property
+    def pair_key(self):
+        """(rule set, class1, class2): everything the PAIR_FIELDS sections depend on"""
+        return self.rules.name, chart_class(self.chart1, self.rules), chart_class(self.chart2, self.rules)
+    
+    @cached_property
+    def scores(self):
+        """Koota scores and total of the pair in table units"""
+        return self.rules.table[self.pair_key[1], self.pair_key[2]].tolist()
+    
+    @cached_property
+    def gun_milan_score(self):
+        return to_points(self.scores[GUNA_TOTAL])
+    
+    @cached_property
+    def compatibility_level(self):
+        # Same level as calculate_compatibility, without building its analysis text
+        rashi_score = calculate_rashi_compatibility(self.chart1["rashi"], self.chart2["rashi"])
+        nakshatra_score = calculate_nakshatra_compatibility(self.chart1["nakshatra"], self.chart2["nakshatra"])
+        return get_compatibility_level((rashi_score + nakshatra_score) / 2)
+    
+    @cached_property
+    def breakdown(self):
+        return guna_breakdown(self.scores)
+    
+    @cached_property
+    def remarks(self):
+        return generate_compatibility_remarks(self.gun_milan_score, self.max_possible_score)
+    
+    @cached_property
+    def issues_detected(self):
+        return detect_compatibility_issues(self.chart1, self.chart2, self.gun_milan_score)
+    
+    @cached_property
+    def spiritual_alignment_score(self):
+        return calculate_spiritual_alignment(self.chart1, self.chart2)
+    
+    @cached_property
+    def partner1_chart(self):
+        return chart_summary(self.chart1)
+    
+    @cached_property
+    def partner2_chart(self):
+        return chart_summary(self.chart2)
+    
+    @cached_property
+    def custom_affirmations(self):
+        return generate_custom_affirmations(self.chart1, self.chart2)
+    
+    @cached_property
+    def personalized_mantras(self):
+        return generate_personalized_mantras(self.chart1, self.chart2)
+    
+    @cached_property
+    def couple_synergy(self):
+        return calculate_couple_synergy(self.chart1, self.chart2)
+
+def main():
+    """Run the server (python -m server)"""
     port = int(os.environ.get('PORT', 5001))
     print(f"Starting Vedic Compatibility API on port {port}")
     print(f"Environment: PORT={os.environ.get('PORT', 'Not set')}")
+    recovered = enhanced_jobs.recover()
+    if recovered:
+        print(f"Recovered {recovered} unfinished enhanced report jobs")
     try:
         app.run(host='0.0.0.0', port=port, debug=False)
     except Exception as e:
         print(f"Failed to start server: {e}")
         import traceback
         traceback.print_exc()
+
+if __name__ == '__main__':
+    main()
 # Force redeploy - Sat Jul 12 14:54:12 IST 2025
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for the chart pipeline.
+
+Usage: python benchmark.py [N]
+"""
+
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+PLACES = ["Mumbai", "Delhi", "Bangalore", "Chennai", "Kolkata", "Hyderabad", "Pune", "Jaipur"]
+
+
+def random_births(n, seed=42):
+    """Random (date, time, place) columns between 1950 and 2005"""
+    rng = random.Random(seed)
+    dates = [f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" for _ in range(n)]
+    times = [f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}" for _ in range(n)]
+    places = [rng.choice(PLACES) for _ in range(n)]
+    return dates, times, places
+
+
+def bench_charts(n):
+    """Scalar calculate_birth_chart loop vs. calculate_birth_charts_batch"""
+    dates, times, places = random_births(n)
+
+    scalar_n = min(n, 2000)
+    start = time.perf_counter()
+    scalar = [app.calculate_birth_chart(d, t, p)
+              for d, t, p in zip(dates[:scalar_n], times[:scalar_n], places[:scalar_n])]
+    scalar_rate = scalar_n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    batch = app.calculate_birth_charts_batch(dates, times, places=places)
+    batch_rate = n / (time.perf_counter() - start)
+
+    mismatches = sum(
+        1 for i, chart in enumerate(scalar)
+        if (chart["rashi"], chart["nakshatra"]) != (batch["rashi"][i], batch["nakshatra"][i])
+    )
+    print(f"📊 Birth charts (N={n})")
+    print(f"   scalar: {scalar_rate:,.0f} charts/s (first {scalar_n})")
+    print(f"   batch:  {batch_rate:,.0f} charts/s ({batch_rate / scalar_rate:.1f}x)")
+    print(f"   rashi/nakshatra mismatches vs scalar: {mismatches}")
+
+
+def bench_pool(n):
+    """Moon longitudes in-process vs. across the ephemeris worker pool"""
+    if app.ephemeris_pool is None:
+        print("📊 Ephemeris pool disabled (EPHEMERIS_POOL_WORKERS=0)")
+        return
+
+    jds = np.random.default_rng(1).uniform(2433282.5, 2453736.5, n)
+    start = time.perf_counter()
+    serial = np.array([app.swe.calc_ut(jd, app.swe.MOON)[0][0] for jd in jds])
+    serial_rate = n / (time.perf_counter() - start)
+
+    app.ephemeris_pool.warm()
+    start = time.perf_counter()
+    pooled = app.ephemeris_pool.moon_longitudes(jds)
+    pool_rate = n / (time.perf_counter() - start)
+
+    print(f"📊 Moon longitudes (N={n}, {app.ephemeris_pool.workers} workers)")
+    print(f"   in-process: {serial_rate:,.0f} positions/s")
+    print(f"   pool:       {pool_rate:,.0f} positions/s ({pool_rate / serial_rate:.1f}x)")
+    print(f"   max difference: {np.abs(serial - pooled).max():.3g} degrees")
+
+
+def bench_guna(n):
+    """Per-pair calculate_guna_milan vs. score_guna_array over the same pairs"""
+    rng = np.random.default_rng(2)
+    rashis1, rashis2 = rng.integers(1, 13, n), rng.integers(1, 13, n)
+    nakshatras1, nakshatras2 = rng.integers(1, 28, n), rng.integers(1, 28, n)
+
+    start = time.perf_counter()
+    scalar = [app.calculate_guna_milan({"rashi": r1, "nakshatra": n1}, {"rashi": r2, "nakshatra": n2})
+              for r1, n1, r2, n2 in zip(rashis1.tolist(), nakshatras1.tolist(), rashis2.tolist(), nakshatras2.tolist())]
+    scalar_rate = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectorized = app.score_guna_array(rashis1, nakshatras1, rashis2, nakshatras2)[:, app.GUNA_TOTAL]
+    vector_rate = n / (time.perf_counter() - start)
+
+    print(f"📊 Guna Milan (N={n})")
+    print(f"   per pair:   {scalar_rate:,.0f} pairs/s")
+    print(f"   vectorized: {vector_rate:,.0f} pairs/s ({vector_rate / scalar_rate:.1f}x)")
+    print(f"   mismatches: {int((vectorized != np.array(scalar)).sum())}")
+
+
+def bench_rulesets(n):
+    """Per-pair and vectorized Guna Milan under every rule set"""
+    rng = np.random.default_rng(3)
+    quarters1, quarters2 = rng.integers(0, 108, n), rng.integers(0, 108, n)
+    # Consistent (rashi, nakshatra, pada) from nakshatra quarters
+    rashis1, nakshatras1, padas1 = quarters1 // 9 + 1, quarters1 // 4 + 1, quarters1 % 4 + 1
+    rashis2, nakshatras2, padas2 = quarters2 // 9 + 1, quarters2 // 4 + 1, quarters2 % 4 + 1
+    charts1 = [{"rashi": r, "nakshatra": k, "pada": p}
+               for r, k, p in zip(rashis1.tolist(), nakshatras1.tolist(), padas1.tolist())]
+    charts2 = [{"rashi": r, "nakshatra": k, "pada": p}
+               for r, k, p in zip(rashis2.tolist(), nakshatras2.tolist(), padas2.tolist())]
+
+    print(f"📊 Rule sets (N={n})")
+    for name, ruleset in app.RULESETS.items():
+        start = time.perf_counter()
+        scalar = [app.calculate_guna_milan(chart1, chart2, ruleset) for chart1, chart2 in zip(charts1, charts2)]
+        scalar_rate = n / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vectorized = app.score_guna_array(rashis1, nakshatras1, rashis2, nakshatras2, ruleset,
+                                          padas1, padas2)[:, app.GUNA_TOTAL]
+        vector_rate = n / (time.perf_counter() - start)
+
+        print(f"   {name}: {ruleset.classes} classes, {ruleset.table.nbytes / 1024:,.0f} KiB table,"
+              f" per pair {scalar_rate:,.0f} pairs/s, vectorized {vector_rate:,.0f} pairs/s,"
+              f" mean {vectorized.mean():.2f}, mismatches {int((vectorized != np.array(scalar)).sum())}")
+
+
+def bench_reports(n):
+    """Compatibility report serialization: dicts + JSON encoding vs. cached class-pair fragments"""
+    dates, times, places = random_births(200, seed=4)
+    charts = [app.calculate_birth_chart(d, t, p) for d, t, p in zip(dates, times, places)]
+    pairs = [(charts[i % len(charts)], charts[(i * 7 + 1) % len(charts)]) for i in range(n)]
+    fields = app.CompatibilityResult.ENHANCED_FIELDS
+
+    start = time.perf_counter()
+    for chart1, chart2 in pairs:
+        json.dumps(app.CompatibilityResult(chart1, chart2).to_dict(fields), sort_keys=True, separators=(",", ":"))
+    dict_rate = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for chart1, chart2 in pairs:
+        app.CompatibilityResult(chart1, chart2).to_json(fields)
+    fragment_rate = n / (time.perf_counter() - start)
+
+    print(f"📊 Enhanced reports (N={n}, {len(charts)} charts)")
+    print(f"   dict + json: {dict_rate:,.0f} reports/s")
+    print(f"   fragments:   {fragment_rate:,.0f} reports/s ({fragment_rate / dict_rate:.1f}x)")
+    print(f"   fragment cache: {app.fragment_cache.stats()}")
+
+
+def allocated_bytes(build):
+    """Bytes still allocated by the object build() returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def bench_memory(n):
+    """Memory per chart: dicts vs. slotted Chart objects vs. ChartColumns"""
+    dates, times, places = random_births(n, seed=5)
+    columns = app.calculate_birth_charts_batch(dates, times, places=places)
+
+    # Every chart is built fresh from the column store, so no numbers are shared between runs
+    dict_bytes = allocated_bytes(lambda: [columns[i].to_dict() for i in range(n)])
+    slot_bytes = allocated_bytes(lambda: [columns[i] for i in range(n)])
+    # The former batch result: one array per key (names as fixed-width strings, timezones as objects)
+    array_bytes = sum(np.asarray(columns[key]).nbytes for key in app.BATCH_COLUMNS + ("utc_seconds",))
+
+    print(f"📊 Memory per chart (N={n})")
+    print(f"   dicts:             {dict_bytes / n:,.0f} bytes")
+    print(f"   Chart (__slots__): {slot_bytes / n:,.0f} bytes ({dict_bytes / slot_bytes:.1f}x smaller)")
+    print(f"   dict of arrays:    {array_bytes / n:,.0f} bytes (former batch result)")
+    print(f"   ChartColumns:      {columns.nbytes / n:,.0f} bytes ({array_bytes / columns.nbytes:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    # Imported here, not at the top: ephemeris pool workers run this module again as __mp_main__
+    import app
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bench_charts(n)
+    bench_pool(n)
+    bench_guna(n)
+    bench_rulesets(n)
+    bench_reports(min(n, 20000))
+    bench_memory(n)
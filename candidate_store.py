@@ -0,0 +1,226 @@
+"""
+Persistent candidate store bucketed by chart class.
+
+Guna Milan depends only on each partner's (rashi, nakshatra), i.e. one of
+12 * 27 = 324 chart classes. Candidates are kept in SQLite (so pools
+survive restarts) and, in memory, in an inverted index of class ->
+candidate ids per pool, plus per-class counts.
+
+The index is keyed by fine class, the chart class plus the pada (0 when
+unknown, 1620 in all), so pada-level rule sets can use it too.
+
+A match query scores the classes, not the candidates, and then reads
+ids out of the best classes until it has enough results. Its cost depends
+on the number of classes plus the number of results, not the pool size.
+Inserts, updates and deletes update SQLite and the index together; the
+index is rebuilt from SQLite once at startup.
+
+Candidate ids are stored as strings. Within a class (and across a whole
+pool) ids keep their insertion order; an update moves the candidate to
+the end.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CLASSES = 12 * 27 * 5
+MEMBER_CHUNK = 1024                 # Ids copied per lock hold by iter_members()
+
+
+def chart_class(rashi, nakshatra):
+    """Chart class of a (rashi, nakshatra) pair: (rashi - 1) * 27 + nakshatra - 1"""
+    return (rashi - 1) * 27 + (nakshatra - 1)
+
+
+def fine_class(chart_class_id, pada):
+    """Index class of a chart class and pada (0-4), same layout as rulesets.FINE_CLASSES"""
+    return chart_class_id * 5 + pada
+
+
+def class_chart(class_id):
+    """(rashi, nakshatra, pada) of an index class; pada 0 when unknown"""
+    coarse, pada = divmod(class_id, 5)
+    return coarse // 27 + 1, coarse % 27 + 1, pada
+
+
+class _Pool:
+    """In-memory index of one pool"""
+
+    def __init__(self):
+        self.members = [dict() for _ in range(CLASSES)]  # class -> ordered {id: None}
+        self.classes = {}                                # id -> class, in insertion order
+        self.counts = np.zeros(CLASSES, dtype=np.int64)
+
+    def add(self, candidate_id, class_id):
+        self.remove(candidate_id)
+        self.members[class_id][candidate_id] = None
+        self.classes[candidate_id] = class_id
+        self.counts[class_id] += 1
+
+    def remove(self, candidate_id):
+        class_id = self.classes.pop(candidate_id, None)
+        if class_id is None:
+            return False
+        del self.members[class_id][candidate_id]
+        self.counts[class_id] -= 1
+        return True
+
+
+class CandidateStore:
+    """SQLite-backed candidate pools with an in-memory class -> ids inverted index"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._stats = {
+            "inserts": 0,
+            "updates": 0,
+            "deletes": 0,
+            "queries": 0
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pools ("
+            " pool TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            " pool TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " rashi INTEGER NOT NULL,"
+            " nakshatra INTEGER NOT NULL,"
+            " pada INTEGER NOT NULL,"
+            " class INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (pool, id))"
+        )
+        self._load()
+
+    def _load(self):
+        """Rebuild the in-memory index from SQLite"""
+        for (pool,) in self._conn.execute("SELECT pool FROM pools"):
+            self._pools[pool] = _Pool()
+        for pool, candidate_id, class_id, pada in self._conn.execute(
+            "SELECT pool, id, class, pada FROM candidates ORDER BY rowid"
+        ):
+            self._pools[pool].add(candidate_id, fine_class(class_id, pada))
+
+    def create_pool(self, pool):
+        """Create an empty pool (no-op if it exists)"""
+        with self._lock:
+            if pool not in self._pools:
+                self._conn.execute("INSERT INTO pools (pool, created_at) VALUES (?, ?)", (pool, time.time()))
+                self._pools[pool] = _Pool()
+
+    def has_pool(self, pool):
+        return pool in self._pools
+
+    def delete_pool(self, pool):
+        """Drop a pool and all its candidates; returns whether it existed"""
+        with self._lock:
+            if self._pools.pop(pool, None) is None:
+                return False
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM candidates WHERE pool = ?", (pool,))
+            self._conn.execute("DELETE FROM pools WHERE pool = ?", (pool,))
+            self._conn.execute("COMMIT")
+            return True
+
+    def upsert(self, pool, candidates):
+        """Insert or update (id, rashi, nakshatra, pada) rows in one transaction; returns the row count"""
+        now = time.time()
+        rows = [(pool, str(candidate_id), int(rashi), int(nakshatra), int(pada),
+                 chart_class(int(rashi), int(nakshatra)), now)
+                for candidate_id, rashi, nakshatra, pada in candidates]
+        with self._lock:
+            index = self._pools[pool]
+            self._conn.execute("BEGIN")
+            try:
+                # REPLACE deletes and re-inserts, which moves an updated row to the end like the index
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO candidates (pool, id, rashi, nakshatra, pada, class, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            for _, candidate_id, _, _, pada, class_id, _ in rows:
+                if candidate_id in index.classes:
+                    self._stats["updates"] += 1
+                else:
+                    self._stats["inserts"] += 1
+                index.add(candidate_id, fine_class(class_id, pada))
+        return len(rows)
+
+    def delete(self, pool, candidate_id):
+        """Remove one candidate; returns whether it existed"""
+        candidate_id = str(candidate_id)
+        with self._lock:
+            if not self._pools[pool].remove(candidate_id):
+                return False
+            self._conn.execute("DELETE FROM candidates WHERE pool = ? AND id = ?", (pool, candidate_id))
+            self._stats["deletes"] += 1
+            return True
+
+    def get(self, pool, candidate_id):
+        """Return the stored row of one candidate as a dict, or None"""
+        row = self._conn.execute(
+            "SELECT rashi, nakshatra, pada FROM candidates WHERE pool = ? AND id = ?", (pool, str(candidate_id))
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": str(candidate_id), "rashi": row[0], "nakshatra": row[1], "pada": row[2]}
+
+    def count(self, pool):
+        return len(self._pools[pool].classes)
+
+    def class_counts(self, pool):
+        """Number of candidates per index class, an int64 array of length CLASSES"""
+        self._stats["queries"] += 1
+        return self._pools[pool].counts.copy()
+
+    def iter_members(self, pool, class_ids, offset=0):
+        """Yield (id, class) for every candidate in the given classes, class by class in the order given.
+
+        offset skips that many candidates of the first class (for resuming a paginated query). Ids are copied
+        under the lock MEMBER_CHUNK at a time, so a query that stops after one page copies about one page.
+        """
+        members = self._pools[pool].members
+        for class_id in class_ids:
+            while True:
+                with self._lock:
+                    chunk = list(itertools.islice(members[class_id], offset, offset + MEMBER_CHUNK))
+                for candidate_id in chunk:
+                    yield candidate_id, class_id
+                if len(chunk) < MEMBER_CHUNK:
+                    break
+                offset += MEMBER_CHUNK
+            offset = 0
+
+    def members(self, pool):
+        """All (ids, classes) of a pool in insertion order"""
+        with self._lock:
+            classes = self._pools[pool].classes
+            return list(classes), np.fromiter(classes.values(), dtype=np.intp, count=len(classes))
+
+    def stats(self):
+        """Return pool sizes and operation counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pools"] = len(self._pools)
+            stats["candidates"] = sum(len(index.classes) for index in self._pools.values())
+        stats["path"] = self.path
+        return stats
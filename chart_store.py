@@ -0,0 +1,150 @@
+"""
+Content-addressed store of computed birth charts.
+
+A chart's id is derived from its normalized inputs: the zero-padded local
+date and time plus the resolved coordinates and timezone. The same birth
+therefore always gets the same id however the place was spelled, and
+storing a chart twice is a no-op.
+
+Each chart is one fixed-size little-endian record (RECORD, 108 bytes)
+holding the numeric chart fields. Names and lords are not stored, since
+the caller derives them from the rashi and nakshatra numbers. Records
+are appended to a file behind a small header and flushed on every put.
+At startup the file is read into one bytearray with an
+id -> offset dict, so a lookup is a dict probe plus one
+struct.unpack_from. A torn record at the end (crash mid-append) is
+dropped on load.
+
+Several processes (server workers) can share one file. Each record is
+appended with a single write, and a process reads the records others
+appended since its last read whenever a lookup misses and before each
+put. A chart_id created in one process is therefore found in all of them.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+
+MAGIC = b"CHRT"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sII")
+# id, rashi, nakshatra, pada, longitude, boundary distance (NaN = unknown), lat, lon,
+# julian day, UTC and local wall-clock seconds since the epoch, timezone name
+RECORD = struct.Struct("<16sBBBxdddddqq32s")
+
+FIELDS = ("rashi", "nakshatra", "pada", "longitude", "boundary_distance_days", "lat", "lon",
+          "julian_day", "utc_seconds", "local_seconds", "timezone")
+
+
+def make_chart_id(date, time, lat, lon, tz_name):
+    """Hex id of a chart from its normalized inputs"""
+    canonical = json.dumps([date, time, round(lat, 6), round(lon, 6), tz_name], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class ChartStore:
+    """Append-only file of fixed-size chart records with an in-memory id index"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = bytearray()
+        self._offsets = {}
+        self._hits = 0
+        self._misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            with open(path, "rb") as f:
+                magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+                    raise ValueError(f"{path} is not a version {FORMAT_VERSION} chart store")
+            size = os.path.getsize(path) - HEADER.size
+            whole = size - size % RECORD.size
+            if whole != size:
+                with open(path, "r+b") as f:
+                    f.truncate(HEADER.size + whole)
+        else:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size))
+
+        self._file = open(path, "ab")
+        self._reader = open(path, "rb")
+        self._refresh()
+
+    def _refresh(self):
+        """Read the whole records appended to the file since the last read; the caller holds the lock"""
+        end = os.fstat(self._reader.fileno()).st_size
+        available = (end - HEADER.size - len(self._records)) // RECORD.size * RECORD.size
+        if available <= 0:
+            return
+        self._reader.seek(HEADER.size + len(self._records))
+        data = self._reader.read(available)
+        start = len(self._records)
+        self._records += data
+        for offset in range(start, len(self._records), RECORD.size):
+            self._offsets[self._records[offset:offset + 16].hex()] = offset
+
+    def put(self, chart_id, chart):
+        """Store a chart given as a dict with FIELDS; returns False if the id was already stored"""
+        timezone = chart["timezone"].encode("ascii")
+        if len(timezone) > 32:
+            raise ValueError(f"timezone name too long for a chart record: {chart['timezone']}")
+        boundary = chart["boundary_distance_days"]
+        record = RECORD.pack(
+            bytes.fromhex(chart_id), chart["rashi"], chart["nakshatra"], chart["pada"],
+            chart["longitude"], math.nan if boundary is None else boundary, chart["lat"], chart["lon"],
+            chart["julian_day"], chart["utc_seconds"], chart["local_seconds"], timezone
+        )
+        with self._lock:
+            self._refresh()
+            if chart_id in self._offsets:
+                return False
+            self._file.write(record)
+            self._file.flush()
+            # Reads back this record, after any that other processes appended before it
+            self._refresh()
+            return True
+
+    def get(self, chart_id):
+        """The stored chart as a dict with FIELDS, or None"""
+        offset = self._offsets.get(chart_id)
+        if offset is None:
+            with self._lock:
+                self._refresh()
+            offset = self._offsets.get(chart_id)
+        if offset is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        values = RECORD.unpack_from(self._records, offset)[1:]
+        chart = dict(zip(FIELDS, values))
+        if math.isnan(chart["boundary_distance_days"]):
+            chart["boundary_distance_days"] = None
+        chart["timezone"] = chart["timezone"].rstrip(b"\0").decode("ascii")
+        return chart
+
+    def __contains__(self, chart_id):
+        if chart_id not in self._offsets:
+            with self._lock:
+                self._refresh()
+        return chart_id in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        return {
+            "path": self.path,
+            "charts": len(self._offsets),
+            "record_bytes": RECORD.size,
+            "bytes": len(self._records),
+            "hits": self._hits,
+            "misses": self._misses
+        }
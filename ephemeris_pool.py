@@ -0,0 +1,129 @@
+"""
+Process pool of Swiss Ephemeris workers.
+
+swisseph keeps its settings (ephemeris path, sidereal mode) in global C
+state and holds the GIL while computing, so one process computes one
+position at a time. EphemerisPool starts worker processes that each set
+up Swiss Ephemeris once in their initializer, then splits arrays of Julian
+days into chunks and spreads them across the workers.
+
+Back-pressure: at most `max_in_flight` chunks are queued at any time (by
+default two per worker). The scheduler submits the next chunk only when
+one finishes, so a huge batch never turns into one huge pickled queue.
+
+Workers are started with the "spawn" method, so forking a threaded web
+server is avoided. This module never imports app, but a spawned worker
+also runs the parent's __main__ module again (as __mp_main__) before its
+first task. The parent must therefore be started through an entry point
+that is cheap to import, such as server.py, and not as `python app.py`.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def _init_worker(ephe_path, sid_mode):
+    """Per-process Swiss Ephemeris setup, same as app.py does at import time"""
+    import swisseph as swe
+    swe.set_ephe_path(ephe_path)
+    swe.set_sid_mode(sid_mode)
+
+
+def _moon_longitudes(jds):
+    """Moon longitudes for one chunk of Julian days (runs inside a worker)"""
+    import swisseph as swe
+    return np.array([swe.calc_ut(jd, swe.MOON)[0][0] for jd in jds], dtype=np.float64)
+
+
+class EphemerisPool:
+    """Chunked, back-pressured Moon longitude computation across worker processes"""
+
+    def __init__(self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_in_flight=None,
+                 ephe_path='.', sid_mode=None):
+        import swisseph as swe
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.ephe_path = ephe_path
+        self.sid_mode = swe.SIDM_LAHIRI if sid_mode is None else sid_mode
+        self._executor = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._chunks = 0
+        self._positions = 0
+        self._seconds = 0.0
+
+    @property
+    def executor(self):
+        """The worker processes, started on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.ephe_path, self.sid_mode)
+                    )
+        return self._executor
+
+    def moon_longitudes(self, jds):
+        """Moon longitudes for an array of Julian days, computed across the pool in input order"""
+        jds = np.asarray(jds, dtype=np.float64)
+        result = np.empty(len(jds), dtype=np.float64)
+        start = time.perf_counter()
+
+        chunks = iter(range(0, len(jds), self.chunk_size))
+        in_flight = {}
+        while True:
+            # Keep the queue topped up to max_in_flight, no further
+            for offset in chunks:
+                future = self.executor.submit(_moon_longitudes, jds[offset:offset + self.chunk_size])
+                in_flight[future] = offset
+                if len(in_flight) >= self.max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset = in_flight.pop(future)
+                chunk = future.result()
+                result[offset:offset + len(chunk)] = chunk
+                self._chunks += 1
+
+        self._batches += 1
+        self._positions += len(jds)
+        self._seconds += time.perf_counter() - start
+        return result
+
+    def warm(self):
+        """Start every worker now instead of on the first batch"""
+        list(self.executor.map(_moon_longitudes, [np.array([2451545.0])] * self.workers))
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def stats(self):
+        """Return pool size and throughput counters"""
+        return {
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "chunk_size": self.chunk_size,
+            "max_in_flight": self.max_in_flight,
+            "batches": self._batches,
+            "chunks": self._chunks,
+            "positions": self._positions,
+            "positions_per_second": self._positions / self._seconds if self._seconds else None
+        }
@@ -0,0 +1,94 @@
+"""
+Pre-rendered JSON fragments of compatibility reports, keyed by chart-class pair.
+
+Most sections of a compatibility report (score, breakdown, remarks, issues,
+affirmations, mantras, synergy, ...) depend only on the two partners'
+chart classes and the rule set. Each section is serialized once into a
+`"name":value` byte fragment, the first time a pair asks for it. Later
+reports for the same pair are joined from those bytes, with no dict
+building or JSON encoding for the cached sections.
+
+Fragments are stored per pair and filled section by section, so a
+request for a few fields never renders the others. At most `max_pairs`
+pairs are kept, least recently used first out.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_PAIRS = 50000
+
+
+def render_fragment(name, value):
+    """`"name":value` as compact JSON bytes with sorted keys, the way jsonify encodes it"""
+    return json.dumps({name: value}, sort_keys=True, separators=(",", ":"))[1:-1].encode()
+
+
+def embed_fragment(name, encoded):
+    """`"name":encoded` for a value that is already JSON bytes"""
+    return json.dumps(name).encode() + b":" + encoded
+
+
+def join_fragments(fragments):
+    """JSON object bytes from fragments that are already in key order"""
+    return b"{" + b",".join(fragments) + b"}"
+
+
+class FragmentCache:
+    """Bounded LRU of pair -> {section name: fragment bytes}"""
+
+    def __init__(self, max_pairs=DEFAULT_MAX_PAIRS):
+        self.max_pairs = max_pairs
+        self._pairs = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bytes = 0
+
+    def get(self, key, name, render):
+        """Fragment of section `name` for pair `key`; render() produces the section value on a miss"""
+        with self._lock:
+            fragments = self._pairs.get(key)
+            if fragments is not None:
+                self._pairs.move_to_end(key)
+                fragment = fragments.get(name)
+                if fragment is not None:
+                    self._hits += 1
+                    return fragment
+
+        # Render outside the lock; two threads missing the same section render the same bytes
+        fragment = render_fragment(name, render())
+        with self._lock:
+            self._misses += 1
+            fragments = self._pairs.get(key)
+            if fragments is None:
+                fragments = self._pairs[key] = {}
+                while len(self._pairs) > self.max_pairs:
+                    _, evicted = self._pairs.popitem(last=False)
+                    self._bytes -= sum(len(value) for value in evicted.values())
+                    self._evictions += 1
+            if name not in fragments:
+                fragments[name] = fragment
+                self._bytes += len(fragment)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._pairs.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "pairs": len(self._pairs),
+                "max_pairs": self.max_pairs,
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else None
+            }
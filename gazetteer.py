@@ -0,0 +1,469 @@
+"""
+Offline gazetteer for resolving place names without a network geocoder.
+
+A GeoNames-style dump (tab separated: geonameid, name, asciiname,
+alternatenames, latitude, longitude, feature class, feature code, country
+code, cc2, admin1 code, admin2, admin3, admin4, population, elevation, dem,
+timezone, modification date) is compiled into a single binary index file.
+The index is memory-mapped read-only, so every worker process shares the
+same page-cache pages and lookups do not grow resident memory with the size
+of the gazetteer.
+
+Besides exact name/alias keys the index carries a trigram inverted index
+over the distinct keys, used to match misspellings ("Banglore") with an
+edit-distance ranked confidence score. Extra aliases ("Bombay" -> "Mumbai")
+come from an alias table of `alias<TAB>canonical name` lines.
+
+Build an index from a dump:
+
+    python gazetteer.py build cities500.txt gazetteer.idx \
+        --admin1 admin1CodesASCII.txt --countries countryInfo.txt \
+        --aliases gazetteer_aliases.tsv
+"""
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+MAGIC = b"GZIX"
+FORMAT_VERSION = 2
+
+# Section order inside the index file
+SECTIONS = [
+    "records", "string_offsets", "string_blob", "key_offsets", "key_records", "key_blob",
+    "gram_keys", "gram_offsets", "gram_postings"
+]
+
+# Trigrams shared by more keys than this are skipped at query time (like stop words)
+MAX_GRAM_POSTINGS = 50000
+# Number of trigram candidates (best Dice overlap) that get an exact edit-distance check
+FUZZY_CANDIDATES = 8
+# Shorter names are only matched exactly: one edit already makes another place ("Gaza" -> "Gaya")
+FUZZY_MIN_LENGTH = 6
+
+HEADER = struct.Struct("<4sII" + "QQ" * len(SECTIONS))
+
+RECORD_DTYPE = np.dtype([
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("population", "<u4"),
+    ("name", "<u4"),          # String ids into the string table
+    ("admin1", "<u4"),
+    ("country", "<u4"),
+    ("country_code", "S2"),
+    ("tz", "<u4")
+])
+
+
+def normalize_name(name):
+    """Normalize a place name into an index key"""
+    return " ".join(re.sub(r"[.'`]", "", name.lower()).replace("-", " ").split())
+
+
+def _trigrams(key):
+    """Return the set of hashed trigrams of a normalized key"""
+    padded = f"  {key} "
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between two strings, or limit + 1 once it is known to exceed limit"""
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _read_tsv(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            yield line.rstrip("\n").split("\t")
+
+
+def _load_admin1_names(path):
+    """Load GeoNames admin1CodesASCII.txt into {"IN.16": "Maharashtra"}"""
+    if not path:
+        return {}
+    return {cols[0]: cols[1] for cols in _read_tsv(path) if len(cols) >= 2}
+
+
+def _load_country_names(path):
+    """Load GeoNames countryInfo.txt into {"IN": "India"}"""
+    if not path:
+        return {}
+    return {cols[0]: cols[4] for cols in _read_tsv(path) if len(cols) >= 5}
+
+
+def _load_aliases(path):
+    """Load an alias table into [(alias, canonical name)]"""
+    if not path:
+        return []
+    return [(cols[0], cols[1]) for cols in _read_tsv(path) if len(cols) >= 2]
+
+
+def _pack_strings(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+    return offsets, b"".join(encoded)
+
+
+def build_index(source_path, index_path, admin1_path=None, countries_path=None, aliases_path=None,
+                min_population=0):
+    """Compile a GeoNames-style dump into a memory-mappable index file"""
+    admin1_names = _load_admin1_names(admin1_path)
+    country_names = _load_country_names(countries_path)
+
+    strings = [""]
+    string_ids = {"": 0}
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    records = []
+    keys = []
+    filtered = set()
+    for cols in _read_tsv(source_path):
+        if len(cols) < 19:
+            continue
+        population = int(cols[14] or 0)
+        if population < min_population:
+            filtered.add(normalize_name(cols[1]))
+            continue
+
+        record_id = len(records)
+        country_code = cols[8]
+        records.append((
+            float(cols[4]),
+            float(cols[5]),
+            min(population, 0xFFFFFFFF),
+            intern(cols[1]),
+            intern(admin1_names.get(f"{country_code}.{cols[10]}", "")),
+            intern(country_names.get(country_code, country_code)),
+            country_code.encode("ascii", "ignore")[:2],
+            intern(cols[17])
+        ))
+
+        names = {cols[1], cols[2]}
+        names.update(n for n in cols[3].split(",") if n)
+        for key in {normalize_name(n) for n in names}:
+            if key:
+                keys.append((key.encode("utf-8"), record_id))
+
+    # Alias table entries point at every record already indexed under the canonical name
+    records_by_key = {}
+    for key, record_id in keys:
+        records_by_key.setdefault(key, []).append(record_id)
+    unresolved = []
+    for alias, canonical in _load_aliases(aliases_path):
+        alias_key = normalize_name(alias).encode("utf-8")
+        record_ids = records_by_key.get(normalize_name(canonical).encode("utf-8"), [])
+        if not record_ids and normalize_name(canonical) not in filtered:
+            unresolved.append(f"{alias} -> {canonical}")
+        for record_id in record_ids:
+            keys.append((alias_key, record_id))
+    if unresolved:
+        # Aliases of places below min_population are dropped silently; names missing from the source are mistakes
+        raise ValueError(f"Aliases name places missing from {source_path}: {', '.join(unresolved)}")
+
+    keys = sorted(set(keys))
+
+    # Trigram postings over distinct keys, pointing at each key's first entry in the key table
+    postings = {}
+    previous = None
+    for position, (key, _) in enumerate(keys):
+        if key == previous:
+            continue
+        previous = key
+        for gram in _trigrams(key.decode("utf-8")):
+            postings.setdefault(gram, []).append(position)
+    gram_keys = np.array(sorted(postings), dtype="<u4")
+    gram_offsets = np.zeros(len(gram_keys) + 1, dtype="<u4")
+    gram_offsets[1:] = np.cumsum([len(postings[g]) for g in gram_keys], dtype=np.uint64)
+    gram_postings = np.array([p for g in gram_keys for p in postings[g]], dtype="<u4")
+
+    string_offsets, string_blob = _pack_strings(strings)
+    key_offsets = np.zeros(len(keys) + 1, dtype="<u4")
+    key_offsets[1:] = np.cumsum([len(k) for k, _ in keys], dtype=np.uint64)
+    key_records = np.array([r for _, r in keys], dtype="<u4")
+    key_blob = b"".join(k for k, _ in keys)
+
+    sections = {
+        "records": np.array(records, dtype=RECORD_DTYPE).tobytes(),
+        "string_offsets": string_offsets.tobytes(),
+        "string_blob": string_blob,
+        "key_offsets": key_offsets.tobytes(),
+        "key_records": key_records.tobytes(),
+        "key_blob": key_blob,
+        "gram_keys": gram_keys.tobytes(),
+        "gram_offsets": gram_offsets.tobytes(),
+        "gram_postings": gram_postings.tobytes()
+    }
+
+    # Lay sections out back to back, 8-byte aligned, after the header
+    layout = []
+    position = HEADER.size
+    for name in SECTIONS:
+        position = (position + 7) & ~7
+        layout.extend([position, len(sections[name])])
+        position += len(sections[name])
+
+    # Write to a temp file and rename so concurrent readers never see a partial index
+    directory = os.path.dirname(os.path.abspath(index_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), *layout))
+            for i, name in enumerate(SECTIONS):
+                f.seek(layout[2 * i])
+                f.write(sections[name])
+        os.replace(tmp_path, index_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    return {"records": len(records), "keys": len(keys), "bytes": position}
+
+
+class Gazetteer:
+    """Read-only, memory-mapped view of a compiled gazetteer index"""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = HEADER.unpack_from(self._mm, 0)
+        magic, version, n_records = header[:3]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported gazetteer index: {index_path}")
+        layout = dict(zip(SECTIONS, zip(header[3::2], header[4::2])))
+
+        def section(name, dtype):
+            offset, length = layout[name]
+            return np.frombuffer(self._mm, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+        self.records = section("records", RECORD_DTYPE)
+        self._string_offsets = section("string_offsets", "<u4")
+        self._string_base = layout["string_blob"][0]
+        self._key_offsets = section("key_offsets", "<u4")
+        self._key_records = section("key_records", "<u4")
+        self._key_base = layout["key_blob"][0]
+        self._gram_keys = section("gram_keys", "<u4")
+        self._gram_offsets = section("gram_offsets", "<u4")
+        self._gram_postings = section("gram_postings", "<u4")
+        self.n_records = n_records
+        self.n_keys = len(self._key_records)
+
+    def _string(self, string_id):
+        start = self._string_base + int(self._string_offsets[string_id])
+        end = self._string_base + int(self._string_offsets[string_id + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def _key(self, i):
+        start = self._key_base + int(self._key_offsets[i])
+        end = self._key_base + int(self._key_offsets[i + 1])
+        return self._mm[start:end]
+
+    def _key_range(self, key):
+        """Binary search the sorted key table for all entries equal to key"""
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < self.n_keys and self._key(end) == key:
+            end += 1
+        return lo, end
+
+    def record(self, record_id):
+        """Return a record as a dict"""
+        rec = self.records[record_id]
+        return {
+            "id": int(record_id),
+            "name": self._string(rec["name"]),
+            "lat": float(rec["lat"]),
+            "lon": float(rec["lon"]),
+            "tz": self._string(rec["tz"]),
+            "admin1": self._string(rec["admin1"]),
+            "country": self._string(rec["country"]),
+            "country_code": rec["country_code"].decode("ascii"),
+            "population": int(rec["population"])
+        }
+
+    def candidates(self, name):
+        """Return record ids whose name or alias equals name"""
+        start, end = self._key_range(normalize_name(name).encode("utf-8"))
+        return [int(r) for r in self._key_records[start:end]]
+
+    def fuzzy_candidates(self, name, limit=5):
+        """Return [(key, confidence)] for index keys closest to name by trigram overlap and edit distance"""
+        query = normalize_name(name)
+        grams = np.array(sorted(_trigrams(query)), dtype="<u4")
+        if not len(grams) or not len(self._gram_keys):
+            return []
+
+        positions = np.searchsorted(self._gram_keys, grams)
+        found = positions < len(self._gram_keys)
+        found[found] = self._gram_keys[positions[found]] == grams[found]
+        lists = []
+        for p in positions[found]:
+            start, end = int(self._gram_offsets[p]), int(self._gram_offsets[p + 1])
+            if end - start <= MAX_GRAM_POSTINGS:
+                lists.append(self._gram_postings[start:end])
+        if not lists:
+            return []
+
+        # Keys with the best trigram Dice overlap get the exact edit-distance check
+        key_ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        key_lengths = (self._key_offsets[key_ids + 1] - self._key_offsets[key_ids]).astype(np.float64)
+        dice = 2.0 * shared / (len(grams) + key_lengths + 1)
+        if len(key_ids) > FUZZY_CANDIDATES:
+            top = np.argpartition(-dice, FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]
+            key_ids, dice = key_ids[top], dice[top]
+
+        scored = []
+        worst = len(query)
+        for key_id in key_ids[np.argsort(-dice)]:
+            key = self._key(int(key_id)).decode("utf-8")
+            distance = _edit_distance(query, key, worst)
+            if distance > worst:
+                continue
+            scored.append((key, round(1.0 - distance / max(len(query), len(key)), 4)))
+            if len(scored) >= limit:
+                scored.sort(key=lambda item: -item[1])
+                del scored[limit:]
+                worst = min(worst, distance)
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def match(self, place, min_confidence=0.0):
+        """Resolve a place exactly or fuzzily; returns the best record with a confidence score.
+
+        A fuzzy match needs a name of at least FUZZY_MIN_LENGTH characters and a confidence above min_confidence.
+        """
+        parts = [p for p in (normalize_name(p) for p in place.split(",")) if p]
+        if not parts:
+            return None
+
+        record_ids = self.candidates(parts[0])
+        confidence = 1.0
+        if not record_ids:
+            if len(parts[0]) < FUZZY_MIN_LENGTH:
+                return None
+            fuzzy = self.fuzzy_candidates(parts[0], limit=1)
+            if not fuzzy or fuzzy[0][1] <= min_confidence:
+                return None
+            key, confidence = fuzzy[0]
+            record_ids = self.candidates(key)
+
+        result = self._best_record(record_ids, set(parts[1:]))
+        if result is not None:
+            result["confidence"] = confidence
+        return result
+
+    def lookup(self, place):
+        """Resolve "City" or "City, Region, Country" to the best exactly matching record, or None"""
+        parts = [p for p in (normalize_name(p) for p in place.split(",")) if p]
+        if not parts:
+            return None
+
+        record_ids = self.candidates(parts[0])
+        if not record_ids:
+            return None
+        return self._best_record(record_ids, set(parts[1:]))
+
+    def _best_record(self, record_ids, qualifiers):
+        """Pick the record best matching the region qualifiers, then the most populous; None if no record matches any"""
+        # Prefer records whose admin1 / country match the qualifiers, then the most populous.
+        # "Hyderabad, Pakistan" must not resolve to Hyderabad, India: with qualifiers given, a
+        # record has to match at least one of them, otherwise the place is left to the geocoder.
+        def rank(record_id):
+            rec = self.records[record_id]
+            regions = {
+                normalize_name(self._string(rec["admin1"])),
+                normalize_name(self._string(rec["country"])),
+                rec["country_code"].decode("ascii").lower()
+            }
+            return len(qualifiers & regions), int(rec["population"])
+
+        best = max(record_ids, key=rank)
+        if qualifiers and not rank(best)[0]:
+            return None
+        return self.record(best)
+
+    def stats(self):
+        """Return index size information"""
+        return {
+            "path": self.path,
+            "records": self.n_records,
+            "keys": self.n_keys,
+            "trigrams": len(self._gram_keys),
+            "bytes": len(self._mm)
+        }
+
+
+def load_or_build(index_path, source_path, aliases_path=None, admin1_path=None, countries_path=None):
+    """Open a compiled index, compiling it from source_path first if it is missing or stale"""
+    inputs = [p for p in (source_path, aliases_path, admin1_path, countries_path) if p and os.path.exists(p)]
+    stale = not os.path.exists(index_path) or any(
+        os.path.getmtime(p) > os.path.getmtime(index_path) for p in inputs
+    )
+    if not stale:
+        try:
+            return Gazetteer(index_path)
+        except ValueError:
+            pass
+    build_index(source_path, index_path, admin1_path, countries_path, aliases_path)
+    return Gazetteer(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and query the offline gazetteer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Compile a GeoNames-style dump into an index")
+    build.add_argument("source")
+    build.add_argument("index")
+    build.add_argument("--admin1", help="GeoNames admin1CodesASCII.txt")
+    build.add_argument("--countries", help="GeoNames countryInfo.txt")
+    build.add_argument("--aliases", help="Alias table (alias<TAB>canonical name)")
+    build.add_argument("--min-population", type=int, default=0)
+
+    query = subparsers.add_parser("lookup", help="Resolve a place name against an index")
+    query.add_argument("index")
+    query.add_argument("place")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print(build_index(args.source, args.index, args.admin1, args.countries, args.aliases,
+                          args.min_population))
+    else:
+        print(Gazetteer(args.index).match(args.place))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Persistent geocode cache backed by SQLite.
+
+Resolved places are stored as (lat, lon, tz) keyed by the normalized place
+string so that a place we have already looked up never goes back to the
+network geocoder, even across restarts. Places the geocoder could not find
+(misses) and lookups that failed (network errors, rate limits) are cached
+as negative entries with shorter TTLs.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Default time-to-live values in seconds
+DEFAULT_TTL = 30 * 24 * 3600       # Resolved places: 30 days
+DEFAULT_MISS_TTL = 24 * 3600       # Place not found by the geocoder: 1 day
+DEFAULT_FAILURE_TTL = 5 * 60       # Geocoder error / timeout: 5 minutes
+
+STATUS_FOUND = "found"
+STATUS_MISS = "miss"
+STATUS_FAILURE = "failure"
+
+
+def normalize_place(place):
+    """Normalize a place string into a cache key"""
+    return re.sub(r"\s*,\s*", ", ", " ".join(place.lower().split())).strip(", ")
+
+
+class GeocodeCache:
+    """SQLite-backed (lat, lon, tz) store with TTLs and hit/miss counters"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, miss_ttl=DEFAULT_MISS_TTL, failure_ttl=DEFAULT_FAILURE_TTL):
+        self.path = path
+        self.ttls = {
+            STATUS_FOUND: ttl,
+            STATUS_MISS: miss_ttl,
+            STATUS_FAILURE: failure_ttl
+        }
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "stores": 0
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " place TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " lat REAL,"
+            " lon REAL,"
+            " tz TEXT,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def get(self, place):
+        """Return the cached entry for a place as a dict, or None on a miss"""
+        key = normalize_place(place)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, lat, lon, tz, expires_at FROM geocode WHERE place = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            status, lat, lon, tz, expires_at = row
+            if expires_at <= now:
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                self._conn.execute("DELETE FROM geocode WHERE place = ?", (key,))
+                return None
+            if status == STATUS_FOUND:
+                self._stats["hits"] += 1
+            else:
+                self._stats["negative_hits"] += 1
+        return {"status": status, "lat": lat, "lon": lon, "tz": tz}
+
+    def put(self, place, lat, lon, tz):
+        """Store a resolved place"""
+        self._store(place, STATUS_FOUND, lat, lon, tz)
+
+    def put_miss(self, place):
+        """Remember that the geocoder does not know this place"""
+        self._store(place, STATUS_MISS, None, None, None)
+
+    def put_failure(self, place):
+        """Remember that geocoding this place just failed"""
+        self._store(place, STATUS_FAILURE, None, None, None)
+
+    def _store(self, place, status, lat, lon, tz):
+        key = normalize_place(place)
+        expires_at = time.time() + self.ttls[status]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (place, status, lat, lon, tz, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, lat, lon, tz, expires_at)
+            )
+            self._stats["stores"] += 1
+
+    def purge_expired(self):
+        """Delete expired entries and return how many were removed"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0.0
+        stats["path"] = self.path
+        return stats
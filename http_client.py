@@ -0,0 +1,245 @@
+"""
+Shared client for outbound HTTP calls (geocoder, LLM).
+
+Each host gets one requests.Session with a keep-alive connection pool, so
+repeated calls to the same upstream reuse TCP and TLS connections. At
+most `max_concurrent` calls per host are in flight; a caller waits for a
+slot no longer than its timeout. For streamed responses the slot is
+released once the headers have arrived.
+
+Responses with a retryable status (429, 500, 502, 503, 504) and
+connection errors are retried up to `retries` times. Waits use full
+jitter (uniform in [0, backoff * 2^attempt], capped at `max_backoff`)
+or the upstream's Retry-After when it sends one. Timeouts are not
+retried.
+
+A Deadline is the time budget of one piece of work, e.g. an inbound API
+request. Every attempt's timeout is the smaller of its own cap and what
+is left of the deadline, and a retry is only made if its wait fits in
+the budget. Past the deadline DeadlineExceeded (a requests Timeout) is
+raised. The current deadline lives in a context variable. Set it with
+`deadline()` or `set_deadline()`, and calls made below pick it up
+without threading it through every function.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The deadline ran out before an outbound call could be made or finished"""
+
+
+class Deadline:
+    """Absolute time budget shared by the outbound calls of one piece of work"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, cap=None):
+        """Timeout for the next call: what is left of the budget, at most cap"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"deadline of {self.seconds}s exceeded")
+        return remaining if cap is None else min(cap, remaining)
+
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    """The Deadline of the current context, or None"""
+    return _deadline.get()
+
+
+def set_deadline(seconds):
+    """Start a deadline in the current context; returns the token for reset_deadline()"""
+    return _deadline.set(Deadline(seconds))
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline(seconds):
+    """Run a block under a deadline of `seconds`"""
+    token = set_deadline(seconds)
+    try:
+        yield current_deadline()
+    finally:
+        reset_deadline(token)
+
+
+class _Host:
+    """Session, concurrency slots and counters of one upstream host"""
+
+    def __init__(self, max_concurrent):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0,
+            "deadline_exceeded": 0,
+            "in_flight": 0
+        }
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.stats[name] += delta
+
+
+class HTTPClient:
+    """Pooled, concurrency-bounded outbound HTTP with jittered retries and deadline budgets"""
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, timeout=DEFAULT_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        host = self._hosts.get(key)
+        if host is None:
+            with self._lock:
+                host = self._hosts.setdefault(key, _Host(self.max_concurrent))
+        return host
+
+    def _retry_delay(self, attempt, response):
+        """Seconds to wait before retry number attempt + 1"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, timeout=None, deadline=None, retries=None, **kwargs):
+        """Make a request through the host's pool; returns the last response (which may have a retryable status)"""
+        host = self._host(url)
+        timeout = timeout or self.timeout
+        deadline = deadline or current_deadline()
+        retries = self.retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            try:
+                call_timeout = deadline.timeout(timeout) if deadline else timeout
+                if not host.slots.acquire(timeout=call_timeout):
+                    raise DeadlineExceeded(f"no free connection to {urlsplit(url).netloc} within {call_timeout:.1f}s")
+            except DeadlineExceeded:
+                host.count("deadline_exceeded")
+                raise
+            host.count("requests")
+            host.count("in_flight")
+            response = None
+            try:
+                # The deadline may have moved while waiting for the slot
+                call_timeout = deadline.timeout(timeout) if deadline else timeout
+                response = host.session.request(method, url, timeout=call_timeout, **kwargs)
+            except DeadlineExceeded:
+                host.count("deadline_exceeded")
+                raise
+            except requests.exceptions.Timeout as e:
+                host.count("errors")
+                if deadline and call_timeout < timeout:
+                    # The deadline, not the call's own cap, set this timeout
+                    host.count("deadline_exceeded")
+                    raise DeadlineExceeded(f"deadline of {deadline.seconds}s exceeded calling {url}") from e
+                raise
+            except requests.exceptions.ConnectionError:
+                host.count("errors")
+                if attempt == retries:
+                    raise
+            except requests.exceptions.RequestException:
+                host.count("errors")
+                raise
+            finally:
+                host.count("in_flight", -1)
+                host.slots.release()
+
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt == retries):
+                return response
+            delay = self._retry_delay(attempt, response)
+            if deadline and delay >= deadline.remaining():
+                if response is not None:
+                    return response
+                host.count("deadline_exceeded")
+                raise DeadlineExceeded(f"no time left to retry {url}")
+            if response is not None:
+                response.close()
+            host.count("retries")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def as_session(self):
+        """A minimal requests.Session stand-in for libraries that take a session (get, post, close)"""
+        return _SessionView(self)
+
+    def close(self):
+        with self._lock:
+            for host in self._hosts.values():
+                host.session.close()
+            self._hosts.clear()
+
+    def stats(self):
+        """Return per-host request, retry and error counters"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        hosts = {key: dict(host.stats) for key, host in hosts.items()}
+        return {
+            "max_concurrent": self.max_concurrent,
+            "retries": self.retries,
+            "hosts": hosts
+        }
+
+
+class _SessionView:
+    """Session-like view of an HTTPClient"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, url, **kwargs):
+        return self._client.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._client.post(url, **kwargs)
+
+    def close(self):
+        pass
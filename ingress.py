@@ -0,0 +1,167 @@
+"""
+Nakshatra / pada ingress index.
+
+Precomputes the exact Julian days at which the Moon enters each of the 108
+nakshatra padas (3°20' each; 4 padas per nakshatra, 9 per rashi) over a
+date range. Crossings are found by Newton iteration on `swe.calc_ut(jd,
+swe.MOON)` to within 1e-7 degrees, a few milliseconds of time. The Moon
+never moves backwards, so the crossings form one sorted array. It starts
+at the last ingress before the requested start, so the first pada has a
+real lower boundary too.
+
+Classifying a birth is then a single binary search. The same search gives
+the distance in days to the nearest pada boundary, which tells us how close
+a chart is to changing nakshatra or rashi.
+
+Build an index:
+
+    python ingress.py build moon_ingress.bin --start 1900 --end 2100
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+
+import numpy as np
+import swisseph as swe
+
+MAGIC = b"INGR"
+FORMAT_VERSION = 2                  # 1 started at the range start instead of an ingress
+
+HEADER = struct.Struct("<4sIQi")
+DATA_OFFSET = 64
+
+PADAS = 108
+PADA_WIDTH = 360.0 / PADAS
+TOLERANCE_DEG = 1e-7
+
+
+def _moon(jd):
+    """Moon longitude and speed exactly as get_moon_data sees them"""
+    position, flag = swe.calc_ut(jd, swe.MOON)
+    return position[0], position[3], flag
+
+
+def _find_crossing(boundary, jd, longitude, speed):
+    """Newton iteration for the Julian day at which the Moon reaches boundary degrees"""
+    for _ in range(20):
+        delta = (boundary - longitude + 180.0) % 360.0 - 180.0
+        if abs(delta) < TOLERANCE_DEG:
+            break
+        jd += delta / speed
+        longitude, speed, _ = _moon(jd)
+    return jd
+
+
+def build_index(path, start_year=1900, end_year=2100):
+    """Find every pada ingress between two years and write a memory-mappable index"""
+    start_jd = swe.julday(start_year, 1, 1, 0.0)
+    end_jd = swe.julday(end_year + 1, 1, 1, 0.0)
+
+    longitude, speed, ephemeris_flag = _moon(start_jd)
+    pada = int(longitude // PADA_WIDTH) % PADAS
+
+    # The first entry is the ingress into the pada the Moon is in at start_jd, found backwards from it
+    boundary = pada * PADA_WIDTH
+    estimate = start_jd - ((longitude - boundary) % 360.0) / speed
+    longitude, speed, _ = _moon(estimate)
+    jd = _find_crossing(boundary, estimate, longitude, speed)
+    longitude, speed, _ = _moon(jd)
+    crossings = [jd]
+    padas = [pada]
+    while jd < end_jd:
+        pada = (pada + 1) % PADAS
+        boundary = pada * PADA_WIDTH
+        estimate = jd + ((boundary - longitude) % 360.0) / speed
+        longitude, speed, _ = _moon(estimate)
+        jd = _find_crossing(boundary, estimate, longitude, speed)
+        longitude, speed, _ = _moon(jd)
+        crossings.append(jd)
+        padas.append(pada)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(crossings), ephemeris_flag))
+            f.seek(DATA_OFFSET)
+            f.write(np.array(crossings, dtype="<f8").tobytes())
+            f.write(np.array(padas, dtype="u1").tobytes())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    return {"crossings": len(crossings), "start_jd": crossings[0], "end_jd": crossings[-1]}
+
+
+class IngressIndex:
+    """Memory-mapped sorted pada ingress times"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, n, ephemeris_flag = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ingress index: {path}")
+
+        self.jds = np.memmap(path, dtype="<f8", mode="r", offset=DATA_OFFSET, shape=(n,))
+        self.padas = np.memmap(path, dtype="u1", mode="r", offset=DATA_OFFSET + 8 * n, shape=(n,))
+        self.start_jd = float(self.jds[0])
+        self.end_jd = float(self.jds[-1])
+        self.ephemeris_flag = ephemeris_flag
+
+    def covers(self, jd):
+        """Whether jd lies inside the indexed range"""
+        return self.start_jd <= jd < self.end_jd
+
+    def classify(self, jd):
+        """Return (rashi, nakshatra, pada, days_to_boundary) for a Julian day; 1-based like get_moon_data"""
+        i = int(np.searchsorted(self.jds, jd, side="right")) - 1
+        pada = int(self.padas[i])
+        days_to_boundary = min(jd - float(self.jds[i]), float(self.jds[i + 1]) - jd)
+        return pada // 9 + 1, pada // 4 + 1, pada % 4 + 1, days_to_boundary
+
+    def classify_array(self, jds):
+        """Vectorized classify; returns arrays (rashi, nakshatra, pada, days_to_boundary), -1 / NaN outside the range"""
+        jds = np.asarray(jds, dtype=np.float64)
+        inside = (jds >= self.start_jd) & (jds < self.end_jd)
+        i = np.clip(np.searchsorted(self.jds, jds, side="right") - 1, 0, len(self.jds) - 2)
+        pada = self.padas[i].astype(np.int16)
+        days_to_boundary = np.minimum(jds - self.jds[i], self.jds[i + 1] - jds)
+        return (
+            np.where(inside, pada // 9 + 1, -1),
+            np.where(inside, pada // 4 + 1, -1),
+            np.where(inside, pada % 4 + 1, -1),
+            np.where(inside, days_to_boundary, np.nan)
+        )
+
+    def info(self):
+        """Return the indexed range"""
+        return {
+            "path": self.path,
+            "crossings": len(self.jds),
+            "start_jd": self.start_jd,
+            "end_jd": self.end_jd,
+            "ephemeris_flag": self.ephemeris_flag
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the nakshatra pada ingress index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build")
+    build.add_argument("path")
+    build.add_argument("--start", type=int, default=1900)
+    build.add_argument("--end", type=int, default=2100)
+
+    args = parser.parse_args()
+    swe.set_ephe_path('.')
+    swe.set_sid_mode(swe.SIDM_LAHIRI)
+    print(build_index(args.path, args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Persistent queue of background jobs run by a bounded thread pool.
+
+A job is a JSON payload handed to the queue's handler on a worker thread.
+Jobs are rows in SQLite (id, key, status, payload, result, error, owner,
+lease and timestamps), so they survive restarts. The owner is the
+instance id of the queue that queued or runs the job, a uuid drawn when
+the queue is created (pids are reused, e.g. by every container restart,
+so they cannot tell a new process from the old one). While a queue is
+open a heartbeat thread extends the lease of its unfinished jobs every
+`lease / 3` seconds. recover(), called once at server startup, queues
+again the unfinished jobs whose lease has expired; jobs of a live queue
+(another server worker sharing the store) keep a fresh lease and are left
+to it, so no job runs twice. At most `workers` jobs run at once and at
+most `max_queued` are unfinished; past that submit() raises QueueFull.
+
+A job moves queued -> running -> done (result is the handler's return
+value) or failed (error is the exception message). Submitting with the
+key of a job that is done, or unfinished with a live lease, returns that
+job instead of queuing a new one, so clients repeating a request share
+one job. An unfinished job whose lease has expired is marked failed and
+replaced, so clients are not left polling a job nobody runs. wait() blocks
+until a job finishes or a timeout passes, for long-polling. Finished
+jobs are deleted `ttl` seconds after they finish.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 1000
+DEFAULT_TTL = 24 * 3600            # Finished jobs: 1 day
+DEFAULT_LEASE = 60                 # Unfinished jobs of a queue that stopped renewing them: 1 minute
+PURGE_INTERVAL = 60
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+FINISHED = (STATUS_DONE, STATUS_FAILED)
+
+UNFINISHED = (STATUS_QUEUED, STATUS_RUNNING)
+
+_COLUMNS = "id, status, result, error, created_at, started_at, finished_at"
+
+
+class QueueFull(Exception):
+    """Raised by submit() when max_queued jobs are already unfinished"""
+
+
+class JobQueue:
+    """SQLite-backed job queue with a bounded worker pool and long-polling"""
+
+    def __init__(self, path, handler, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED, ttl=DEFAULT_TTL,
+                 lease=DEFAULT_LEASE, owner=None):
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease = lease
+        self.owner = owner or uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._running = 0
+        self._purged_at = 0
+        self._stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "rejected": 0,
+            "recovered": 0,
+            "superseded": 0,
+            "done": 0,
+            "failed": 0
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " key TEXT,"
+            " status TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " owner TEXT,"
+            " lease_until REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "lease_until" not in columns:
+            # Jobs of older versions have no lease, so they count as expired
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _renew_leases(self):
+        """Extend the lease of this queue's unfinished jobs until shutdown()"""
+        while not self._stopped.wait(self.lease / 3):
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN (?, ?)",
+                    (time.time() + self.lease, self.owner) + UNFINISHED
+                )
+
+    def recover(self):
+        """Queue again the unfinished jobs whose lease has expired; returns how many were taken over"""
+        recovered = []
+        with self._lock:
+            self._purge()
+            now = time.time()
+            rows = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?) AND (lease_until IS NULL OR lease_until < ?)"
+                " ORDER BY created_at", UNFINISHED + (now,)
+            ).fetchall()
+            for job_id, owner in rows:
+                if owner == self.owner:
+                    continue
+                # Claim the job only if no other queue has taken it over since the SELECT
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = NULL, owner = ?, lease_until = ? WHERE id = ? AND owner IS ?",
+                    (STATUS_QUEUED, self.owner, now + self.lease, job_id, owner)
+                ).rowcount
+                if claimed:
+                    recovered.append(job_id)
+            self._unfinished += len(recovered)
+            self._stats["recovered"] += len(recovered)
+        for job_id in recovered:
+            self._executor.submit(self._run, job_id)
+        return len(recovered)
+
+    def _purge(self):
+        """Delete jobs that finished more than ttl seconds ago; the caller holds the lock"""
+        now = time.time()
+        self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - self.ttl,))
+        self._purged_at = now
+
+    def _job(self, row):
+        """Public dict of a jobs row (sorted keys)"""
+        job_id, status, result, error, created_at, started_at, finished_at = row
+        job = {
+            "created_at": created_at,
+            "finished_at": finished_at,
+            "job_id": job_id,
+            "started_at": started_at,
+            "status": status
+        }
+        if status == STATUS_DONE:
+            job["result"] = json.loads(result)
+        elif status == STATUS_FAILED:
+            job["error"] = error
+        return dict(sorted(job.items()))
+
+    def _get(self, job_id):
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def submit(self, payload, key=None):
+        """Queue a job for a JSON-serializable payload; returns (job, created).
+
+        When a job with the same key is done, or unfinished with a live lease, that job is returned with created
+        False. An unfinished job with the key whose lease has expired is marked failed and a new job is queued.
+        """
+        with self._lock:
+            now = time.time()
+            if now - self._purged_at > PURGE_INTERVAL:
+                self._purge()
+            if key is not None:
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS}, lease_until FROM jobs WHERE key = ? AND status != ?"
+                    " ORDER BY created_at DESC LIMIT 1",
+                    (key, STATUS_FAILED)
+                ).fetchone()
+                if row and row[1] in UNFINISHED and (row[-1] is None or row[-1] < now):
+                    # Nobody renews this job: fail it, unless another queue has just claimed it
+                    superseded = self._conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)"
+                        " AND (lease_until IS NULL OR lease_until < ?)",
+                        (STATUS_FAILED, "lease expired; superseded by a new job", now, row[0]) + UNFINISHED + (now,)
+                    ).rowcount
+                    if superseded:
+                        self._stats["superseded"] += 1
+                        row = None
+                    else:
+                        row = self._conn.execute(f"SELECT {_COLUMNS}, lease_until FROM jobs WHERE id = ?",
+                                                 (row[0],)).fetchone()
+                if row:
+                    self._stats["deduplicated"] += 1
+                    return self._job(row[:-1]), False
+            if self._unfinished >= self.max_queued:
+                self._stats["rejected"] += 1
+                raise QueueFull(f"{self._unfinished} jobs are already queued")
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, key, status, payload, created_at, owner, lease_until) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, STATUS_QUEUED, json.dumps(payload), now, self.owner, now + self.lease)
+            )
+            self._unfinished += 1
+            self._stats["submitted"] += 1
+            job = self._get(job_id)
+        self._executor.submit(self._run, job_id)
+        return job, True
+
+    def _run(self, job_id):
+        """Run one job on a worker thread and record its outcome"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM jobs WHERE id = ? AND owner = ? AND status = ?", (job_id, self.owner, STATUS_QUEUED)
+            ).fetchone()
+            if row is None:
+                # Purged, superseded or taken over by another queue
+                self._unfinished -= 1
+                return
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (STATUS_RUNNING, time.time(), job_id)
+            )
+            self._running += 1
+
+        result = error = None
+        try:
+            result = json.dumps(self.handler(json.loads(row[0])))
+            status = STATUS_DONE
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            error = str(e)
+            status = STATUS_FAILED
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+            self._unfinished -= 1
+            self._running -= 1
+            self._stats[status] += 1
+            self._finished.notify_all()
+
+    def get(self, job_id):
+        """The job as a dict, or None"""
+        with self._lock:
+            return self._get(job_id)
+
+    def wait(self, job_id, timeout):
+        """The job once it has finished or after timeout seconds, whichever comes first; None if unknown"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                job = self._get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return job
+                self._finished.wait(remaining)
+
+    def shutdown(self, wait=True):
+        """Stop the workers and the heartbeat; unfinished jobs stay queued until another queue recovers them"""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        """Return queue sizes and job counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = self._unfinished - self._running
+            stats["running"] = self._running
+            stats["stored"] = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        stats["workers"] = self.workers
+        stats["max_queued"] = self.max_queued
+        stats["lease"] = self.lease
+        stats["path"] = self.path
+        return stats
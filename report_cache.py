@@ -0,0 +1,136 @@
+"""
+Persistent cache of LLM-generated reports backed by SQLite.
+
+A report is keyed by the fingerprint of the request that produced it:
+a SHA-256 over the canonical JSON (sorted keys, compact) of the model
+parameters and messages, which are built from the Vedic data. The same
+names, charts and scores therefore map to the same entry, and a change to
+the prompt or the model settings gets new ones.
+
+Entries older than `ttl` seconds are treated as misses and deleted. The
+cache is bounded by the total size of the stored reports; past
+`max_bytes` the least recently used entries are deleted first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 30 * 24 * 3600       # 30 days
+
+MODE_DEFAULT = "default"           # Cached report if there is one, else generate and store
+MODE_CACHE_ONLY = "cache_only"     # Cached report or nothing; never calls the model
+MODE_REFRESH = "refresh"           # Always generate, replacing the cached report
+
+MODES = (MODE_DEFAULT, MODE_CACHE_ONLY, MODE_REFRESH)
+
+
+def fingerprint(request):
+    """Hex SHA-256 of a JSON-serializable model request in canonical form"""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ReportCache:
+    """SQLite-backed fingerprint -> report store with size and age eviction and hit counters"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " key TEXT PRIMARY KEY,"
+            " report TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_accessed_at ON reports (accessed_at)")
+        self._conn.execute("DELETE FROM reports WHERE created_at < ?", (time.time() - ttl,))
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM reports").fetchone()[0]
+
+    def get(self, key):
+        """Return the cached report for a fingerprint, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT report, bytes, created_at FROM reports WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            report, size, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM reports WHERE key = ?", (key,))
+                self._bytes -= size
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE reports SET accessed_at = ? WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+        return json.loads(report)
+
+    def put(self, key, report):
+        """Store a report under a fingerprint, evicting least recently used entries past max_bytes"""
+        encoded = json.dumps(report, separators=(",", ":"), ensure_ascii=False)
+        size = len(key) + len(encoded.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT bytes FROM reports WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (key, report, bytes, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, size, now, now)
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            while self._bytes > self.max_bytes:
+                evicted = self._conn.execute(
+                    "SELECT key, bytes FROM reports WHERE key != ? ORDER BY accessed_at LIMIT 64", (key,)
+                ).fetchall()
+                if not evicted:
+                    break
+                for evicted_key, evicted_size in evicted:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM reports WHERE key = ?", (evicted_key,))
+                    self._bytes -= evicted_size
+                    self._stats["evictions"] += 1
+            self._conn.execute("COMMIT")
+            self._stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM reports")
+            self._bytes = 0
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl"] = self.ttl
+        stats["path"] = self.path
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        return stats
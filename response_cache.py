@@ -0,0 +1,112 @@
+"""
+In-memory cache of serialized API responses keyed by normalized request inputs.
+
+The caller builds the key with `request_key()`: a SHA-256 over the
+canonical JSON of the inputs that determine the response (normalized
+date and time, resolved coordinates, rule set, requested fields, ...). So
+"1990-5-15"/"Bombay" and "1990-05-15"/"Mumbai" share one entry. A
+repeated request then costs one hash and one dict lookup.
+
+Entries are response bodies (bytes) with a strong ETag, the SHA-256 of
+the body. The cache is an LRU bounded by the total size of keys and
+bodies; a body larger than the whole budget is not stored.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def request_key(*parts):
+    """Canonical hash of JSON-serializable request parts"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def make_etag(body):
+    """Strong ETag of a response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches the ETag (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+class ResponseCache:
+    """Byte-bounded LRU of request key -> (body, etag)"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "not_modified": 0
+        }
+
+    def get(self, key):
+        """Return (body, etag) for a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key, body):
+        """Store a body under a key; returns its ETag"""
+        etag = make_etag(body)
+        size = len(key) + len(body)
+        if size > self.max_bytes:
+            return etag
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(key) + len(previous[0])
+            self._entries[key] = (body, etag)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                evicted_key, (evicted_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_key) + len(evicted_body)
+                self._stats["evictions"] += 1
+        return etag
+
+    def not_modified(self, if_none_match, etag):
+        """etag_matches, counted in the stats"""
+        if etag_matches(if_none_match, etag):
+            with self._lock:
+                self._stats["not_modified"] += 1
+            return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        return stats
@@ -0,0 +1,305 @@
+"""
+Koota rule sets compiled to lookup tables.
+
+Each rule set is a declarative description of the eight Ashtakoota kootas.
+At startup it is compiled into a dense table indexed by the two partners'
+chart classes, so even the classical rules (animal Yoni tables, Gana
+classes, Nadi groups, lord friendships, dosha cancellations) cost one array
+lookup per pair. A request then selects a rule set by name.
+
+Rule kinds (all scores are in points; partner1 indexes rows, partner2
+columns):
+
+- diff: score by the absolute difference of the two rashis / nakshatras
+  (the original simplified rules)
+- groups: map each rashi / nakshatra to a group and score group x group
+  with a matrix
+- tara: count nakshatras both ways and score by how many counts avoid the
+  inauspicious remainders
+- mutual_position: rashi positions counted both ways; the listed position
+  pairs are doshas
+- lords: relationship of the two rashi lords using a natural friendship
+  table
+
+A koota may also list cancellations: conditions under which its dosha is
+cancelled and it scores its maximum. Rule sets can extend another set and
+choose the resolution of their classes:
+
+- "nakshatra": (rashi, nakshatra) pairs, 12 x 27 = 324 classes
+- "pada": the 108 nakshatra padas, for rules that look at the pada
+
+Classical tables use half points (0.5, 1.5), so tables hold uint8 half
+points: divide by HALF for points.
+
+The classical rule sets follow the usual convention that partner1 is the
+groom and partner2 the bride (Varna, Vashya and Gana are directional).
+"""
+
+import numpy as np
+
+KOOTAS = ["varna", "vashya", "tara", "yoni", "graha_maitri", "gana", "bhakoot", "nadi"]
+KOOTA_MAX = [1, 2, 3, 4, 5, 6, 7, 8]
+TOTAL = len(KOOTAS)
+HALF = 2
+
+RESOLUTION_CLASSES = {"nakshatra": 12 * 27, "pada": 108}
+
+# Fine classes used by the candidate store: (rashi, nakshatra, pada 0-4), pada 0 = unknown
+FINE_CLASSES = 12 * 27 * 5
+
+RASHI_LORDS = [
+    "Mars", "Venus", "Mercury", "Moon", "Sun", "Mercury",
+    "Venus", "Mars", "Jupiter", "Saturn", "Saturn", "Jupiter"
+]
+
+# Natural planetary friendships; anyone not listed is neutral
+FRIENDSHIP = {
+    "Sun": {"friends": ["Moon", "Mars", "Jupiter"], "enemies": ["Venus", "Saturn"]},
+    "Moon": {"friends": ["Sun", "Mercury"], "enemies": []},
+    "Mars": {"friends": ["Sun", "Moon", "Jupiter"], "enemies": ["Mercury"]},
+    "Mercury": {"friends": ["Sun", "Venus"], "enemies": ["Moon"]},
+    "Jupiter": {"friends": ["Sun", "Moon", "Mars"], "enemies": ["Mercury", "Venus"]},
+    "Venus": {"friends": ["Mercury", "Saturn"], "enemies": ["Sun", "Moon"]},
+    "Saturn": {"friends": ["Mercury", "Venus"], "enemies": ["Sun", "Moon", "Mars"]}
+}
+
+# Classical groupings, one entry per rashi / nakshatra in order
+VARNA = [3, 2, 1, 4, 3, 2, 1, 4, 3, 2, 1, 4]  # 4 Brahmin ... 1 Shudra
+VASHYA = [0, 0, 1, 2, 3, 1, 1, 4, 1, 0, 1, 2]  # Chatushpada, Manava, Jalachara, Vanachara, Keeta (by each sign's first half)
+YONI = [0, 1, 2, 3, 3, 4, 5, 2, 5, 6, 6, 7, 8, 9, 8, 9, 10, 10, 4, 11, 12, 11, 13, 0, 13, 7, 1]
+GANA = [0, 1, 2, 1, 0, 1, 0, 0, 2, 2, 1, 1, 0, 2, 0, 2, 0, 2, 2, 1, 1, 0, 2, 2, 1, 1, 0]  # Deva, Manushya, Rakshasa
+NADI = [0, 1, 2, 2, 1, 0] * 4 + [0, 1, 2]  # Adi, Madhya, Antya in the usual zig-zag
+
+VASHYA_POINTS = [
+    [2, 1, 1, 0.5, 1],
+    [1, 2, 0.5, 0, 1],
+    [1, 0.5, 2, 1, 1],
+    [0.5, 0, 1, 2, 0],
+    [1, 1, 1, 0, 2]
+]
+# Horse, Elephant, Sheep, Serpent, Dog, Cat, Rat, Cow, Buffalo, Tiger, Deer, Monkey, Mongoose, Lion
+YONI_POINTS = [
+    [4, 2, 2, 3, 2, 2, 2, 1, 0, 1, 3, 3, 2, 1],
+    [2, 4, 3, 3, 2, 2, 2, 2, 3, 1, 2, 3, 2, 0],
+    [2, 3, 4, 2, 1, 2, 1, 3, 3, 1, 2, 0, 3, 1],
+    [3, 3, 2, 4, 2, 1, 1, 1, 1, 2, 2, 2, 0, 2],
+    [2, 2, 1, 2, 4, 2, 1, 2, 2, 1, 0, 2, 1, 1],
+    [2, 2, 2, 1, 2, 4, 0, 2, 2, 1, 3, 3, 2, 1],
+    [2, 2, 1, 1, 1, 0, 4, 2, 2, 2, 2, 2, 1, 2],
+    [1, 2, 3, 1, 2, 2, 2, 4, 3, 0, 3, 2, 2, 1],
+    [0, 3, 3, 1, 2, 2, 2, 3, 4, 1, 2, 2, 2, 1],
+    [1, 1, 1, 2, 1, 1, 2, 0, 1, 4, 1, 1, 2, 1],
+    [3, 2, 2, 2, 0, 3, 2, 3, 2, 1, 4, 2, 2, 1],
+    [3, 3, 0, 2, 2, 3, 2, 2, 2, 1, 2, 4, 3, 2],
+    [2, 2, 3, 0, 1, 2, 1, 2, 2, 2, 2, 3, 4, 2],
+    [1, 0, 1, 2, 1, 1, 2, 1, 1, 1, 1, 2, 2, 4]
+]
+GANA_POINTS = [
+    [6, 6, 1],
+    [5, 6, 0],
+    [1, 0, 6]
+]
+
+RULESETS = {
+    "simplified": {
+        "description": "Original simplified rules scored by rashi / nakshatra distance",
+        "resolution": "nakshatra",
+        "kootas": {
+            "varna": {"kind": "groups", "basis": "rashi", "groups": [r % 4 for r in range(12)], "matrix": np.eye(4).tolist()},
+            "vashya": {"kind": "diff", "basis": "rashi", "points": {0: 2, 1: 1, 11: 1}, "default": 0},
+            "tara": {"kind": "diff", "basis": "nakshatra", "points": {0: 3, 1: 2, 2: 2, 3: 2, 4: 1, 5: 1, 6: 1}, "default": 0},
+            "yoni": {"kind": "diff", "basis": "nakshatra", "points": {0: 4, 1: 3, 2: 3, 3: 2, 4: 2, 5: 1, 6: 1}, "default": 0},
+            "graha_maitri": {"kind": "diff", "basis": "rashi",
+                             "points": {0: 5, 1: 4, 5: 4, 9: 4, 2: 3, 4: 3, 6: 3, 8: 3, 10: 3}, "default": 2},
+            "gana": {"kind": "diff", "basis": "nakshatra", "points": {0: 6, 1: 5, 2: 5, 3: 5, 4: 4, 5: 4, 6: 4}, "default": 3},
+            "bhakoot": {"kind": "diff", "basis": "rashi", "points": {0: 7, 1: 6, 2: 6, 3: 6, 4: 5, 5: 5, 6: 5}, "default": 4},
+            "nadi": {"kind": "diff", "basis": "nakshatra", "points": {0: 8, 1: 7, 2: 7, 3: 7, 4: 6, 5: 6, 6: 6}, "default": 5}
+        }
+    },
+    "classical": {
+        "description": "Classical North Indian Ashtakoota tables (partner1 groom, partner2 bride)",
+        "resolution": "nakshatra",
+        "kootas": {
+            "varna": {"kind": "groups", "basis": "rashi", "groups": VARNA,
+                      "matrix": [[1 if groom >= bride else 0 for bride in range(5)] for groom in range(5)]},
+            "vashya": {"kind": "groups", "basis": "rashi", "groups": VASHYA, "matrix": VASHYA_POINTS},
+            "tara": {"kind": "tara", "modulo": 9, "inauspicious": [3, 5, 7], "points": [0, 1.5, 3]},
+            "yoni": {"kind": "groups", "basis": "nakshatra", "groups": YONI, "matrix": YONI_POINTS},
+            "graha_maitri": {"kind": "lords", "points": {"same": 5, "friend/friend": 5, "friend/neutral": 4,
+                                                         "neutral/neutral": 3, "enemy/friend": 1,
+                                                         "enemy/neutral": 0.5, "enemy/enemy": 0}},
+            "gana": {"kind": "groups", "basis": "nakshatra", "groups": GANA, "matrix": GANA_POINTS},
+            "bhakoot": {"kind": "mutual_position", "doshas": [[2, 12], [5, 9], [6, 8]], "points": 7},
+            "nadi": {"kind": "groups", "basis": "nakshatra", "groups": NADI,
+                     "matrix": [[0 if a == b else 8 for b in range(3)] for a in range(3)]}
+        }
+    },
+    "classical_parihara": {
+        "description": "Classical tables with the common dosha cancellations (parihara)",
+        "extends": "classical",
+        "cancellations": {
+            "bhakoot": ["friendly_lords"],
+            "nadi": ["same_rashi_other_nakshatra", "same_nakshatra_other_rashi"]
+        }
+    },
+    "classical_pada": {
+        "description": "Classical tables at pada resolution: Nadi dosha is cancelled for the same nakshatra in different padas",
+        "extends": "classical",
+        "resolution": "pada",
+        "cancellations": {
+            "nadi": ["same_nakshatra_other_pada"]
+        }
+    }
+}
+
+
+def _relation(lord, other):
+    """friend / neutral / enemy view of one planet towards another"""
+    if other in FRIENDSHIP[lord]["friends"]:
+        return "friend"
+    if other in FRIENDSHIP[lord]["enemies"]:
+        return "enemy"
+    return "neutral"
+
+
+def _lord_matrix(points):
+    """12 x 12 rashi-lord relationship points"""
+    matrix = np.zeros((12, 12))
+    for r1, lord1 in enumerate(RASHI_LORDS):
+        for r2, lord2 in enumerate(RASHI_LORDS):
+            if lord1 == lord2:
+                matrix[r1, r2] = points["same"]
+            else:
+                matrix[r1, r2] = points["/".join(sorted([_relation(lord1, lord2), _relation(lord2, lord1)]))]
+    return matrix
+
+
+def _friendly_lords():
+    """12 x 12 mask: same rashi lord or mutual friends"""
+    return _lord_matrix({"same": 1, "friend/friend": 1, "friend/neutral": 0, "neutral/neutral": 0,
+                         "enemy/friend": 0, "enemy/neutral": 0, "enemy/enemy": 0}).astype(bool)
+
+
+# Cancellation conditions over broadcast class attributes (a = partner1, b = partner2)
+CONDITIONS = {
+    "friendly_lords": lambda a, b: _friendly_lords()[a["rashi"] - 1, b["rashi"] - 1],
+    "same_rashi_other_nakshatra": lambda a, b: (a["rashi"] == b["rashi"]) & (a["nakshatra"] != b["nakshatra"]),
+    "same_nakshatra_other_rashi": lambda a, b: (a["nakshatra"] == b["nakshatra"]) & (a["rashi"] != b["rashi"]),
+    "same_nakshatra_other_pada": lambda a, b: (a["nakshatra"] == b["nakshatra"]) & (a["pada"] != b["pada"])
+}
+
+
+def _koota_points(rule, a, b):
+    """Points matrix of one koota over all class pairs"""
+    kind = rule["kind"]
+    if kind == "diff":
+        diff = np.abs(a[rule["basis"]] - b[rule["basis"]])
+        points = np.full(diff.shape, float(rule["default"]))
+        for value, score in rule["points"].items():
+            points[diff == value] = score
+        return points
+    if kind == "groups":
+        groups = np.array(rule["groups"])
+        return np.array(rule["matrix"], dtype=float)[groups[a[rule["basis"]] - 1], groups[b[rule["basis"]] - 1]]
+    if kind == "tara":
+        forward = ((b["nakshatra"] - a["nakshatra"]) % 27 + 1) % rule["modulo"]
+        backward = ((a["nakshatra"] - b["nakshatra"]) % 27 + 1) % rule["modulo"]
+        good = (~np.isin(forward, rule["inauspicious"])).astype(int) + (~np.isin(backward, rule["inauspicious"]))
+        return np.array(rule["points"], dtype=float)[good]
+    if kind == "mutual_position":
+        forward = (b["rashi"] - a["rashi"]) % 12 + 1
+        backward = (a["rashi"] - b["rashi"]) % 12 + 1
+        dosha = np.zeros(np.broadcast(forward, backward).shape, dtype=bool)
+        for p, q in rule["doshas"]:
+            dosha |= ((forward == p) & (backward == q)) | ((forward == q) & (backward == p))
+        return np.where(dosha, 0.0, float(rule["points"]))
+    if kind == "lords":
+        return _lord_matrix(rule["points"])[a["rashi"] - 1, b["rashi"] - 1]
+    raise ValueError(f"unknown koota rule kind: {kind}")
+
+
+def _resolve(name, definitions):
+    """Flatten "extends" chains into one definition"""
+    definition = dict(definitions[name])
+    if "extends" in definition:
+        base = _resolve(definition.pop("extends"), definitions)
+        cancellations = {**base.get("cancellations", {}), **definition.get("cancellations", {})}
+        definition = {**base, **definition, "cancellations": cancellations}
+    return definition
+
+
+class RuleSet:
+    """A compiled rule set: class attributes and the (classes, classes, 9) half-point table"""
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.description = definition["description"]
+        self.resolution = definition.get("resolution", "nakshatra")
+        n = RESOLUTION_CLASSES[self.resolution]
+
+        classes = np.arange(n)
+        if self.resolution == "pada":
+            self.rashi, self.nakshatra, self.pada = classes // 9 + 1, classes // 4 + 1, classes % 4 + 1
+        else:
+            self.rashi, self.nakshatra, self.pada = classes // 27 + 1, classes % 27 + 1, np.zeros(n, dtype=np.int64)
+
+        a = {key: values[:, None] for key, values in self._attributes().items()}
+        b = {key: values[None, :] for key, values in self._attributes().items()}
+        table = np.zeros((n, n, TOTAL + 1), dtype=np.uint8)
+        for i, koota in enumerate(KOOTAS):
+            rule = definition["kootas"][koota]
+            points = np.broadcast_to(_koota_points(rule, a, b), (n, n)).copy()
+            for condition in definition.get("cancellations", {}).get(koota, []):
+                points[np.broadcast_to(CONDITIONS[condition](a, b), (n, n))] = KOOTA_MAX[i]
+            table[:, :, i] = np.round(points * HALF)
+        table[:, :, TOTAL] = table[:, :, :TOTAL].sum(axis=2)
+        self.table = table
+        self.integral = bool((table % HALF == 0).all())
+
+        # Candidate-store fine class -> class of this rule set, -1 where it cannot be resolved
+        fine = np.arange(FINE_CLASSES)
+        coarse, fine_pada = fine // 5, fine % 5
+        fine_rashi, fine_nakshatra = coarse // 27 + 1, coarse % 27 + 1
+        if self.resolution == "pada":
+            mapped = (fine_nakshatra - 1) * 4 + fine_pada - 1
+            consistent = (fine_pada > 0) & (mapped // 9 + 1 == fine_rashi)
+            self.fine_to_class = np.where(consistent, mapped, -1)
+        else:
+            self.fine_to_class = coarse
+
+    def _attributes(self):
+        return {"rashi": self.rashi, "nakshatra": self.nakshatra, "pada": self.pada}
+
+    @property
+    def classes(self):
+        return len(self.rashi)
+
+    def classes_of(self, rashis, nakshatras, padas=None):
+        """Vectorized class lookup; raises ValueError for charts this rule set cannot classify"""
+        rashis = np.asarray(rashis, dtype=np.intp)
+        nakshatras = np.asarray(nakshatras, dtype=np.intp)
+        if self.resolution == "nakshatra":
+            return (rashis - 1) * 27 + (nakshatras - 1)
+        padas = np.zeros_like(rashis) if padas is None else np.asarray(padas, dtype=np.intp)
+        classes = (nakshatras - 1) * 4 + padas - 1
+        if ((padas < 1) | (padas > 4) | (classes // 9 + 1 != rashis)).any():
+            raise ValueError(f"ruleset {self.name} needs birth details or a pada consistent with rashi/nakshatra")
+        return classes
+
+    def class_of(self, rashi, nakshatra, pada=0):
+        """Class of a single chart"""
+        return int(self.classes_of([rashi], [nakshatra], [pada])[0])
+
+    def info(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "resolution": self.resolution,
+            "classes": self.classes,
+            "table_bytes": self.table.nbytes
+        }
+
+
+def load_rulesets(definitions=RULESETS):
+    """Compile every rule set"""
+    return {name: RuleSet(name, _resolve(name, definitions)) for name in definitions}
@@ -0,0 +1,13 @@
+"""
+Entry point of the web server: python -m server
+
+Worker processes started with "spawn" (the ephemeris pool) run the
+parent's __main__ module again, as __mp_main__, before they do any work.
+Started through this module, that is a no-op: app is imported only under
+the __main__ guard below, so workers never load app.py and its stores,
+indexes and job queue.
+"""
+
+if __name__ == "__main__":
+    from app import main
+    main()
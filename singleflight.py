@@ -0,0 +1,89 @@
+"""
+Coalescing of concurrent identical calls ("singleflight").
+
+Calls that go through a Group with the same key while one of them is
+still running share that one execution. The first caller runs the
+function. The others wait for it and get the same result, or the same
+exception raised again. Nothing is kept afterwards: the next call with
+the key runs the function again, so caching stays the job of the
+layers below (geocode cache, chart store, report cache).
+
+Shared results are the same object for every caller, so they must not
+be mutated. Counters record how many calls were made, how many ran, and
+how many were saved by sharing.
+"""
+
+import functools
+import threading
+
+
+class _Call:
+    """One execution in flight, whose outcome the waiting callers share"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Key -> in-flight call map with call, execution and sharing counters"""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "executions": 0,
+            "shared": 0,
+            "errors": 0
+        }
+
+    def do(self, key, fn, *args, **kwargs):
+        """fn(*args, **kwargs), run once for all concurrent calls with the same key"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def coalesce(self, key):
+        """Decorator routing calls through do(), with key(*args, **kwargs) as the key"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.do(key(*args, **kwargs), fn, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """Return call counters; shared is the number of calls answered by another call's execution"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["share_rate"] = stats["shared"] / stats["calls"] if stats["calls"] else None
+        return stats
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Candidate sets and rule sets: input validation and the per-class histogram
+of a stored set, the store itself, and the compiled koota tables and class
+lookups the set queries rely on.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+import candidate_store  # noqa: E402
+from candidate_store import CLASSES, CandidateStore, chart_class, class_chart, fine_class  # noqa: E402
+from rulesets import HALF, KOOTA_MAX, load_rulesets  # noqa: E402
+
+client = app.app.test_client()
+
+
+def create_set(candidates):
+    response = client.post("/api/candidate-sets", json={"candidates": candidates})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["candidate_set"]
+
+
+def test_set_histogram_labels_classes():
+    birth = app.calculate_birth_chart("1990-05-15", "10:30", "Mumbai")
+    set_id = create_set([
+        {"id": 1, "rashi": 2, "nakshatra": 4},
+        {"id": 2, "rashi": 12, "nakshatra": 27},
+        {"id": 3, "date": "1990-05-15", "time": "10:30", "place": "Mumbai"}
+    ])
+    response = client.get(f"/api/candidate-sets/{set_id}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["count"] == 3
+    birth_label = f"{birth['rashi_name']}/{birth['nakshatra_name']}/pada {birth['pada']}"
+    assert body["classes"] == {"Vrishabha/Rohini": 1, "Meena/Revati": 1, birth_label: 1}
+
+
+def test_invalid_padas_are_rejected():
+    # Pada 5 and 9 would be filed under later classes, -1 under an earlier one; Krittika pada 2 is in Vrishabha
+    for rashi, nakshatra, pada in ((1, 1, 5), (1, 1, 9), (1, 1, -1), (1, 3, 2), (1, 1, "x")):
+        response = client.post("/api/candidate-sets", json={
+            "candidates": [{"id": "a", "rashi": rashi, "nakshatra": nakshatra, "pada": pada}]
+        })
+        assert response.status_code == 400, (rashi, nakshatra, pada)
+    set_id = create_set([{"id": "a", "rashi": 2, "nakshatra": 3, "pada": 2}])
+    assert client.get(f"/api/candidate-sets/{set_id}/candidates/a").get_json()["pada"] == 2
+
+
+def test_ids_are_strings_inline_and_stored():
+    candidates = [{"id": 7, "rashi": 2, "nakshatra": 4}, {"rashi": 5, "nakshatra": 10}]
+    seeker = {"rashi": 1, "nakshatra": 1}
+    inline = client.post("/api/match", json={"seeker": seeker, "candidates": candidates}).get_json()
+    set_id = create_set(candidates)
+    stored = client.post("/api/match", json={"seeker": seeker, "candidate_set": set_id}).get_json()
+    assert sorted(match["id"] for match in inline["matches"]) == ["1", "7"]
+    assert sorted(match["id"] for match in stored["matches"]) == ["1", "7"]
+
+
+def test_filters_must_be_an_object():
+    seeker = {"rashi": 1, "nakshatra": 1}
+    set_id = create_set([{"id": "a", "rashi": 2, "nakshatra": 4}])
+    for filters in ([1], "nadi", {"nadi": None}, {"nadi": "high"}, {"unknown": 1}):
+        inline = client.post("/api/match", json={"seeker": seeker, "candidates": [seeker], "filters": filters})
+        assert inline.status_code == 400, filters
+        stored = client.post("/api/query", json={"seeker": seeker, "candidate_set": set_id, "filters": filters})
+        assert stored.status_code == 400, filters
+    assert client.post("/api/match", json={"seeker": seeker, "candidates": [seeker], "filters": {"nadi": "8"}}
+                       ).status_code == 200
+
+
+def test_query_pages_follow_match_order():
+    seeker = {"rashi": 1, "nakshatra": 1}
+    candidates = [{"id": f"c{i}", "rashi": i % 12 + 1, "nakshatra": i % 27 + 1} for i in range(60)]
+    set_id = create_set(candidates)
+    top = client.post("/api/match", json={"seeker": seeker, "candidate_set": set_id, "top_k": 60}).get_json()
+
+    pages, cursor = [], None
+    while True:
+        body = {"seeker": seeker, "candidate_set": set_id, "limit": 7}
+        if cursor:
+            body["cursor"] = cursor
+        page = client.post("/api/query", json=body).get_json()
+        pages.extend(result["id"] for result in page["results"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == [match["id"] for match in top["matches"]]
+    assert len(set(pages)) == 60
+
+
+def test_invalid_cursors():
+    seeker = {"rashi": 1, "nakshatra": 1}
+    set_id = create_set([{"id": "a", "rashi": 2, "nakshatra": 4}])
+    for cursor in (app.encode_cursor(5, -3), app.encode_cursor(-1, 0), app.encode_cursor(CLASSES, 0),
+                   "not a cursor", "NTo="):
+        response = client.post("/api/query", json={"seeker": seeker, "candidate_set": set_id, "cursor": cursor})
+        assert response.status_code == 400, cursor
+
+
+def test_exclude_doshas():
+    # Under the simplified rules varna, vashya, tara and yoni can score zero
+    seeker = {"rashi": 1, "nakshatra": 1}
+    candidates = [{"id": f"c{i}", "rashi": i // 27 + 1, "nakshatra": i % 27 + 1} for i in range(324)]
+    set_id = create_set(candidates)
+    body = {"seeker": seeker, "candidate_set": set_id, "limit": 1000}
+    everyone = client.post("/api/query", json=body).get_json()["results"]
+    kept = client.post("/api/query", json=dict(body, exclude_doshas=["yoni", "tara"])).get_json()["results"]
+    assert any(result["breakdown"]["yoni"] == 0 for result in everyone)
+    assert 0 < len(kept) < len(everyone)
+    assert all(result["breakdown"]["yoni"] > 0 and result["breakdown"]["tara"] > 0 for result in kept)
+
+    # Anything but a list of koota names is a bad request, not a 500 or a per-character loop
+    for doshas in (5, "yoni", ["yoni", "dosha"], [["yoni"]], {"yoni": 1}):
+        response = client.post("/api/query", json=dict(body, exclude_doshas=doshas))
+        assert response.status_code == 400, doshas
+
+
+def test_store_persists_and_orders_members(tmp_path):
+    path = str(tmp_path / "candidates.db")
+    store = CandidateStore(path)
+    store.create_pool("p")
+    store.upsert("p", [(1, 2, 4, 0), ("b", 2, 4, 0), ("c", 12, 27, 4)])
+    rohini = fine_class(chart_class(2, 4), 0)
+    assert class_chart(rohini) == (2, 4, 0)
+    assert list(store.iter_members("p", [rohini])) == [("1", rohini), ("b", rohini)]
+
+    # An update moves the candidate to the end of its new class
+    store.upsert("p", [(1, 12, 27, 4)])
+    revati = fine_class(chart_class(12, 27), 4)
+    assert [candidate_id for candidate_id, _ in store.iter_members("p", [revati])] == ["c", "1"]
+    assert store.delete("p", "b") and not store.delete("p", "b")
+
+    reopened = CandidateStore(path)
+    assert reopened.count("p") == 2
+    assert reopened.get("p", 1) == {"id": "1", "rashi": 12, "nakshatra": 27, "pada": 4}
+    assert list(reopened.iter_members("p", [revati], offset=1)) == [("1", revati)]
+    assert reopened.class_counts("p")[revati] == 2
+
+
+def test_iter_members_pages_through_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(candidate_store, "MEMBER_CHUNK", 2)
+    store = CandidateStore(str(tmp_path / "candidates.db"))
+    store.create_pool("p")
+    store.upsert("p", [(i, 2, 4, 0) for i in range(5)] + [("x", 12, 27, 4)])
+    rohini, revati = fine_class(chart_class(2, 4), 0), fine_class(chart_class(12, 27), 4)
+    assert [candidate_id for candidate_id, _ in store.iter_members("p", [rohini, revati], offset=1)] == \
+        ["1", "2", "3", "4", "x"]
+
+    # Writes between chunks do not break an iteration in progress
+    members = store.iter_members("p", [rohini])
+    assert next(members) == ("0", rohini)
+    store.upsert("p", [(5, 2, 4, 0)])
+    assert [candidate_id for candidate_id, _ in members] == ["1", "2", "3", "4", "5"]
+
+
+def test_ruleset_tables():
+    rulesets = load_rulesets()
+    for ruleset in rulesets.values():
+        table = ruleset.table.astype(int)
+        assert (table[:, :, -1] == table[:, :, :-1].sum(axis=2)).all()
+        assert (table[:, :, :-1] <= np.array(KOOTA_MAX) * HALF).all()
+        assert table[:, :, -1].max() <= 36 * HALF
+    assert rulesets["simplified"].integral
+    assert rulesets["classical_pada"].classes == 108
+
+
+def test_pada_class_lookup():
+    ruleset = load_rulesets()["classical_pada"]
+    # Ashwini pada 1 is the first pada class; Krittika pada 2 is in Vrishabha
+    assert ruleset.class_of(1, 1, 1) == 0
+    assert ruleset.class_of(2, 3, 2) == 9
+    with pytest.raises(ValueError):
+        ruleset.class_of(1, 3, 2)
+    with pytest.raises(ValueError):
+        ruleset.class_of(1, 1, 0)
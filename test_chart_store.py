@@ -0,0 +1,67 @@
+"""
+Stored charts: /api/chart validates birth data and is content-addressed,
+and a chart store file shared by several processes finds charts that
+another process added.
+"""
+
+import os
+import tempfile
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+from chart_store import HEADER, RECORD, ChartStore  # noqa: E402
+
+client = app.app.test_client()
+
+CHART = {
+    "rashi": 9, "nakshatra": 19, "pada": 2, "longitude": 245.5, "boundary_distance_days": None,
+    "lat": 19.076, "lon": 72.8777, "julian_day": 2448026.7, "utc_seconds": 642763800,
+    "local_seconds": 642783600, "timezone": "Asia/Kolkata"
+}
+
+
+def test_create_and_get_chart():
+    birth = {"date": "1990-05-15", "time": "10:30", "place": "Mumbai"}
+    created = client.post("/api/chart", json=birth)
+    assert created.status_code == 201
+    chart_id = created.get_json()["chart_id"]
+    # Same birth, differently written: same id, nothing new stored
+    again = client.post("/api/chart", json=dict(birth, date="1990-5-15"))
+    assert again.status_code == 200 and again.get_json()["chart_id"] == chart_id
+    assert client.get(f"/api/chart/{chart_id}").get_json()["chart"] == created.get_json()["chart"]
+
+
+def test_invalid_birth_data():
+    for date, time in (("1990-02-30", "10:30"), ("1990-13-01", "10:30"), ("1990-05-15", "25:30"),
+                       ("1990-05-15", "10:60"), ("15/05/1990", "10:30")):
+        response = client.post("/api/chart", json={"date": date, "time": time, "place": "Mumbai"})
+        assert response.status_code == 400, (date, time)
+        assert response.get_json()["error"].startswith("Invalid birth data")
+
+
+def test_store_shared_between_processes(tmp_path):
+    path = str(tmp_path / "charts.bin")
+    first, second = ChartStore(path), ChartStore(path)
+    assert first.put("ab" * 16, CHART)
+    # The second store was opened before the put and still finds the chart
+    assert "ab" * 16 in second
+    assert second.get("ab" * 16) == CHART
+    assert not second.put("ab" * 16, CHART)
+    assert second.put("cd" * 16, dict(CHART, rashi=10))
+    assert first.get("cd" * 16)["rashi"] == 10
+    assert len(first) == len(second) == 2
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = str(tmp_path / "charts.bin")
+    ChartStore(path).put("ab" * 16, CHART)
+    with open(path, "ab") as f:
+        f.write(b"\1" * 10)
+    store = ChartStore(path)
+    assert len(store) == 1 and store.get("ab" * 16) == CHART
+    assert os.path.getsize(path) == HEADER.size + RECORD.size
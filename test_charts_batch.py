@@ -0,0 +1,57 @@
+"""
+POST /api/charts/batch: columnar birth charts agree with the per-chart path,
+and malformed columns are rejected with 400 instead of failing or computing
+a chart for the wrong time.
+"""
+
+import os
+import tempfile
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+
+client = app.app.test_client()
+
+BATCH = {"dates": ["1990-05-15", "1988-11-02"], "times": ["10:30", "06:45"], "places": ["Mumbai", "Delhi"]}
+
+
+def batch(**changes):
+    return client.post("/api/charts/batch", json=dict(BATCH, **changes))
+
+
+def test_batch_matches_single_charts():
+    response = batch()
+    assert response.status_code == 200
+    charts = response.get_json()["charts"]
+    for i, (date, time, place) in enumerate(zip(BATCH["dates"], BATCH["times"], BATCH["places"])):
+        chart = app.calculate_birth_chart(date, time, place)
+        assert (charts["rashi"][i], charts["nakshatra"][i], charts["pada"][i]) == \
+            (chart["rashi"], chart["nakshatra"], chart["pada"])
+
+
+def test_mismatched_columns():
+    assert batch(places=["Mumbai"]).status_code == 400
+    assert batch(times=["10:30"]).status_code == 400
+    coordinates = {"places": None, "lats": [19.07, 28.7], "lons": [72.87]}
+    assert client.post("/api/charts/batch", json=dict(BATCH, **coordinates)).status_code == 400
+    assert batch(dates="1990-05-15").status_code == 400
+
+
+def test_unknown_timezone():
+    response = client.post("/api/charts/batch", json={
+        "dates": BATCH["dates"], "times": BATCH["times"],
+        "lats": [19.07, 28.7], "lons": [72.87, 77.1], "timezones": ["Asia/Kolkata", "Mars/Olympus_Mons"]
+    })
+    assert response.status_code == 400
+    assert "Mars/Olympus_Mons" in response.get_json()["error"]
+
+
+def test_out_of_range_times_and_dates():
+    for times in (["25:00", "06:45"], ["10:60", "06:45"], ["10:30", "-1:00"], ["10:30", "noon"]):
+        assert batch(times=times).status_code == 400, times
+    assert batch(dates=["1990-02-30", "1988-11-02"]).status_code == 400
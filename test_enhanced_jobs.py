@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Enhanced reports as background jobs, against a local stub of the chat completions API.
+
+POST /api/compatibility/enhanced must answer at once with a job id and the
+Vedic data, GET /api/jobs/<id>?wait= must long-poll until the stub's report
+arrives, repeated requests must share one job, and jobs left unfinished by
+a process that stopped renewing their lease must run once another process
+recovers them.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STORE_DIR = tempfile.mkdtemp()
+os.environ["JOB_STORE_PATH"] = os.path.join(STORE_DIR, "jobs.db")
+os.environ["CHART_STORE_PATH"] = os.path.join(STORE_DIR, "charts.bin")
+os.environ["CANDIDATE_STORE_PATH"] = os.path.join(STORE_DIR, "candidates.db")
+os.environ["REPORT_CACHE_PATH"] = os.path.join(STORE_DIR, "report_cache.db")
+os.environ["GEOCODE_CACHE_PATH"] = os.path.join(STORE_DIR, "geocode_cache.db")
+os.environ["GAZETTEER_INDEX_PATH"] = os.path.join(STORE_DIR, "gazetteer.idx")
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+from jobs import STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, JobQueue
+
+REPORT = {"compatibility_score": 72, "love_story_theme": "The Dance of Fire and Water"}
+STUB_DELAY = 0.3
+stub_calls = []
+
+
+class StubCompletions(BaseHTTPRequestHandler):
+    """Answers every chat completion with REPORT as a fenced JSON block after STUB_DELAY seconds, in chunks when streaming"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        stub_calls.append(body)
+        time.sleep(STUB_DELAY)
+        content = "```json\n" + json.dumps(REPORT) + "\n```"
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for start in range(0, len(content), 16):
+                chunk = {"choices": [{"delta": {"content": content[start:start + 16]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        encoded = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+
+stub = ThreadingHTTPServer(("127.0.0.1", 0), StubCompletions)
+threading.Thread(target=stub.serve_forever, daemon=True).start()
+os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+
+import app  # noqa: E402 (configured through the environment above)
+
+client = app.app.test_client()
+
+COUPLE = {
+    "partner1": {"name": "Asha", "date": "1990-05-15", "time": "10:30", "place": "Mumbai"},
+    "partner2": {"name": "Ravi", "date": "1988-11-02", "time": "06:45", "place": "Delhi"}
+}
+
+
+def test_post_returns_job_and_long_poll_gets_report():
+    calls = len(stub_calls)
+    response = client.post("/api/compatibility/enhanced", json=COUPLE)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["status"] in ("queued", "running")
+    assert job["vedic_data"]["gun_milan_score"] > 0
+    assert response.headers["Location"] == f"/api/jobs/{job['job_id']}"
+
+    polled = client.get(f"/api/jobs/{job['job_id']}?wait=10").get_json()
+    assert polled["status"] == STATUS_DONE
+    assert polled["result"] == REPORT
+    assert len(stub_calls) == calls + 1
+    prompt = stub_calls[-1]["messages"][1]["content"]
+    assert "Asha" in prompt and "Ravi" in prompt
+
+    # The same couple again is answered from the report cache, without a job
+    again = client.post("/api/compatibility/enhanced", json=COUPLE)
+    assert again.status_code == 200
+    assert again.get_json()["enhanced_report"] == REPORT
+    assert len(stub_calls) == calls + 1
+
+
+def test_cache_modes():
+    couple = dict(COUPLE, partner2=dict(COUPLE["partner2"], name="Kiran"))
+    calls = len(stub_calls)
+    missing = client.post("/api/compatibility/enhanced?cache_mode=cache_only", json=couple)
+    assert missing.status_code == 404
+    assert missing.get_json()["vedic_data"]["partner2_details"]["name"] == "Kiran"
+    assert len(stub_calls) == calls
+
+    job = client.post("/api/compatibility/enhanced", json=couple).get_json()
+    client.get(f"/api/jobs/{job['job_id']}?wait=10")
+    cached = client.post("/api/compatibility/enhanced?cache_mode=cache_only", json=couple)
+    assert cached.status_code == 200
+    assert cached.get_json()["enhanced_report"] == REPORT
+
+    # A refresh calls the model again even though the report is cached
+    refreshed = client.post("/api/compatibility/enhanced?sync=true", json=dict(couple, cache_mode="refresh"))
+    assert refreshed.get_json()["enhanced_report"] == REPORT
+    assert len(stub_calls) == calls + 2
+    assert app.report_cache.stats()["hits"] >= 1
+
+
+def test_sync_mode_waits_for_report():
+    couple = dict(COUPLE, partner1=dict(COUPLE["partner1"], name="Meera"))
+    response = client.post("/api/compatibility/enhanced?sync=true", json=couple)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["enhanced_report"] == REPORT
+    assert body["vedic_data"]["partner1_details"]["name"] == "Meera"
+
+
+def parse_events(raw):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in raw.decode().split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_stream_sends_vedic_data_first():
+    couple = dict(COUPLE, partner1=dict(COUPLE["partner1"], name="Nila"))
+    calls = len(stub_calls)
+    response = client.post("/api/compatibility/enhanced?stream=true", json=couple)
+    assert response.mimetype == "text/event-stream"
+    # The first event is written before the model is called
+    chunks = iter(response.response)
+    first = next(chunks)
+    assert len(stub_calls) == calls
+    events = parse_events(first + b"".join(chunks))
+    names = [event for event, _ in events]
+    assert names[0] == "vedic_data" and names[-2:] == ["report", "done"]
+    assert events[0][1]["partner1_details"]["name"] == "Nila"
+    assert names.count("delta") > 1
+    streamed = "".join(data["content"] for event, data in events if event == "delta")
+    assert json.loads(streamed.strip("`json\n")) == REPORT
+    assert events[-2][1] == REPORT
+    assert stub_calls[-1]["stream"] is True
+
+    # The streamed report was cached: the next stream has no deltas
+    cached = parse_events(client.post("/api/compatibility/enhanced?stream=true", json=couple).get_data())
+    assert [event for event, _ in cached] == ["vedic_data", "report", "done"]
+    assert len(stub_calls) == calls + 1
+
+
+def test_unknown_job():
+    assert client.get("/api/jobs/0123456789abcdef?wait=0.1").status_code == 404
+
+
+def test_unfinished_jobs_survive_restart():
+    path = os.path.join(STORE_DIR, "restart.db")
+    release = threading.Event()
+    first = JobQueue(path, lambda payload: release.wait(10) and payload["n"] * 2, workers=1, lease=0.3)
+    running, _ = first.submit({"n": 1})
+    queued, _ = first.submit({"n": 2})
+    assert first.get(queued["job_id"])["status"] == STATUS_QUEUED
+    first.shutdown(wait=False)
+
+    # A new process opens the same store: nothing runs until it recovers, and only once the old lease has expired
+    second = JobQueue(path, lambda payload: payload["n"] * 2, workers=2)
+    assert second.stats()["recovered"] == 0
+    assert second.recover() == 0
+    time.sleep(0.4)
+    assert second.recover() == 2
+    assert second.wait(running["job_id"], 5)["result"] == 2
+    assert second.wait(queued["job_id"], 5)["result"] == 4
+    assert second.recover() == 0
+    release.set()
+
+
+def test_restart_with_the_same_pid():
+    # Containers restart with the same pid, so the restarted process must not take the old jobs for its own
+    path = os.path.join(STORE_DIR, "same_pid.db")
+    release = threading.Event()
+    first = JobQueue(path, lambda payload: release.wait(10) and payload["n"], workers=1, lease=0.3, owner="4242")
+    running, _ = first.submit({"n": 1}, key="k")
+    first.shutdown(wait=False)
+    time.sleep(0.4)
+
+    second = JobQueue(path, lambda payload: payload["n"], workers=1)
+    assert second.owner != first.owner
+    assert second.recover() == 1
+    assert second.wait(running["job_id"], 5)["status"] == STATUS_DONE
+    release.set()
+
+
+def test_expired_jobs_are_not_shared():
+    path = os.path.join(STORE_DIR, "expired.db")
+    release = threading.Event()
+    first = JobQueue(path, lambda payload: release.wait(10) and payload["n"], workers=1, lease=0.3)
+    stale, _ = first.submit({"n": 1}, key="k")
+    first.shutdown(wait=False)
+    time.sleep(0.4)
+
+    # A client repeating the request is not handed the job nobody runs any more
+    second = JobQueue(path, lambda payload: payload["n"], workers=1)
+    fresh, created = second.submit({"n": 1}, key="k")
+    assert created and fresh["job_id"] != stale["job_id"]
+    assert second.wait(fresh["job_id"], 5)["result"] == 1
+    assert second.get(stale["job_id"])["status"] == STATUS_FAILED
+    assert second.recover() == 0
+    release.set()
+
+
+def test_jobs_of_live_processes_are_not_recovered():
+    path = os.path.join(STORE_DIR, "shared.db")
+    release = threading.Event()
+    first = JobQueue(path, lambda payload: release.wait(10) and payload["n"], workers=1, lease=0.3)
+    running, _ = first.submit({"n": 1}, key="k")
+
+    # A second worker process on the same store leaves the job to its owner, whose heartbeat keeps the lease fresh
+    second = JobQueue(path, lambda payload: payload["n"], workers=1)
+    time.sleep(0.6)
+    assert second.recover() == 0
+    assert second.submit({"n": 1}, key="k") == (first.get(running["job_id"]), False)
+    release.set()
+    assert first.wait(running["job_id"], 5)["status"] == STATUS_DONE
+    first.shutdown()
+
+
+def test_importing_app_does_not_recover_jobs():
+    assert app.enhanced_jobs.stats()["recovered"] == 0
+
+
+def test_failed_jobs_are_not_reused():
+    queue = JobQueue(os.path.join(STORE_DIR, "failures.db"), lambda payload: 1 / payload["d"], workers=1)
+    failed, _ = queue.submit({"d": 0}, key="k")
+    assert queue.wait(failed["job_id"], 5)["status"] == STATUS_FAILED
+    retried, created = queue.submit({"d": 1}, key="k")
+    assert created and retried["job_id"] != failed["job_id"]
+    assert queue.wait(retried["job_id"], 5)["result"] == 1.0
@@ -0,0 +1,35 @@
+"""
+Ephemeris worker pool: spawned workers compute the same positions as the
+parent, and starting the server through server.py keeps app.py out of them.
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import swisseph as swe
+
+from ephemeris_pool import EphemerisPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_pool_matches_in_process():
+    jds = np.linspace(2433282.5, 2453736.5, 50)
+    pool = EphemerisPool(workers=1, chunk_size=16)
+    try:
+        pooled = pool.moon_longitudes(jds)
+    finally:
+        pool.shutdown()
+    swe.set_sid_mode(swe.SIDM_LAHIRI)
+    expected = np.array([swe.calc_ut(jd, swe.MOON)[0][0] for jd in jds])
+    assert np.array_equal(pooled, expected)
+    assert pool.stats()["chunks"] == 4
+
+
+def test_workers_do_not_import_app():
+    # What a spawned worker does with the parent's main module when the server runs as python -m server
+    code = "import runpy, sys; runpy.run_module('server', run_name='__mp_main__'); print('app' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
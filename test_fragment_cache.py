@@ -0,0 +1,61 @@
+"""
+Fragment cache: CompatibilityResult.to_json() returns the same bytes as
+jsonify of the report dict, whether its sections are rendered on a cache miss
+or joined from cached fragments on a hit, for every rule set.
+"""
+
+import os
+import random
+import tempfile
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+from fragment_cache import FragmentCache  # noqa: E402
+
+DETAILS = {"name": "Asha", "date": "1990-05-15", "time": "10:30", "place": "Mumbai"}
+
+
+def make_chart(quarter):
+    """Chart in pada quarter 0-107, with its longitude in the middle of the pada"""
+    longitude = (quarter + 0.5) * 360 / 108
+    return app.Chart(quarter // 9 + 1, quarter // 4 + 1, quarter % 4 + 1, longitude, None,
+                     19.076, 72.8777, "Asia/Kolkata", 642_000_000, 2448026.9)
+
+
+def sample_pairs(n=40):
+    rng = random.Random(5)
+    pairs = [(0, 0), (107, 107), (0, 107)]
+    pairs += [(rng.randrange(108), rng.randrange(108)) for _ in range(n - len(pairs))]
+    return pairs
+
+
+def jsonified(result, fields):
+    with app.app.app_context():
+        return app.jsonify(result.to_dict(fields)).get_data()
+
+
+def test_to_json_matches_jsonify_on_miss_and_hit(monkeypatch):
+    cache = FragmentCache()
+    monkeypatch.setattr(app, "fragment_cache", cache)
+    field_sets = (None, app.CompatibilityResult.ENHANCED_FIELDS, ("remarks", "gun_milan_score", "partner2_chart"))
+    for ruleset in app.RULESETS.values():
+        for quarter1, quarter2 in sample_pairs():
+            cache.clear()
+            for fields in field_sets:
+                result = app.CompatibilityResult(make_chart(quarter1), make_chart(quarter2), ruleset, DETAILS, DETAILS)
+                before = cache.stats()
+                assert result.to_json(fields) + b"\n" == jsonified(result, fields)
+                if fields is None:
+                    # The first report of the pair renders every section
+                    assert cache.stats()["hits"] == before["hits"] and cache.stats()["misses"] > before["misses"]
+
+                # A fresh result for the same pair is joined from the fragments just rendered
+                again = app.CompatibilityResult(make_chart(quarter1), make_chart(quarter2), ruleset, DETAILS, DETAILS)
+                before = cache.stats()
+                assert again.to_json(fields) + b"\n" == jsonified(again, fields)
+                assert cache.stats()["misses"] == before["misses"] and cache.stats()["hits"] > before["hits"]
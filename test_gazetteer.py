@@ -0,0 +1,75 @@
+"""
+Offline gazetteer over the bundled seed: exact names, aliases, region
+qualifiers and fuzzy matches.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from gazetteer import Gazetteer, build_index
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(tempfile.mkdtemp(), "gazetteer.idx")
+build_index(
+    os.path.join(HERE, "gazetteer_seed.tsv"), INDEX_PATH,
+    os.path.join(HERE, "gazetteer_admin1.tsv"),
+    os.path.join(HERE, "gazetteer_countries.tsv"),
+    os.path.join(HERE, "gazetteer_aliases.tsv")
+)
+gazetteer = Gazetteer(INDEX_PATH)
+
+
+def test_exact_and_alias():
+    assert gazetteer.lookup("Mumbai")["admin1"] == "Maharashtra"
+    assert gazetteer.lookup("Bombay")["name"] == "Mumbai"
+    assert gazetteer.match("Mumbai")["confidence"] == 1.0
+
+
+def test_matching_qualifiers():
+    for place in ("Hyderabad, India", "Hyderabad, Telangana", "Hyderabad, Telangana, India", "Hyderabad, IN",
+                  "Salem, Tamil Nadu, India"):
+        assert gazetteer.match(place)["country"] == "India", place
+
+
+def test_foreign_qualifiers_are_rejected():
+    for place in ("Hyderabad, Pakistan", "Salem, Oregon, USA", "Hyderabad, Sindh"):
+        assert gazetteer.match(place) is None, place
+        assert gazetteer.lookup(place) is None, place
+
+
+def test_fuzzy_match():
+    match = gazetteer.match("Banglore", min_confidence=0.75)
+    assert match["name"] == "Bangalore" and 0.75 < match["confidence"] < 1.0
+    assert gazetteer.match("Banglore, Karnataka", min_confidence=0.75)["name"] == "Bangalore"
+
+
+def test_short_near_misses_are_not_confident():
+    # One edit away from a seed city (Gaya, Pune, Kota, Agra, Salem)
+    for place in ("Gaza", "Puna", "Kita", "Agr", "Salam"):
+        assert gazetteer.match(place, min_confidence=0.75) is None, place
+
+
+def test_threshold_is_exclusive():
+    # "Ghaziabd" is one edit from "Ghaziabad" (9 letters): confidence 1 - 1/9
+    confidence = gazetteer.match("Ghaziabd")["confidence"]
+    assert gazetteer.match("Ghaziabd", min_confidence=confidence) is None
+    assert gazetteer.match("Ghaziabd", min_confidence=confidence - 0.01)["name"] == "Ghaziabad"
+
+
+def test_every_bundled_alias_resolves():
+    with open(os.path.join(HERE, "gazetteer_aliases.tsv"), encoding="utf-8") as f:
+        aliases = [line.rstrip("\n").split("\t") for line in f if not line.startswith("#")]
+    for alias, canonical in aliases:
+        assert gazetteer.lookup(alias)["name"] == canonical
+    assert gazetteer.lookup("Trivandrum")["admin1"] == "Kerala"
+    assert gazetteer.lookup("Simla")["admin1"] == "Himachal Pradesh"
+    assert gazetteer.lookup("Pondicherry")["tz"] == "Asia/Kolkata"
+
+
+def test_unresolvable_alias_is_an_error(tmp_path):
+    aliases = tmp_path / "aliases.tsv"
+    aliases.write_text("Bombay\tMumbai\nAtlantis\tPoseidonia\n")
+    with pytest.raises(ValueError, match="Atlantis -> Poseidonia"):
+        build_index(os.path.join(HERE, "gazetteer_seed.tsv"), str(tmp_path / "g.idx"), aliases_path=str(aliases))
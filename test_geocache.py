@@ -0,0 +1,127 @@
+"""
+Geocode cache: found, miss and failure entries each expire after their own
+TTL, the counters add up, and get_coordinates() answers remembered misses
+and failures without calling the geocoder again.
+"""
+
+import os
+import tempfile
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import geocache  # noqa: E402
+import app  # noqa: E402 (store paths come from the environment above)
+from geocache import GeocodeCache  # noqa: E402
+
+
+class Clock:
+    """Stand-in for time.time that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Location:
+    latitude = 26.9124
+    longitude = 75.7873
+
+
+class StubGeocoder:
+    """Answers every geocode() with a fixed outcome and counts the calls"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = []
+
+    def geocode(self, place):
+        self.calls.append(place)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def make_cache(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(geocache.time, "time", clock)
+    return GeocodeCache(str(tmp_path / "geocode_cache.db"), ttl=300, miss_ttl=200, failure_ttl=100), clock
+
+
+def test_each_status_expires_after_its_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("Jaipur", 26.9, 75.8, "Asia/Kolkata")
+    cache.put_miss("Atlantis")
+    cache.put_failure("Timbuktoo")
+
+    clock.now += 99
+    assert cache.get("  jaipur ") == {"status": "found", "lat": 26.9, "lon": 75.8, "tz": "Asia/Kolkata"}
+    assert cache.get("ATLANTIS")["status"] == "miss"
+    assert cache.get("Timbuktoo")["status"] == "failure"
+
+    clock.now += 1
+    assert cache.get("Timbuktoo") is None
+    assert cache.get("Atlantis")["status"] == "miss"
+    clock.now += 100
+    assert cache.get("Atlantis") is None
+    assert cache.get("Jaipur")["status"] == "found"
+    clock.now += 100
+    assert cache.get("Jaipur") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"], stats["expired"]) == (2, 3, 3, 3)
+    assert stats["stores"] == 3 and stats["entries"] == 0
+    assert stats["hit_rate"] == round(5 / 8, 4)
+
+
+def test_entries_survive_reopen_and_purge(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("Jaipur", 26.9, 75.8, "Asia/Kolkata")
+    cache.put_failure("Timbuktoo")
+    reopened = GeocodeCache(cache.path, ttl=300, miss_ttl=200, failure_ttl=100)
+    assert reopened.get("Jaipur")["lat"] == 26.9
+
+    clock.now += 100
+    assert reopened.purge_expired() == 1
+    assert reopened.stats()["entries"] == 1
+    assert reopened.get("nowhere") is None and reopened.stats()["expired"] == 0
+
+
+def test_cached_outcomes_skip_the_geocoder(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    monkeypatch.setattr(app, "geocode_cache", cache)
+    default = (app.DEFAULT_LOCATION["lat"], app.DEFAULT_LOCATION["lon"], app.DEFAULT_LOCATION["tz"])
+
+    # A failure is remembered for failure_ttl: the fallback is answered without a second call
+    failing = StubGeocoder(TimeoutError("geocoder timed out"))
+    monkeypatch.setattr(app, "geolocator", failing)
+    assert app.get_coordinates("Unheard Of Village") == default
+    assert app.get_coordinates("unheard of  village") == default
+    assert len(failing.calls) == 1
+
+    # Once it expires the geocoder is asked again, and a place it finds is cached for ttl
+    clock.now += 100
+    found = StubGeocoder(Location())
+    monkeypatch.setattr(app, "geolocator", found)
+    lat, lon, tz_name = app.get_coordinates("Unheard Of Village")
+    assert (lat, lon, tz_name) == (Location.latitude, Location.longitude, "Asia/Kolkata")
+    assert app.get_coordinates("Unheard Of Village") == (lat, lon, tz_name)
+    assert len(found.calls) == 1
+
+    # A place the geocoder does not know is a negative entry for miss_ttl
+    missing = StubGeocoder(None)
+    monkeypatch.setattr(app, "geolocator", missing)
+    assert app.get_coordinates("Nonexistent Hamlet") == default
+    assert app.get_coordinates("Nonexistent Hamlet") == default
+    assert len(missing.calls) == 1
+    clock.now += 200
+    app.get_coordinates("Nonexistent Hamlet")
+    assert len(missing.calls) == 2
+
+    stats = cache.stats()
+    assert stats["negative_hits"] == 2 and stats["hits"] == 1 and stats["expired"] == 2
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Outbound HTTP client against a local server: keep-alive reuse, retries of
+retryable statuses, deadline budgets and the per-host concurrency bound.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import DeadlineExceeded, HTTPClient, current_deadline, deadline
+
+connections = set()
+failures_left = {"value": 0}
+active = {"now": 0, "peak": 0}
+active_lock = threading.Lock()
+
+
+class Upstream(BaseHTTPRequestHandler):
+    """/flaky fails with 503 while failures_left is positive, /slow and /stall sleep for ?seconds (only /slow is
+    counted in active), /ok answers at once"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        connections.add(self.client_address)
+        counted = self.path.startswith("/slow")
+        if counted:
+            with active_lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+        status = 200
+        if self.path.startswith("/flaky") and failures_left["value"] > 0:
+            failures_left["value"] -= 1
+            status = 503
+        elif self.path.startswith(("/slow", "/stall")):
+            time.sleep(float(self.path.split("=")[1]))
+        # Counted out before answering, so the client cannot start another request first
+        if counted:
+            with active_lock:
+                active["now"] -= 1
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+BASE = f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_connections_are_reused():
+    client = HTTPClient()
+    connections.clear()
+    for _ in range(5):
+        assert client.get(f"{BASE}/ok").text == "ok"
+    assert len(connections) == 1
+    assert client.stats()["hosts"][BASE]["requests"] == 5
+
+
+def test_retryable_status_is_retried():
+    client = HTTPClient(retries=3, backoff=0.01)
+    failures_left["value"] = 2
+    assert client.get(f"{BASE}/flaky").status_code == 200
+    assert client.stats()["hosts"][BASE]["retries"] == 2
+
+    # Out of retries, the last response is returned as it is
+    failures_left["value"] = 5
+    assert HTTPClient(retries=1, backoff=0.01).get(f"{BASE}/flaky").status_code == 503
+
+
+def test_deadline_bounds_the_call():
+    client = HTTPClient()
+    started = time.monotonic()
+    with deadline(0.3):
+        assert current_deadline() is not None
+        with pytest.raises(DeadlineExceeded):
+            client.get(f"{BASE}/stall?seconds=2", timeout=10)
+    assert time.monotonic() - started < 1
+    assert current_deadline() is None
+
+
+def test_concurrency_is_bounded_per_host():
+    client = HTTPClient(max_concurrent=2)
+    active["peak"] = 0
+    threads = [threading.Thread(target=client.get, args=(f"{BASE}/slow?seconds=0.1",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active["peak"] == 2
+    assert client.stats()["hosts"][BASE]["requests"] == 6
@@ -0,0 +1,67 @@
+"""
+Ingress index: classify() agrees with a direct swe.calc_ut pada
+classification, and its boundary distance with a plain bisection search for
+the surrounding pada ingresses, including in the first pada of the range.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+import swisseph as swe
+
+from ingress import PADA_WIDTH, IngressIndex, build_index
+
+INDEX_PATH = os.path.join(tempfile.mkdtemp(), "moon_ingress.bin")
+build_index(INDEX_PATH, start_year=2000, end_year=2000)
+
+
+def direct_pada(jd):
+    """0-based pada (0-107) of the Moon at jd, straight from the ephemeris"""
+    return int(swe.calc_ut(jd, swe.MOON)[0][0] // PADA_WIDTH) % 108
+
+
+def direct_boundary(jd, step):
+    """Julian day of the nearest pada ingress before (step < 0) or after (step > 0) jd, by stepping and bisection"""
+    pada = direct_pada(jd)
+    inside, outside = jd, jd + step
+    while direct_pada(outside) == pada:
+        inside, outside = outside, outside + step
+    for _ in range(60):
+        middle = (inside + outside) / 2
+        if direct_pada(middle) == pada:
+            inside = middle
+        else:
+            outside = middle
+    return (inside + outside) / 2
+
+
+@pytest.fixture(scope="module")
+def index():
+    return IngressIndex(INDEX_PATH)
+
+
+def test_first_pada_starts_at_a_real_ingress(index):
+    start_jd = swe.julday(2000, 1, 1, 0.0)
+    assert index.start_jd < start_jd
+    assert direct_pada(index.start_jd + 1e-6) == index.padas[0]
+    assert direct_pada(index.start_jd - 1e-6) != index.padas[0]
+
+
+def test_classify_matches_direct_search(index):
+    start_jd = swe.julday(2000, 1, 1, 0.0)
+    jds = np.concatenate([
+        start_jd + np.array([0.0, 0.01, 0.1]),
+        np.random.default_rng(11).uniform(index.start_jd, index.end_jd, 50)
+    ])
+    for jd in jds:
+        pada = direct_pada(jd)
+        lower, upper = direct_boundary(jd, -0.05), direct_boundary(jd, 0.05)
+        rashi, nakshatra, quarter, days_to_boundary = index.classify(jd)
+        assert (rashi, nakshatra, quarter) == (pada // 9 + 1, pada // 4 + 1, pada % 4 + 1)
+        assert days_to_boundary == pytest.approx(min(jd - lower, upper - jd), abs=1e-6)
+
+    rashis, nakshatras, quarters, distances = index.classify_array(jds)
+    assert [tuple(row) for row in zip(rashis, nakshatras, quarters)] == [index.classify(jd)[:3] for jd in jds]
+    assert np.allclose(distances, [index.classify(jd)[3] for jd in jds])
@@ -0,0 +1,25 @@
+"""
+Moon table: the error bound recorded at build time holds at random points
+between the samples, not only at the points the build checked.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import swisseph as swe
+
+from moontable import MoonTable, build_table
+
+
+def test_recorded_bound_covers_random_points():
+    path = os.path.join(tempfile.mkdtemp(), "moon_table.bin")
+    info = build_table(path, start_year=2000, end_year=2000)
+    table = MoonTable(path)
+    assert table.max_error_deg == info["max_error_deg"] > info["sampled_error_deg"]
+
+    jds = np.random.default_rng(7).uniform(table.start_jd, table.end_jd, 20000)
+    actual = np.array([swe.calc_ut(jd, swe.MOON)[0][0] for jd in jds])
+    error = np.abs((table.longitudes(jds) - actual + 180.0) % 360.0 - 180.0)
+    assert error.max() <= table.max_error_deg
+    assert table.longitude(jds[0]) == table.longitudes(jds[:1])[0]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Report cache: canonical fingerprints, age expiry and least-recently-used size eviction.
+"""
+
+import os
+import tempfile
+import time
+
+from report_cache import ReportCache, fingerprint
+
+STORE_DIR = tempfile.mkdtemp()
+
+
+def test_fingerprint_is_canonical():
+    request = {"model": "gpt-4o", "messages": [{"role": "user", "content": "Asha and Ravi"}], "temperature": 0.8}
+    reordered = {"temperature": 0.8, "messages": [{"content": "Asha and Ravi", "role": "user"}], "model": "gpt-4o"}
+    assert fingerprint(request) == fingerprint(reordered)
+    assert fingerprint(request) != fingerprint(dict(request, temperature=0.7))
+
+
+def test_reports_persist_and_expire():
+    path = os.path.join(STORE_DIR, "expiry.db")
+    cache = ReportCache(path, ttl=0.2)
+    cache.put("a", {"theme": "Fire and Water"})
+    assert ReportCache(path, ttl=0.2).get("a") == {"theme": "Fire and Water"}
+    time.sleep(0.3)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["entries"] == 0 and stats["bytes"] == 0
+
+
+def test_size_eviction_drops_least_recently_used():
+    report = {"text": "x" * 100}
+    cache = ReportCache(os.path.join(STORE_DIR, "eviction.db"), max_bytes=350)
+    for key in ("a", "b", "c"):
+        cache.put(key, report)
+        time.sleep(0.01)
+    assert cache.get("a") == report
+    cache.put("d", report)
+    assert cache.get("b") is None
+    assert cache.get("a") == report and cache.get("d") == report
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= 350
+    assert stats["hit_rate"] == 3 / 4
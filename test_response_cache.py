@@ -0,0 +1,92 @@
+"""
+Response cache: strong ETags, 304 on If-None-Match, X-Cache HIT/MISS on
+/api/compatibility, byte-bounded LRU eviction, and request keys that do not
+depend on how the date is padded or which name the place goes by.
+"""
+
+import os
+import tempfile
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+from response_cache import ResponseCache, etag_matches, make_etag  # noqa: E402
+
+client = app.app.test_client()
+
+COUPLE = {
+    "partner1": {"date": "1990-05-15", "time": "10:30", "place": "Mumbai"},
+    "partner2": {"date": "1988-11-02", "time": "06:45", "place": "Delhi"}
+}
+
+
+def test_etag_and_x_cache():
+    app.response_cache.clear()
+    first = client.post("/api/compatibility", json=COUPLE)
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+    assert first.headers["ETag"] == make_etag(first.get_data())
+
+    again = client.post("/api/compatibility", json=COUPLE)
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert again.get_data() == first.get_data()
+
+
+def test_if_none_match_gets_304():
+    etag = client.post("/api/compatibility", json=COUPLE).headers["ETag"]
+    not_modified = app.response_cache.stats()["not_modified"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.post("/api/compatibility", json=COUPLE, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.get_data() == b""
+        assert response.headers["ETag"] == etag
+    assert app.response_cache.stats()["not_modified"] == not_modified + 4
+
+    stale = client.post("/api/compatibility", json=COUPLE, headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200 and stale.headers["ETag"] == etag
+
+
+def test_equivalent_inputs_share_one_key():
+    ruleset = app.get_ruleset(None)
+    fields = app.CompatibilityResult.REPORT_FIELDS
+    spelled = dict(COUPLE, partner1={"date": "1990-5-15", "time": "10:30", "place": "Bombay"})
+    key = app.compatibility_cache_key("compatibility", COUPLE, ruleset, fields)
+    assert key is not None
+    assert app.compatibility_cache_key("compatibility", spelled, ruleset, fields) == key
+
+    # So the second spelling is answered from the entry of the first
+    app.response_cache.clear()
+    client.post("/api/compatibility", json=COUPLE)
+    assert client.post("/api/compatibility", json=spelled).headers["X-Cache"] == "HIT"
+
+    other_time = dict(COUPLE, partner1=dict(COUPLE["partner1"], time="10:31"))
+    assert app.compatibility_cache_key("compatibility", other_time, ruleset, fields) != key
+
+
+def test_byte_bound_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=300)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode() * 99)          # 100 bytes each with the key
+    assert cache.stats()["bytes"] == 300
+    assert cache.get("a") is not None              # "b" is now the least recently used
+
+    cache.put("d", b"d" * 99)
+    assert cache.get("b") is None
+    assert [key for key in "acd" if cache.get(key)] == ["a", "c", "d"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= 300
+
+    # A body larger than the whole budget is not stored, but still gets its ETag
+    assert cache.put("e", b"e" * 1000) == make_etag(b"e" * 1000)
+    assert cache.get("e") is None and cache.stats()["entries"] == 3
+
+
+def test_etag_matching():
+    etag = make_etag(b"body")
+    assert etag_matches(etag, etag) and etag_matches(f"W/{etag}", etag)
+    assert not etag_matches(None, etag) and not etag_matches('"other"', etag)
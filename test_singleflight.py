@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Singleflight: concurrent identical calls share one execution (result or error),
+for the Group itself and for the chart and LLM report paths of the app.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from singleflight import Group
+
+STORE_DIR = tempfile.mkdtemp()
+for name, filename in (("JOB_STORE_PATH", "jobs.db"), ("CHART_STORE_PATH", "charts.bin"),
+                       ("CANDIDATE_STORE_PATH", "candidates.db"), ("REPORT_CACHE_PATH", "report_cache.db"),
+                       ("GEOCODE_CACHE_PATH", "geocode_cache.db"), ("GAZETTEER_INDEX_PATH", "gazetteer.idx")):
+    os.environ.setdefault(name, os.path.join(STORE_DIR, filename))
+
+import app  # noqa: E402 (store paths come from the environment above)
+
+N = 16
+
+
+def run_concurrently(fn, n=N):
+    """Results of fn() called from n threads released at the same time"""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    group = Group("test")
+    executions = []
+
+    def slow():
+        executions.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results = run_concurrently(lambda: group.do("key", slow))
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    stats = group.stats()
+    assert stats["calls"] == N and stats["executions"] == 1 and stats["shared"] == N - 1
+    assert stats["in_flight"] == 0
+
+    # Nothing is kept once the call has returned
+    group.do("key", slow)
+    assert len(executions) == 2
+
+
+def test_errors_are_shared():
+    group = Group("test")
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("upstream down")
+
+    results = run_concurrently(lambda: group.do("key", failing))
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.stats()["executions"] == 1 and group.stats()["errors"] == 1
+
+
+def test_concurrent_charts_compute_once(monkeypatch):
+    calls = []
+    get_moon_data = app.get_moon_data
+
+    def counted(jd):
+        calls.append(jd)
+        time.sleep(0.2)
+        return get_moon_data(jd)
+
+    monkeypatch.setattr(app, "get_moon_data", counted)
+    results = run_concurrently(lambda: app.calculate_birth_chart("1991-03-07", "04:20", "Mumbai"))
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_concurrent_reports_make_one_llm_call(monkeypatch):
+    calls = []
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.append(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(0.3)
+            content = json.dumps({"love_story_theme": "Guardians of Sacred Light"})
+            body = json.dumps({"choices": [{"message": {"content": content}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_API_BASE", f"http://127.0.0.1:{stub.server_address[1]}/v1")
+
+    details1 = {"name": "Tara", "date": "1992-01-20", "time": "08:15", "place": "Mumbai"}
+    details2 = {"name": "Dev", "date": "1990-07-04", "time": "21:40", "place": "Delhi"}
+    chart1 = app.calculate_birth_chart(details1["date"], details1["time"], details1["place"])
+    chart2 = app.calculate_birth_chart(details2["date"], details2["time"], details2["place"])
+    vedic_data = app.CompatibilityResult(chart1, chart2, None, details1, details2).to_dict(
+        app.CompatibilityResult.ENHANCED_FIELDS
+    )
+
+    before = app.report_flight.stats()
+    results = run_concurrently(lambda: app.generate_enhanced_report(vedic_data, app.MODE_REFRESH))
+    stub.shutdown()
+    assert len(calls) == 1
+    assert all(result == {"love_story_theme": "Guardians of Sacred Light"} for result in results)
+    assert app.report_flight.stats()["shared"] - before["shared"] == N - 1
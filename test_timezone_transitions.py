@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Differential test: precompiled transition tables vs. the pytz localize path.
+
+Checks random birth times across many zones plus every minute around real
+DST / offset transitions (gaps and overlaps), for both the scalar and the
+vectorized conversion, and that julday_array matches swe.julday bit for bit.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+import swisseph as swe
+
+import tztables
+
+ZONES = [
+    "Asia/Kolkata", "Asia/Dhaka", "Asia/Kathmandu", "America/New_York", "America/Sao_Paulo",
+    "Europe/London", "Europe/Amsterdam", "Europe/Warsaw", "Europe/Moscow", "Australia/Lord_Howe",
+    "Pacific/Apia", "America/St_Johns", "Asia/Tehran", "Africa/Casablanca", "UTC", "Etc/GMT+5"
+]
+
+
+def pytz_utc(dt_local, tz_name):
+    """Reference conversion, exactly as convert_to_utc did it"""
+    return pytz.timezone(tz_name).localize(dt_local).astimezone(pytz.UTC)
+
+
+def sample_times(tz_name, rng):
+    """Random birth times plus every 15 minutes within 3 hours of each transition"""
+    times = [datetime(1900, 1, 1) + timedelta(minutes=rng.randrange(200 * 365 * 24 * 60)) for _ in range(300)]
+    tz = pytz.timezone(tz_name)
+    for transition in getattr(tz, "_utc_transition_times", [])[1:]:
+        if not 1890 <= transition.year <= 2037:
+            continue
+        for step in range(-12 * 4, 12 * 4 + 1):
+            times.append((transition + timedelta(minutes=15 * step)).replace(second=0))
+    return times
+
+
+def test_scalar_matches_pytz():
+    rng = random.Random(42)
+    for tz_name in ZONES:
+        for dt_local in sample_times(tz_name, rng):
+            expected = pytz_utc(dt_local, tz_name)
+            actual = tztables.local_to_utc(dt_local, tz_name)
+            assert actual == expected, (tz_name, dt_local, actual, expected)
+            assert actual.isoformat() == expected.isoformat()
+
+
+def test_vectorized_matches_pytz():
+    rng = random.Random(7)
+    for tz_name in ZONES:
+        times = sample_times(tz_name, rng)
+        local_seconds = np.array([tztables._naive_seconds(t) for t in times], dtype=np.int64)
+        actual = tztables.get_table(tz_name).to_utc_array(local_seconds)
+        expected = [int((pytz_utc(t, tz_name) - tztables.EPOCH_UTC).total_seconds()) for t in times]
+        assert actual.tolist() == expected, tz_name
+
+
+def test_parse_local_seconds():
+    dates = ["1985-04-02", "1900-01-01", "2099-12-31"]
+    times = ["11:15", "00:00", "23:59"]
+    expected = [tztables._naive_seconds(datetime.strptime(f"{d} {t}", "%Y-%m-%d %H:%M"))
+                for d, t in zip(dates, times)]
+    assert tztables.parse_local_seconds(dates, times).tolist() == expected
+
+
+def test_julday_array_matches_swe():
+    rng = random.Random(3)
+    seconds = [rng.randrange(-2300000000, 4200000000) // 60 * 60 for _ in range(5000)]
+    actual = tztables.julday_array(np.array(seconds, dtype=np.int64))
+    for value, utc_seconds in zip(actual, seconds):
+        utc_dt = tztables.EPOCH_UTC + timedelta(seconds=utc_seconds)
+        expected = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour + utc_dt.minute / 60.0)
+        assert value == expected, (utc_dt, value, expected)
+
+
+if __name__ == "__main__":
+    test_scalar_matches_pytz()
+    test_vectorized_matches_pytz()
+    test_parse_local_seconds()
+    test_julday_array_matches_swe()
+    print("✅ Transition tables match pytz")
@@ -0,0 +1,95 @@
+"""
+Process-wide lat/lon -> IANA timezone resolver.
+
+TimezoneFinder is loaded once per process (optionally with its polygon data
+fully in memory) and sits behind a quantized lat/lon grid cache. The first
+lookup in a grid cell samples the cell's corners and centre with
+TimezoneFinder.unique_timezone_at, which only answers when the finder's own
+shortcut cell holds a single zone. If every sample gets the same unique
+answer, the whole cell is remembered as that timezone and later lookups in
+it are a dict hit. Cells near a border (including enclaves such as the
+India/Bangladesh ones) are remembered as such, and every lookup in them
+still gets an exact polygon check.
+
+The default grid cell (0.1 degrees, about 11 km) is much smaller than the
+finder's shortcut cells. That keeps the chance of a border shortcut slipping
+between the sample points negligible.
+"""
+
+import math
+import threading
+
+from timezonefinder import TimezoneFinder
+
+DEFAULT_CELL_SIZE = 0.1
+DEFAULT_MAX_CELLS = 200000
+
+# Marker for cells whose sample points disagree
+BORDER = object()
+
+
+class TimezoneResolver:
+    """Singleton-style TimezoneFinder wrapper with a grid cache"""
+
+    def __init__(self, in_memory=False, cell_size=DEFAULT_CELL_SIZE, max_cells=DEFAULT_MAX_CELLS):
+        self.in_memory = in_memory
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._finder = None
+        self._lock = threading.Lock()
+        self._cells = {}
+        self._stats = {"cell_hits": 0, "border_checks": 0, "cells_classified": 0}
+
+    @property
+    def finder(self):
+        """The shared TimezoneFinder, created on first use"""
+        if self._finder is None:
+            with self._lock:
+                if self._finder is None:
+                    self._finder = TimezoneFinder(in_memory=self.in_memory)
+        return self._finder
+
+    def _classify(self, cell_lat, cell_lon):
+        """Return the cell's timezone if all sample points are unambiguously in one zone, else BORDER"""
+        size = self.cell_size
+        south, west = cell_lat * size, cell_lon * size
+        points = [
+            (south, west), (south, west + size),
+            (south + size, west), (south + size, west + size),
+            (south + size / 2, west + size / 2)
+        ]
+        zones = {self.finder.unique_timezone_at(lng=min(lon, 180.0), lat=max(min(lat, 90.0), -90.0))
+                 for lat, lon in points}
+        if len(zones) == 1 and None not in zones:
+            return zones.pop()
+        return BORDER
+
+    def timezone_at(self, lat, lon):
+        """Return the IANA timezone name at a point, or None over open water"""
+        cell = (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+        zone = self._cells.get(cell)
+        if zone is None:
+            zone = self._classify(*cell)
+            if len(self._cells) >= self.max_cells:
+                self._cells.clear()
+            self._cells[cell] = zone
+            self._stats["cells_classified"] += 1
+
+        if zone is BORDER:
+            self._stats["border_checks"] += 1
+            return self.finder.timezone_at(lng=lon, lat=lat)
+        self._stats["cell_hits"] += 1
+        return zone
+
+    def warm(self):
+        """Load the polygon data now instead of on the first request"""
+        self.finder.timezone_at(lng=0.0, lat=0.0)
+
+    def stats(self):
+        """Return cache counters"""
+        stats = dict(self._stats)
+        stats["cells"] = len(self._cells)
+        stats["border_cells"] = sum(1 for zone in list(self._cells.values()) if zone is BORDER)
+        stats["loaded"] = self._finder is not None
+        stats["in_memory"] = self.in_memory
+        return stats
@@ -0,0 +1,206 @@
+"""
+Precompiled UTC-offset transition tables for local -> UTC conversion.
+
+Each pytz zone's historical transitions are compiled once into sorted
+integer arrays (UTC transition instants, UTC offsets and DST flags, all in
+seconds). Converting a local wall-clock time to UTC is then a couple of
+bisects plus arithmetic, and arrays of births are converted with
+numpy.searchsorted.
+
+The resolution rules mirror pytz's `localize(dt, is_dst=False)` exactly:
+
+- A local time that exists once maps to its only UTC instant.
+- An ambiguous local time (clocks wound back) resolves to the standard-time
+  reading, i.e. the later UTC instant.
+- A non-existent local time (clocks jumped forward) is shifted back six
+  hours, resolved, and shifted forward again. This lands on the pre-DST
+  offset just like pytz.
+
+test_timezone_transitions.py checks this against pytz differentially.
+"""
+
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+DAY = 86400
+GAP_SHIFT = 6 * 3600
+
+
+class TransitionTable:
+    """Sorted transition arrays for one timezone"""
+
+    def __init__(self, tz_name):
+        tz = pytz.timezone(tz_name)
+        self.tz_name = tz_name
+
+        if hasattr(tz, "_utc_transition_times"):
+            transitions = [_naive_seconds(t) for t in tz._utc_transition_times]
+            offsets = [int(info[0].total_seconds()) for info in tz._transition_info]
+            dst = [bool(info[1]) for info in tz._transition_info]
+        else:
+            # Fixed-offset zones (UTC, Etc/GMT+5, ...)
+            offset = tz.utcoffset(datetime(2000, 1, 1))
+            transitions = [_naive_seconds(datetime.min)]
+            offsets = [int(offset.total_seconds())]
+            dst = [False]
+
+        # Python lists for the scalar bisect path, numpy arrays for the vectorized path
+        self.transitions = transitions
+        self.offsets = offsets
+        self.dst = dst
+        self.transitions_array = np.array(transitions, dtype=np.int64)
+        self.offsets_array = np.array(offsets, dtype=np.int64)
+        self.dst_array = np.array(dst, dtype=bool)
+
+    def _index(self, seconds):
+        return max(0, bisect_right(self.transitions, seconds) - 1)
+
+    def to_utc(self, local_seconds):
+        """Convert local wall-clock seconds since the epoch to UTC seconds"""
+        # Candidate readings using the offsets in force a day either side (as pytz does)
+        candidates = {}
+        for delta in (-DAY, DAY):
+            utc = local_seconds - self.offsets[self._index(local_seconds + delta)]
+            idx = self._index(utc)
+            if utc + self.offsets[idx] == local_seconds:
+                candidates.setdefault(utc, idx)
+
+        if len(candidates) == 1:
+            return next(iter(candidates))
+
+        # Non-existent local time: resolve six hours earlier and move forward again
+        if not candidates:
+            return self.to_utc(local_seconds - GAP_SHIFT) + GAP_SHIFT
+
+        # Ambiguous local time: prefer the standard-time reading, then the later instant
+        standard = [utc for utc, idx in candidates.items() if not self.dst[idx]]
+        if len(standard) == 1:
+            return standard[0]
+        return max(standard or candidates)
+
+    def to_utc_array(self, local_seconds):
+        """Vectorized to_utc over an int64 array of local seconds"""
+        local_seconds = np.asarray(local_seconds, dtype=np.int64)
+        transitions, offsets = self.transitions_array, self.offsets_array
+
+        def candidate(delta):
+            idx = np.maximum(np.searchsorted(transitions, local_seconds + delta, side="right") - 1, 0)
+            utc = local_seconds - offsets[idx]
+            idx = np.maximum(np.searchsorted(transitions, utc, side="right") - 1, 0)
+            return utc, idx, utc + offsets[idx] == local_seconds
+
+        utc_before, idx_before, valid_before = candidate(-DAY)
+        utc_after, idx_after, valid_after = candidate(DAY)
+
+        result = np.where(valid_before, utc_before, utc_after)
+
+        ambiguous = valid_before & valid_after & (utc_before != utc_after)
+        if ambiguous.any():
+            standard_before = ~self.dst_array[idx_before]
+            standard_after = ~self.dst_array[idx_after]
+            resolved = np.where(
+                standard_before & ~standard_after, utc_before,
+                np.where(standard_after & ~standard_before, utc_after, np.maximum(utc_before, utc_after))
+            )
+            result = np.where(ambiguous, resolved, result)
+
+        missing = ~valid_before & ~valid_after
+        if missing.any():
+            result[missing] = self.to_utc_array(local_seconds[missing] - GAP_SHIFT) + GAP_SHIFT
+
+        return result
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table(tz_name):
+    """Return the compiled TransitionTable for a zone, compiling it on first use; ValueError for unknown zones"""
+    table = _tables.get(tz_name) if isinstance(tz_name, str) else None
+    if table is None:
+        if not isinstance(tz_name, str) or tz_name not in pytz.all_timezones_set:
+            raise ValueError(f"unknown timezone {tz_name!r}")
+        table = TransitionTable(tz_name)
+        with _tables_lock:
+            table = _tables.setdefault(tz_name, table)
+    return table
+
+
+def precompile(tz_names=None):
+    """Compile tables for the given zones (default: all pytz zones) ahead of time"""
+    for tz_name in tz_names or pytz.all_timezones:
+        get_table(tz_name)
+    return len(_tables)
+
+
+def _naive_seconds(dt):
+    """Seconds since the epoch of a naive datetime, treating it as UTC"""
+    return (dt.toordinal() - EPOCH_ORDINAL) * DAY + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+
+def local_to_utc(dt_local, tz_name):
+    """Convert a naive local datetime to an aware UTC datetime, same as pytz localize + astimezone"""
+    utc_seconds = get_table(tz_name).to_utc(_naive_seconds(dt_local))
+    return EPOCH_UTC + timedelta(seconds=utc_seconds, microseconds=dt_local.microsecond)
+
+
+def parse_local_seconds(dates, times):
+    """Parse arrays of "YYYY-MM-DD" dates and "HH:MM" times into int64 local seconds.
+
+    Raises ValueError for dates that do not exist and times outside 00:00-23:59.
+    """
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+    # Fast path for zero-padded "HH:MM": read the code points directly
+    times = np.asarray(times, dtype=str)
+    hours = minutes = None
+    if times.dtype.itemsize == 5 * 4 and len(times):
+        digits = times.view(np.uint32).reshape(-1, 5).astype(np.int64) - ord("0")
+        if (digits[:, 2] == ord(":") - ord("0")).all() and (digits[:, [0, 1, 3, 4]] <= 9).all() \
+                and (digits[:, [0, 1, 3, 4]] >= 0).all():
+            hours = digits[:, 0] * 10 + digits[:, 1]
+            minutes = digits[:, 3] * 10 + digits[:, 4]
+
+    if hours is None:
+        try:
+            parts = [t.split(":") for t in times.tolist()]
+            hours = np.array([int(p[0]) for p in parts], dtype=np.int64)
+            minutes = np.array([int(p[1]) if len(p) == 2 else -1 for p in parts], dtype=np.int64)
+        except ValueError:
+            raise ValueError("times must be HH:MM") from None
+
+    invalid = (hours < 0) | (hours > 23) | (minutes < 0) | (minutes > 59)
+    if invalid.any():
+        raise ValueError(f"invalid time {str(times[np.argmax(invalid)])!r}, expected HH:MM between 00:00 and 23:59")
+    return days * DAY + (hours * 60 + minutes) * 60
+
+
+def julday_array(utc_seconds):
+    """Julian days for UTC seconds, computed exactly like swe.julday(y, m, d, h + mi / 60.0)"""
+    utc_seconds = np.asarray(utc_seconds, dtype=np.int64)
+    instants = utc_seconds.astype("datetime64[s]")
+    year = instants.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = instants.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (instants.astype("datetime64[D]") - instants.astype("datetime64[M]")).astype(np.int64) + 1
+    second_of_day = utc_seconds % DAY
+    hour = (second_of_day // 3600) + (second_of_day % 3600 // 60) / 60.0
+
+    # Same operation order as swe_julday() so the doubles match bit for bit
+    u = year.astype(np.float64) - (month < 3)
+    u0 = u + 4712.0
+    u1 = month + 1.0
+    u1 = np.where(u1 < 4, u1 + 12.0, u1)
+    jd = np.floor(u0 * 365.25) + np.floor(30.6 * u1 + 0.000001) + day + hour / 24.0 - 63.5
+    u2 = np.floor(np.abs(u) / 100) - np.floor(np.abs(u) / 400)
+    u2 = np.where(u < 0.0, -u2, u2)
+    jd = jd - u2 + 2
+    jd = jd - ((u < 0.0) & (u / 100 == np.floor(u / 100)) & (u / 400 != np.floor(u / 400)))
+    return jd